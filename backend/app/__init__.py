@@ -1,22 +1,45 @@
+import os
 from flask import Flask
 from flask_cors import CORS
 from .routes.chat import chat_bp
 from .routes.auth import auth_bp
 from .routes.file_routes import file_bp
 from .routes.cache import cache_bp
+from .routes.metrics import metrics_bp
+from .routes.llm import llm_bp
+from .services.embedding_registry import embedding_registry
+from .lib.http_client import http_clients
+from .utils.background_loop import background_loop
+from .services.llm_router import llm_router
 from .utils.logger import Logger
 
 logger = Logger()
 
+CORS_RESOURCES = {r"/*": {"origins": "*", "allow_headers": ["Content-Type", "Authorization", "Last-Event-ID"], "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"], "expose_headers": ["Retry-After"]}}
+
 def create_app():
     """Create and configure the Flask application"""
     app = Flask(__name__)
-    CORS(app, resources={r"/*": {"origins": "*", "allow_headers": ["Content-Type", "Authorization"], "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"]}})  # Enable CORS for all routes
+    CORS(app, resources=CORS_RESOURCES)  # Enable CORS for all routes
 
     # Register blueprints
     app.register_blueprint(chat_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(file_bp, url_prefix='/file')
     app.register_blueprint(cache_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+    app.register_blueprint(llm_bp, url_prefix='/api')
+
+    # Shared HTTP connection pools live as long as the app
+    http_clients.init_app(app)
+    # Async views run on one long-lived loop, so its pooled async clients are reused across requests
+    app.async_to_sync = background_loop.async_to_sync
+
+    # LLM backend pool: health checks run in a daemon thread
+    llm_router.init_app(app)
+
+    # Load embedding models once at startup instead of on the first RAG request
+    if os.getenv('EMBEDDING_WARMUP', 'true').lower() == 'true':
+        embedding_registry.warm_up()
 
     return app
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""
+ASGI entry point: uvicorn app.asgi:application --port 8000
+
+POST /chat and GET /chat/stream/<id> are served natively: run_chat runs on the server's event
+loop and the answer is relayed chunk by chunk without a thread per stream. Every other route
+goes through the regular Flask blueprints (asgiref WsgiToAsgi, one thread per request as before).
+"""
+import json
+import asyncio
+from urllib.parse import parse_qs
+from asgiref.wsgi import WsgiToAsgi
+from . import create_app, CORS_RESOURCES, logger
+from .lib.http_client import http_clients
+from .routes.chat import run_chat, resume_chat, SSE_HEADERS
+from .services.llm_router import llm_router
+from .utils.streaming import ResponseStream
+
+CHAT_PATH = '/chat'
+CHAT_STREAM_PREFIX = '/chat/stream/'
+
+
+class ChatASGIApp:
+    """Native async /chat in front of the Flask app"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        cors = CORS_RESOURCES[r"/*"]
+        self.cors_headers = [
+            (b'access-control-allow-origin', cors['origins'].encode()),
+            (b'access-control-expose-headers', ', '.join(cors['expose_headers']).encode())
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == CHAT_PATH:
+            await self.chat(scope, receive, send)
+        elif scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'].startswith(CHAT_STREAM_PREFIX):
+            await self.resume(scope, receive, send)
+        else:
+            # CORS preflight of /chat included: flask-cors answers it
+            await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                llm_router.stop_health_checks()
+                await http_clients.aclose_loop_clients()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def read_body(receive):
+        body = b''
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return body
+
+    def _headers(self, content_type, extra):
+        headers = [(b'content-type', content_type)] + self.cors_headers
+        headers += [(name.lower().encode(), str(value).encode()) for name, value in extra.items()]
+        return headers
+
+    async def send_json(self, send, body, status, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': self._headers(b'application/json', headers or {})
+        })
+        await send({'type': 'http.response.body', 'body': payload})
+
+    async def chat(self, scope, receive, send):
+        raw = await self.read_body(receive)
+        if raw is None:
+            return
+        try:
+            data = json.loads(raw or b'null')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            await self.send_json(send, {'error': 'Invalid JSON body'}, 400)
+            return
+        client = scope.get('client')
+        await self.respond(send, receive, run_chat(data, client[0] if client else None))
+
+    async def resume(self, scope, receive, send):
+        if await self.read_body(receive) is None:
+            return
+        stream_id = scope['path'][len(CHAT_STREAM_PREFIX):]
+        last_event_id = dict(scope.get('headers') or []).get(b'last-event-id', b'').decode() or None
+        if last_event_id is None:
+            query = parse_qs(scope.get('query_string', b'').decode())
+            last_event_id = query.get('last_event_id', [None])[0]
+        await self.respond(send, receive, resume_chat(stream_id, last_event_id))
+
+    async def respond(self, send, receive, reply_coro):
+        """Send a (body, status, headers) reply, watching for the client going away meanwhile"""
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+        try:
+            reply = asyncio.ensure_future(reply_coro)
+            await asyncio.wait({reply, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not reply.done():
+                reply.cancel()
+                logger.log_with_timestamp('ASGI_CHAT', 'Client disconnected before the answer started')
+                return
+            body, status, headers = reply.result()
+            if not isinstance(body, ResponseStream):
+                await self.send_json(send, body, status, headers)
+                return
+            await self.stream(send, body, status, headers, disconnected)
+        finally:
+            disconnected.cancel()
+
+    @staticmethod
+    async def wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def stream(self, send, body, status, headers, disconnected):
+        """Relay the answer events; a disconnect cancels the relay and detaches from the answer stream"""
+        async def relay():
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': self._headers(b'text/event-stream; charset=utf-8', dict(SSE_HEADERS, **headers))
+            })
+            async for chunk in body:
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        relaying = asyncio.ensure_future(relay())
+        try:
+            await asyncio.wait({relaying, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not relaying.done():
+                relaying.cancel()
+            await asyncio.gather(relaying, return_exceptions=True)
+            error = None if relaying.cancelled() else relaying.exception()
+            if isinstance(error, OSError):
+                # Write to a closed connection
+                logger.log_with_timestamp('ASGI_CHAT', f'Stream closed early: {str(error)}')
+            elif error is not None:
+                raise error
+        finally:
+            await body.aclose()
+
+
+def create_asgi_app():
+    """Create the ASGI application (Flask app wrapped with the native /chat route)"""
+    return ChatASGIApp(create_app())
+
+application = create_asgi_app()
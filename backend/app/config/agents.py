@@ -1,7 +1,13 @@
 """
 Configuration for different AI agents/models available in the application.
 Each agent is configured with a unique ID, model name, and display name (trùng với model).
+Optional keys: context_window (prompt + answer tokens the backend is loaded with), answer_reserve
+(tokens kept free for the answer), tokenizer (Hugging Face tokenizer id for exact token counts),
+max_concurrency (concurrent generations allowed by the admission control) and context_format
+('text' or 'table': how schedule/exam data is written into the prompt, defaults to CONTEXT_FORMAT).
 """
+import os
+import json
 
 AVAILABLE_AGENTS = {
     "qwen3-1.7b": {
@@ -9,6 +15,7 @@ AVAILABLE_AGENTS = {
         "model": "qwen3-1.7b",
         "display_name": "qwen3-1.7b",
         "temperature": 0.7,
+        "context_window": 8192,
         "is_default": False
     },
     "qwen3-4b": {
@@ -16,6 +23,8 @@ AVAILABLE_AGENTS = {
         "model": "qwen3-4b",
         "display_name": "qwen3-4b",
         "temperature": 0.7,
+        "context_window": 8192,
+        "context_format": "table",
         "is_default": True
     },
     "qwen3-8b": {
@@ -23,6 +32,8 @@ AVAILABLE_AGENTS = {
         "model": "qwen3-8b",
         "display_name": "qwen3-8b",
         "temperature": 0.7,
+        "context_window": 8192,
+        "context_format": "table",
         "is_default": False
     },
     "gemma-3-1b-it": {
@@ -30,6 +41,7 @@ AVAILABLE_AGENTS = {
         "model": "gemma-3-1b-it",
         "display_name": "gemma-3-1b-it",
         "temperature": 0.7,
+        "context_window": 8192,
         "is_default": False
     }
 }
@@ -65,4 +77,33 @@ def get_all_agents():
     Returns:
         list: List of agent configuration dictionaries
     """
-    return list(AVAILABLE_AGENTS.values()) 
\ No newline at end of file
+    return list(AVAILABLE_AGENTS.values()) 
+
+# OpenAI-compatible LLM servers (LM Studio, llama.cpp, vLLM...) and the agent models each one serves.
+# "models": None means every model the server lists on /v1/models.
+# The LLM_BACKENDS environment variable (JSON list with the same keys) replaces this list, and so
+# does LLM_BACKENDS_FILE (path to a JSON file with that list), which is re-read on every reload.
+LLM_BACKENDS = [
+    {
+        "name": "lmstudio-1",
+        "url": "http://192.168.1.216:1234",
+        "api_key": "lm-studio",
+        "models": list(AVAILABLE_AGENTS)
+    }
+]
+
+def get_llm_backends():
+    """
+    Returns the configured LLM backends.
+
+    Returns:
+        list: Backend dicts with name, url, api_key and models
+    """
+    backends_file = os.getenv('LLM_BACKENDS_FILE')
+    if backends_file:
+        with open(backends_file, encoding='utf-8') as f:
+            return json.load(f)
+    configured = os.getenv('LLM_BACKENDS')
+    if configured:
+        return json.loads(configured)
+    return LLM_BACKENDS
@@ -0,0 +1,100 @@
+"""
+Labelled questions for the local query classifier.
+
+LABELLED_EXAMPLES are the neighbours of the embedding kNN tier. BENCHMARK_EXAMPLES are held
+out and only used by QueryClassifier.evaluate() to track accuracy and latency of each tier.
+Categories are the same as the LM Studio classifier: schedule, examschedule, date_query,
+uml, general, other.
+"""
+
+LABELLED_EXAMPLES = [
+    # schedule
+    ("Hôm nay hc gì?", "schedule"),
+    ("tkb tuần này", "schedule"),
+    ("Thời khóa biểu tuần sau của tôi", "schedule"),
+    ("Ngày mai học môn gì?", "schedule"),
+    ("thu3 tuan sau hc mon gi", "schedule"),
+    ("Lịch học thứ 5 tuần này", "schedule"),
+    ("Hôm nay có tiết nào không?", "schedule"),
+    ("Chiều nay học phòng nào?", "schedule"),
+    ("Tuần này có môn nào học buổi sáng?", "schedule"),
+    ("What classes do I have tomorrow?", "schedule"),
+    # examschedule
+    ("Bao giờ lt toán?", "examschedule"),
+    ("Lịch thi cuối kỳ của tôi", "examschedule"),
+    ("Khi nào thi môn cơ sở dữ liệu?", "examschedule"),
+    ("Thi giữa kỳ môn mạng máy tính ngày nào?", "examschedule"),
+    ("Phòng thi môn lập trình hướng đối tượng ở đâu?", "examschedule"),
+    ("lich thi hk nay", "examschedule"),
+    ("Môn nào thi trước?", "examschedule"),
+    ("When is my database exam?", "examschedule"),
+    # date_query
+    ("Ngày mai là ngày mấy?", "date_query"),
+    ("Hôm nay là thứ mấy?", "date_query"),
+    ("Còn bao nhiêu ngày nữa đến thứ 7?", "date_query"),
+    ("Thứ 6 tuần sau là ngày bao nhiêu?", "date_query"),
+    ("Hôm nay ngày bao nhiêu?", "date_query"),
+    ("What is the date today?", "date_query"),
+    # uml
+    ("Vẽ sơ đồ lớp học bằng UML.", "uml"),
+    ("Vẽ use case cho hệ thống quản lý thư viện", "uml"),
+    ("Viết PlantUML cho sơ đồ tuần tự đăng nhập", "uml"),
+    ("Sơ đồ hoạt động cho quy trình đặt hàng", "uml"),
+    ("Class diagram cho hệ thống bán vé", "uml"),
+    ("Draw a sequence diagram for user login", "uml"),
+    # general
+    ("Tôi buồn quá, tôi muốn nghỉ học, chuyển sang trường khác", "general"),
+    ("Có nên bỏ học không?", "general"),
+    ("Em rất áp lực vì điểm kém, phải làm sao?", "general"),
+    ("Trường PTIT dạy dở đúng không?", "general"),
+    ("Giải thích thuật toán quicksort", "general"),
+    ("Sự khác nhau giữa TCP và UDP là gì?", "general"),
+    ("Làm sao để học tốt môn xác suất thống kê?", "general"),
+    ("Tóm tắt nội dung file tôi vừa tải lên", "general"),
+    ("Xin chào", "general"),
+    ("Explain the difference between a process and a thread", "general"),
+    ("Nên học ngành an toàn thông tin hay khoa học máy tính?", "general"),
+    ("Viết code Python đọc file CSV", "general"),
+    ("Hôm nay nên học gì để ôn thi hiệu quả?", "general"),
+    ("Mai kiểm tra mà chưa học bài, phải làm sao?", "general"),
+    # other
+    ("Ngày mai ăn gì?", "other"),
+    ("Năm sau tôi học lớp mấy?", "other"),
+    ("Kể chuyện cười đi", "other"),
+    ("Đội bóng nào vô địch World Cup 2018?", "other"),
+    ("Giá vàng hôm nay bao nhiêu?", "other"),
+    ("Gợi ý phim hay cuối tuần", "other"),
+    ("What's the weather like in Hanoi?", "other"),
+]
+
+BENCHMARK_EXAMPLES = [
+    ("hnay hc j", "schedule"),
+    ("t.sau co hoc thu 2 khong", "schedule"),
+    ("Thời khóa biểu hôm nay", "schedule"),
+    ("thứ 4 tuần này học những môn nào", "schedule"),
+    ("Sáng mai có học không?", "schedule"),
+    ("lt mon giai tich", "examschedule"),
+    ("Lịch thi của em", "examschedule"),
+    ("Thi môn hệ điều hành lúc mấy giờ?", "examschedule"),
+    ("Có môn nào thi vào tuần sau không?", "examschedule"),
+    ("Hôm qua là ngày mấy?", "date_query"),
+    ("Chủ nhật này là ngày bao nhiêu?", "date_query"),
+    ("Vẽ sơ đồ use case đăng ký học phần", "uml"),
+    ("plantuml cho class User và Order", "uml"),
+    ("Giải thích khái niệm đệ quy", "general"),
+    ("Em không có động lực học, phải làm sao?", "general"),
+    ("hello", "general"),
+    ("Cách viết báo cáo thực tập", "general"),
+    ("Công thức nấu phở bò", "other"),
+    ("Ai là ca sĩ nổi tiếng nhất Việt Nam?", "other"),
+    ("Năm sau học lớp mấy?", "other"),
+    # Hard negatives: time words or "học" without a timetable question
+    ("hôm nay học lập trình python thế nào cho hiệu quả", "general"),
+    ("mai em thi rồi mà chưa học gì, lo quá", "general"),
+    ("em nên học môn gì kỳ sau", "general"),
+    ("cn là gì trong hóa học", "general"),
+    ("Tiết kiệm tiền khi đi học xa nhà thế nào?", "general"),
+    ("Thứ 7 này đi học nhóm ở thư viện có ổn không?", "general"),
+    ("Ngày mai thi rồi, ôn tập thế nào?", "general"),
+    ("Tối nay xem phim gì?", "other"),
+]
@@ -31,6 +31,19 @@ class RedisService:
             print(f"❌ Redis connection failed: {e}")
             self.redis_client = None
 
+    def create_async_client(self):
+        """redis.asyncio client with the same settings, bound to the event loop that uses it"""
+        import redis.asyncio
+        return redis.asyncio.Redis(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', 6379)),
+            password=os.getenv('REDIS_PASSWORD', None),
+            db=int(os.getenv('REDIS_DB', 0)),
+            decode_responses=True,
+            socket_connect_timeout=5,
+            retry_on_timeout=True
+        )
+
     def is_connected(self) -> bool:
         try:
             if self.redis_client:
@@ -0,0 +1,183 @@
+import os
+import atexit
+import asyncio
+import threading
+import importlib.util
+import weakref
+import httpx
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# HTTP/2 needs the optional 'h2' package, fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# Per-upstream client settings: every name gets its own connection pool
+CLIENT_CONFIGS = {
+    'lmstudio': {'timeout': 60.0, 'http2': False},  # LM Studio only speaks HTTP/1.1
+    'google': {'timeout': 30.0, 'http2': True},
+    'ptit': {'timeout': 30.0, 'http2': True},
+    'scraper': {'timeout': 10.0, 'http2': True, 'follow_redirects': True},
+    'default': {'timeout': 30.0, 'http2': True}
+}
+
+
+class HttpClientRegistry:
+    """
+    Shared, pooled httpx clients.
+
+    Sync clients are process-wide and thread-safe. httpx async clients are bound to the
+    event loop that first used them, so one async client is kept per (name, loop). Request
+    handling runs on long-lived loops (utils/background_loop.py, the ASGI server's loop);
+    any other loop must call aclose_loop_clients() before it is closed.
+    """
+
+    def __init__(self):
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv('HTTP_MAX_CONNECTIONS', 100)),
+            max_keepalive_connections=int(os.getenv('HTTP_MAX_KEEPALIVE', 20)),
+            keepalive_expiry=float(os.getenv('HTTP_KEEPALIVE_EXPIRY', 30))
+        )
+        self._clients = {}
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._stats = {}
+        # Re-entrant: client creation builds the stats hooks while holding the lock
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        """Attach the registry to the Flask app and close the pools at interpreter exit"""
+        app.extensions['http_clients'] = self
+        atexit.register(self.close_all)
+
+    def _client_kwargs(self, name):
+        config = CLIENT_CONFIGS.get(name, CLIENT_CONFIGS['default'])
+        timeout = float(os.getenv(f'HTTP_TIMEOUT_{name.upper()}', config['timeout']))
+        return {
+            'timeout': httpx.Timeout(timeout, connect=min(timeout, 10.0)),
+            'limits': self.limits,
+            'http2': config.get('http2', False) and HTTP2_AVAILABLE,
+            'follow_redirects': config.get('follow_redirects', False)
+        }
+
+    def _get_stats(self, name):
+        with self._lock:
+            if name not in self._stats:
+                self._stats[name] = {'requests': 0, 'responses': 0, 'errors': 0}
+            return self._stats[name]
+
+    def _sync_hooks(self, name):
+        stats = self._get_stats(name)
+
+        def on_request(request):
+            stats['requests'] += 1
+
+        def on_response(response):
+            stats['responses'] += 1
+            if response.status_code >= 500:
+                stats['errors'] += 1
+
+        return {'request': [on_request], 'response': [on_response]}
+
+    def _async_hooks(self, name):
+        sync_hooks = self._sync_hooks(name)
+
+        async def on_request(request):
+            sync_hooks['request'][0](request)
+
+        async def on_response(response):
+            sync_hooks['response'][0](response)
+
+        return {'request': [on_request], 'response': [on_response]}
+
+    def get_client(self, name='default'):
+        """
+        Get the shared sync client for an upstream.
+
+        Args:
+            name (str): One of CLIENT_CONFIGS ('lmstudio', 'google', 'ptit', 'scraper', 'default')
+
+        Returns:
+            httpx.Client: Pooled keep-alive client (do not close it)
+        """
+        client = self._clients.get(name)
+        if client is not None and not client.is_closed:
+            return client
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None or client.is_closed:
+                client = httpx.Client(event_hooks=self._sync_hooks(name), **self._client_kwargs(name))
+                self._clients[name] = client
+            return client
+
+    def get_async_client(self, name='default'):
+        """
+        Get the shared async client for an upstream on the running event loop.
+
+        Returns:
+            httpx.AsyncClient: Pooled keep-alive client (do not close it)
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            client = clients.get(name)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(event_hooks=self._async_hooks(name), **self._client_kwargs(name))
+                clients[name] = client
+            return client
+
+    async def aclose_loop_clients(self):
+        """Close the async clients of the running loop (call before the loop shuts down)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_clients.pop(loop, {})
+        for client in clients.values():
+            await client.aclose()
+
+    def close_all(self):
+        """Close every sync client; async clients are closed with their event loop"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _pool_connections(client):
+        # httpx does not expose pool state publicly, read it defensively
+        try:
+            return len(client._transport._pool.connections)
+        except Exception:
+            return None
+
+    def get_stats(self):
+        """Request counters and open pooled connections per upstream"""
+        stats = {
+            'http2_available': HTTP2_AVAILABLE,
+            'limits': {
+                'max_connections': self.limits.max_connections,
+                'max_keepalive_connections': self.limits.max_keepalive_connections,
+                'keepalive_expiry': self.limits.keepalive_expiry
+            },
+            'clients': {}
+        }
+        with self._lock:
+            async_clients = [clients for clients in self._async_clients.values()]
+            for name, counters in self._stats.items():
+                sync_client = self._clients.get(name)
+                async_connections = [
+                    self._pool_connections(clients[name]) for clients in async_clients if name in clients
+                ]
+                stats['clients'][name] = dict(
+                    counters,
+                    sync_open_connections=self._pool_connections(sync_client) if sync_client else 0,
+                    async_clients=len(async_connections),
+                    async_open_connections=sum(c for c in async_connections if c)
+                )
+        return stats
+
+# Global instance
+http_clients = HttpClientRegistry()
@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
-from ..services.ai_service import AiService, LMSTUDIO_URL, HEADERS
-from ..services.query_classifier import QueryClassifier
+from ..services.ai_service import AiService
+from ..services.query_classifier import query_classifier
 from ..services.schedule_service import ScheduleService
 from ..services.exam_schedule_service import ExamScheduleService
 from ..services.ptit_auth_service import PTITAuthService
@@ -8,34 +8,45 @@ from ..services.ptit_api_service import ptit_api_service
 from ..services.ptit_cache_service import ptit_cache_service
 
 from ..utils.logger import Logger
+from ..utils.pipeline import StageTimings, pipeline_stats, stream_stats
+from ..utils.streaming import ResponseStream
+from ..utils.sse import parse_last_event_id, StreamEvent
 from ..lib.supabase import supabase
+import os
 import time
 from datetime import datetime, timedelta
 import json
 from ..config.agents import get_agent, get_all_agents
 from collections import Counter
-import httpx
 from flask import Response
-from ..services.lmstudio_service import parse_time_lmstudio
+from ..services.time_parser import aparse_time
 from ..services.file_service import FileService
-import threading
+from ..services.response_cache_service import response_cache
+from ..services.llm_router import llm_router
+from ..services.admission_control import admission_control, AdmissionRejected
+from ..services.context_packer import context_packer, token_counter, ContextSource, split_blocks
+from ..services.direct_answer_service import direct_answer_service
+from ..services.chat_stream_service import chat_stream_service, StreamNotFound
+from ..services.context_encoding import context_format_for, encode_schedule_table, encode_exam_table
 import asyncio
 import pytz
 import uuid
 
 chat_bp = Blueprint('chat', __name__)
+# Answers are sent as they are generated, proxies must not buffer them
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+# Schedule/exam questions are answered from a template instead of an LLM generation
+DIRECT_ANSWERS_ENABLED = os.getenv('CHAT_DIRECT_ANSWERS', 'true').lower() == 'true'
+# Categories answered from the student's PTIT data, the only ones that need a PTIT login
+PTIT_CATEGORIES = ('schedule', 'date_query', 'examschedule')
 ai_service = AiService()
 logger = Logger()
-query_classifier = QueryClassifier()
 schedule_service = ScheduleService()
 exam_schedule_service = ExamScheduleService()
-ptit_auth_service = PTITAuthService()
 file_service = FileService()
 
-# Initialize services with auth service and AI service
-schedule_service.set_auth_service(ptit_auth_service)
+# Initialize services with AI service, the PTIT session is created per request in run_chat
 schedule_service.set_ai_service(ai_service)
-exam_schedule_service.set_auth_service(ptit_auth_service)
 # Set the schedule_service in the exam_schedule_service for date extraction
 exam_schedule_service.set_schedule_service(schedule_service)
 
@@ -52,8 +63,57 @@ def get_agents():
 
 @chat_bp.route('/chat', methods=['POST'])
 async def chat():
+    """
+    Chat endpoint for WSGI servers. Under the ASGI app (app/asgi.py) POST /chat is served
+    by run_chat directly and the answer is relayed without holding a thread.
+    """
+    return to_flask_response(*await run_chat(request.json, request.remote_addr))
+
+@chat_bp.route('/chat/stream/<stream_id>', methods=['GET'])
+async def resume_chat_stream(stream_id):
+    """
+    Reconnect to an answer stream: replays the events after Last-Event-ID (header, or the
+    last_event_id query parameter) and keeps following the live generation.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    return to_flask_response(*await resume_chat(stream_id, last_event_id))
+
+def to_flask_response(body, status, headers):
+    """Flask response of a run_chat/resume_chat reply"""
+    if not isinstance(body, ResponseStream):
+        return jsonify(body), status, headers
+    response = Response(
+        body.iter_sync(), status=status, headers=dict(SSE_HEADERS, **headers), content_type='text/event-stream'
+    )
+    # Client gone before the first chunk: the generator never runs, the close callbacks still do
+    response.call_on_close(body.run_close_callbacks)
+    return response
+
+async def resume_chat(stream_id, last_event_id=None):
+    """
+    Follow an existing answer stream from an offset.
+
+    Returns:
+        tuple: (body, status, headers) like run_chat, 404/410 when the stream or offset is gone
+    """
+    try:
+        return await chat_stream_service.open(stream_id, parse_last_event_id(last_event_id)), 200, {}
+    except StreamNotFound as e:
+        return {'error': str(e)}, e.status_code, {}
+
+async def run_chat(data, remote_addr):
+    """
+    Answer a chat request, independent of the server interface.
+
+    Args:
+        data (dict): JSON body of POST /chat
+        remote_addr (str): Client address, fairness key when the body has no user_id
+
+    Returns:
+        tuple: (body, status, headers), body is a ResponseStream of answer chunks or a dict
+               to send as JSON (errors, admission rejections)
+    """
     try:
-        data = request.json
         file_ids = data.get('file_ids', [])  # Expect array of file IDs
         file_id = data.get('file_id')  # Keep backward compatibility
         message = data.get('message')
@@ -72,15 +132,17 @@ async def chat():
                 f"Model: {agent['model']}"
             )
         
-        # Classify query but don't exit early - let AI handle all categories
-        classification = query_classifier.classify_query(message)
-        # Log classification result
-        logger.log_with_timestamp(
-            "CLASSIFICATION", 
-            f"Category: {classification.get('category')}",
-            f"Method: {classification.get('method')}"
-        )
-        # Note: Removed early exit for 'other' category - let AI respond naturally
+        # Pre-generation pipeline: independent stages run concurrently, classification
+        # runs alongside the speculative work and only the category-specific stages wait for it
+        timings = StageTimings('chat')
+        creds = data.get('university_credentials')
+        
+        # Admission control: reject right away when the model queue is already full
+        user_key = data.get('user_id') or remote_addr
+        try:
+            admission_control.check(get_agent(agent_id)['model'], user_key)
+        except AdmissionRejected as e:
+            return admission_rejected_reply(e)
         
         # Prepare user query and no_thinking flag
         flag = ""
@@ -88,80 +150,242 @@ async def chat():
         if clean_message.strip().endswith("/no_thinking"):
             clean_message = clean_message.strip()[:-len("/no_thinking")].strip()
             flag = "/no_thinking"
-        # Build unified user prompt: start with clean user query
-        user_content = clean_message
         
-        # Add space prompt if we're in a space context
-        space_prompt = ""
-        if space_id:
+        # Handle backward compatibility with single file_id
+        if file_id:
+            file_ids = [file_id]
+        
+        # Generate or use existing chat session ID for caching
+        chat_session_id = chat_id if chat_id else str(uuid.uuid4())
+        # Own PTIT session: a shared one would hand this user's token to concurrent requests
+        ptit_session = PTITAuthService()
+        
+        def fetch_space_prompt():
             try:
                 space_result = supabase.table('spaces').select('prompt').eq('id', space_id).single().execute()
                 if space_result and hasattr(space_result, 'data') and space_result.data:
-                    space_prompt = space_result.data.get('prompt', '')
-                    if space_prompt:
-                        user_content = f"{space_prompt}\n\nUser message: {clean_message}"
-                        logger.log_with_timestamp(
-                            "SPACE_PROMPT",
-                            f"Applied space prompt for space {space_id}",
-                            f"Prompt length: {len(space_prompt)}"
-                        )
+                    return space_result.data.get('prompt', '') or ''
             except Exception as e:
                 logger.log_with_timestamp('SPACE_PROMPT_ERROR', f'Error fetching space prompt: {str(e)}')
+            return ''
         
-        # File context - handle both single file (backward compatibility) and multiple files
-        all_file_chunks = []
-        processed_files = []
-        
-        # Handle backward compatibility with single file_id
-        if file_id:
-            file_ids = [file_id]
-        
-        # Get space files if we're in a space context
-        space_file_ids = []
-        if space_id:
+        def fetch_space_file_ids():
             try:
                 space_files = supabase.table('user_files').select('id').eq('space_id', space_id).eq('status', 'ready').execute()
                 if space_files.data:
-                    space_file_ids = [f['id'] for f in space_files.data]
+                    ids = [f['id'] for f in space_files.data]
                     logger.log_with_timestamp(
                         "SPACE_FILES", 
-                        f"Found {len(space_file_ids)} files in space {space_id}"
+                        f"Found {len(ids)} files in space {space_id}"
                     )
+                    return ids
             except Exception as e:
                 logger.log_with_timestamp('SPACE_FILES_ERROR', f'Error fetching space files: {str(e)}')
+            return []
         
-        # Combine chat-specific files with space files
-        all_file_ids = []
-        if file_ids:
-            all_file_ids.extend(file_ids)
-        if space_file_ids:
-            all_file_ids.extend(space_file_ids)
-        
-        if all_file_ids:
-            file_service = FileService()
-            for current_file_id in all_file_ids:
-                chunks = file_service.search_relevant_chunks_in_supabase(message, current_file_id)
-                if chunks:
-                    all_file_chunks.extend(chunks)
-                    processed_files.append(current_file_id)
-                    
-            # Log file chunks count and sample
+        async def retrieve_file_chunks(space_files_task):
+            # Chat files plus the files of the space
+            space_file_ids = await space_files_task if space_files_task else []
+            all_file_ids = list(file_ids or []) + space_file_ids
+            if not all_file_ids:
+                return all_file_ids, [], []
+            # Embed once, search every file concurrently and keep the global top-k by similarity
+            chunks, processed = await timings.thread(
+                'retrieval', file_service.search_relevant_chunks_multi, message, all_file_ids
+            )
             logger.log_with_timestamp(
                 "FILE_CHUNKS",
-                f"Found {len(all_file_chunks)} chunks across {len(processed_files)} files (chat: {len(file_ids or [])}, space: {len(space_file_ids)})",
-                str(all_file_chunks[:3])
+                f"Found {len(chunks)} chunks across {len(processed)} files (chat: {len(file_ids or [])}, space: {len(space_file_ids)})",
+                str(chunks[:3])
             )
-            
-            if all_file_chunks:
-                user_content += "\n\nRelevant file excerpts:\n" + "\n\n---\n\n".join(all_file_chunks)
-            else:
-                user_content += "\n\n[FILE_QUERY] Không tìm thấy đoạn văn phù hợp trong các file đã tải lên."
-        # Web search context with LLM query optimization
+            return all_file_ids, chunks, processed
+        
+        async def open_ptit_session():
+            # Speculative: login and semester lookup start before the category is known
+            success, err = await timings.thread(
+                'ptit_login', ptit_session.login, creds['university_username'], creds['university_password']
+            )
+            if not success:
+                logger.log_with_timestamp('PTIT_LOGIN_ERROR', f'Login failed: {err}')
+                return None
+            current_sem, from_cache = await ptit_api_service.get_current_semester_with_cache(chat_session_id, ptit_session)
+            cache_status = "📋 [CACHED]" if from_cache else "🔄 [API]"
+            logger.log_with_timestamp('PTIT_SEMESTER', f'{cache_status} Semester retrieved')
+            return current_sem
+        
+        async def save_user_message():
+            try:
+                # Save the original user message (before adding context/space prompt)
+                # The Supabase insert blocks, keep it off the shared event loop
+                message_id = await asyncio.to_thread(
+                    ai_service.web_search_service.save_message_with_sources_sync,
+                    chat_id, 'user', clean_message, None
+                )
+                logger.log_with_timestamp('MESSAGE_SAVE', f'Saved original user message (without space prompt)')
+                return message_id
+            except Exception as e:
+                logger.log_with_timestamp('MESSAGE_SAVE_ERROR', f'Error saving user message: {str(e)}')
+                return None
+        
+        # Classify query but don't exit early - let AI handle all categories
+        classify_task = timings.task('classify', query_classifier.aclassify_query(message))
+        space_prompt_task = timings.task('space_prompt', asyncio.to_thread(fetch_space_prompt)) if space_id else None
+        space_files_task = timings.task('space_files', asyncio.to_thread(fetch_space_file_ids)) if space_id else None
+        retrieval_task = asyncio.ensure_future(retrieve_file_chunks(space_files_task))
+        web_search_task = None
         if web_search_enabled:
-            agent_cfg = get_agent(agent_id)
-            search_data = await ai_service.web_search_service.search_with_optimization(
-                message, agent_cfg['model'], chat_id, save_to_db=True
+            # Web search context with LLM query optimization
+            web_search_task = timings.task('web_search', ai_service.web_search_service.search_with_optimization(
+                message, get_agent(agent_id)['model'], chat_id, save_to_db=True
+            ))
+        ptit_task = None
+        if creds and query_classifier.rules_category(message) in PTIT_CATEGORIES:
+            # The keyword rules already point to PTIT data: log in while the classifier runs
+            ptit_task = timings.task('ptit_session', open_ptit_session())
+        save_user_task = timings.task('save_user_message', save_user_message()) if chat_id else None
+        
+        classification = await classify_task
+        # Log classification result
+        logger.log_with_timestamp(
+            "CLASSIFICATION", 
+            f"Category: {classification.get('category')}",
+            f"Method: {classification.get('method')} | {classification.get('latency_ms')} ms"
+        )
+        # Note: Removed early exit for 'other' category - let AI respond naturally
+        category = classification.get('category', 'general')
+        if creds and not ptit_task and category in PTIT_CATEGORIES:
+            ptit_task = timings.task('ptit_session', open_ptit_session())
+        
+        async def fetch_schedule():
+            if 'time_info' in classification:
+                # Fused classifier call already extracted the time expression
+                time_info, current_sem = classification['time_info'], await ptit_task
+            else:
+                # Time parsing runs while the PTIT session is still being opened
+                time_info, current_sem = await asyncio.gather(
+                    timings.stage('time_parse', aparse_time(message)), ptit_task
+                )
+            logger.log_with_timestamp(
+                "TIME_PARSER",
+                f"Type: {time_info.get('type')}",
+                f"Value: {time_info.get('value')}"
+            )
+            if not current_sem:
+                return time_info, None
+            # Get schedule data with cache
+            schedule_data, from_cache = await ptit_api_service.get_schedule_with_cache(
+                chat_session_id, time_info, current_sem.get('hoc_ky'), schedule_service, ptit_session
+            )
+            cache_status = "📋 [CACHED]" if from_cache else "🔄 [API]"
+            logger.log_with_timestamp('PTIT_SCHEDULE', f'{cache_status} Schedule retrieved')
+            return time_info, schedule_data
+        
+        async def fetch_exams():
+            current_sem = await ptit_task
+            if not current_sem:
+                return None, None
+            semester = current_sem.get('hoc_ky')
+            if category == 'date_query':
+                # Determine if it's specific exam query or general
+                is_specific_subject = bool(classification.get('subjects')) or any(
+                    keyword in message.lower() for keyword in ['môn', 'subject', 'ai', 'machine learning', 'python']
+                )
+                if is_specific_subject:
+                    # Specific subject exam query with cache
+                    exam_data, from_cache = await ptit_api_service.get_exams_with_cache(
+                        chat_session_id, message, semester, exam_schedule_service,
+                        time_info=classification.get('time_info'), subjects=classification.get('subjects'),
+                        auth_service=ptit_session
+                    )
+                else:
+                    # General exam schedule query with cache
+                    exam_data, from_cache = await ptit_api_service.get_all_exams_with_cache(
+                        chat_session_id, semester, exam_schedule_service, ptit_session
+                    )
+                query_type = 'specific' if is_specific_subject else 'general'
+            else:
+                # Full exam schedule with cache
+                exam_data, from_cache = await ptit_api_service.get_all_exams_with_cache(
+                    chat_session_id, semester, exam_schedule_service, ptit_session
+                )
+                query_type = 'full_schedule'
+            cache_status = "📋 [CACHED]" if from_cache else "🔄 [API]"
+            logger.log_with_timestamp('PTIT_EXAMS', f'{cache_status} Exam data retrieved')
+            return query_type, exam_data
+        
+        schedule_task = exam_task = None
+        if category in ('date_query', 'examschedule'):
+            logger.log_with_timestamp('CREDENTIALS_CHECK_EXAM', f'Credentials provided: {bool(creds)}')
+        if ptit_task:
+            # Schedule context (only parse time for schedule), exam context for date_query/examschedule
+            if category == 'schedule':
+                schedule_task = timings.task('schedule', fetch_schedule())
+            if category in ('date_query', 'examschedule'):
+                exam_task = timings.task('exams', fetch_exams())
+            if not (schedule_task or exam_task):
+                # Rules and classifier disagree, the session is not needed
+                ptit_task.cancel()
+        
+        space_prompt = await space_prompt_task if space_prompt_task else ''
+        all_file_ids, all_file_chunks, processed_files = await retrieval_task
+        search_data = await web_search_task if web_search_task else None
+        time_info, schedule_data = await schedule_task if schedule_task else (None, None)
+        exam_query_type, exam_data = await exam_task if exam_task else (None, None)
+        
+        async def save_assistant_message(full_response, sources):
+            """
+            Save the assistant message with its sources, part of the stream: the final 'done'
+            event carries the id, so the client does not have to reload the chat.
+            The Supabase client blocks, the insert runs in a worker thread.
+            """
+            if not (chat_id and full_response):
+                return None
+            try:
+                message_id = await asyncio.to_thread(
+                    ai_service.web_search_service.save_message_with_sources_sync,
+                    chat_id, 'assistant', full_response, sources
+                )
+                logger.log_with_timestamp('MESSAGE_SAVE', f'Saved assistant message {message_id} with {len(sources) if sources else 0} sources')
+                return message_id
+            except Exception as e:
+                logger.log_with_timestamp('MESSAGE_SAVE_ERROR', f'Error saving assistant message: {str(e)}')
+                return None
+        
+        # Direct answer: for schedule/exam questions the data already is the answer, render it
+        # instead of having the LLM retype it. polish=true, or extra context the template cannot
+        # use (files, web results, a space prompt), keeps the LLM path.
+        direct_answer = None
+        if DIRECT_ANSWERS_ENABLED and not data.get('polish') and not (all_file_ids or search_data or space_prompt):
+            direct_answer = direct_answer_service.render(category, schedule_data, exam_query_type, exam_data)
+        if direct_answer:
+            user_message_id = await save_user_task if save_user_task else None
+            timings.pipeline = 'chat-direct'
+            pipeline_stats.record(timings)
+            logger.log_with_timestamp(
+                'DIRECT_ANSWER',
+                f'Rendered {category} answer in {timings.elapsed_ms()} ms',
+                json.dumps(timings.stages)
             )
+            
+            async def stream_direct():
+                started = time.perf_counter()
+                for event in stream_preamble(timings, category):
+                    yield event
+                for i, block in enumerate(direct_answer):
+                    yield block if i == 0 else "\n\n" + block
+                message_id = await save_assistant_message("\n\n".join(direct_answer), None)
+                yield stream_done(timings, started, message_id, user_message_id)
+            return chat_stream_service.follow(chat_stream_service.start(stream_direct())), 200, {}
+        
+        # Prepare system prompt with category awareness and XML guidance
+        agent_cfg = get_agent(agent_id)
+        context_format = context_format_for(agent_cfg['model'])
+        system_content = build_system_prompt(category, context_format)
+        
+        # Web search context
+        web_results = None
+        formatted_results = []
+        if search_data:
             web_results = search_data['results']
             optimized_query = search_data['optimized_query']
             
@@ -174,139 +398,109 @@ async def chat():
             
             if web_results:
                 # Hiển thị kết quả web search với format rõ ràng hơn, bao gồm nội dung đã scrape
-                formatted_results = []
                 for i, r in enumerate(web_results):
                     result_text = f"### {i+1}. {r['title']}\n\n{r['snippet']}"
                     # Thêm nội dung đã scrape nếu có
                     if 'scraped_content' in r and r['scraped_content']:
                         result_text += f"\n\n**Nội dung từ trang web**:\n{r['scraped_content']}"
                     formatted_results.append(result_text)
-                
-                formatted = "\n\n".join(formatted_results)
-                user_content += f"\n\n## Web search results\n**Query used**: '{optimized_query}'\n\n" + formatted
-        # Generate or use existing chat session ID for caching
-        chat_session_id = chat_id if chat_id else str(uuid.uuid4())
         
-        # Schedule context (only parse time for schedule/date_query)
-        if classification.get('category') in ('schedule','date_query'):
+        sched_text = ''
+        if category in ('schedule','date_query') and schedule_data:
+            if not isinstance(schedule_data, dict):
+                sched_text = str(schedule_data)
+            elif context_format == 'table':
+                sched_text = encode_schedule_table(schedule_data)
+            else:
+                sched_text = schedule_data.get('schedule_text', '')
+        exam_txt = ''
+        if category in ('date_query','examschedule') and exam_data:
+            if context_format == 'table':
+                exam_txt = encode_exam_table(exam_data.get('exams_list', []))
+            else:
+                exam_txt = exam_data.get('exam_text', '')
+        
+        # Fit the context into the agent's context window: sources are packed by priority,
+        # each one capped to a share of the budget and cut at chunk/result/day boundaries
+        time_context = format_current_time_context()
+        time_blocks = (category in ('schedule','date_query')) + (category in ('date_query','examschedule'))
+        context_budget = context_packer.budget_for(
+            agent_cfg['model'], system_content, clean_message, time_context * time_blocks, flag
+        )
+        packed = context_packer.pack([
+            ContextSource('space_prompt', split_blocks(space_prompt), priority=0, share=0.25),
+            ContextSource('schedule', split_blocks(sched_text), priority=1, share=0.6),
+            ContextSource('exams', split_blocks(exam_txt), priority=1, share=0.6),
+            ContextSource('files', all_file_chunks, priority=2, share=0.7, separator="\n\n---\n\n"),
+            ContextSource('web', formatted_results, priority=3, share=0.6),
+        ], context_budget, agent_cfg['model'])
+        logger.log_with_timestamp(
+            'CONTEXT_PACKER',
+            f'{packed.tokens}/{packed.budget} context tokens for {agent_cfg["model"]}',
+            f'Dropped: {packed.dropped}' if packed.dropped else None
+        )
+        space_prompt = packed.text('space_prompt')
+        file_chunks = packed.units['files']
+        sched_text = packed.text('schedule')
+        exam_txt = packed.text('exams')
+        
+        # Build unified user prompt: start with clean user query
+        user_content = clean_message
+        
+        # Add space prompt if we're in a space context
+        if space_prompt:
+            user_content = f"{space_prompt}\n\nUser message: {clean_message}"
+            logger.log_with_timestamp(
+                "SPACE_PROMPT",
+                f"Applied space prompt for space {space_id}",
+                f"Prompt length: {len(space_prompt)}"
+            )
+        
+        # Data given to the model besides the question, used to fingerprint cached answers
+        context_parts = [space_prompt]
+        
+        # File context
+        if all_file_ids:
+            if file_chunks:
+                user_content += "\n\nRelevant file excerpts:\n" + "\n\n---\n\n".join(file_chunks)
+            else:
+                user_content += "\n\n[FILE_QUERY] Không tìm thấy đoạn văn phù hợp trong các file đã tải lên."
+        if packed.units['web']:
+            formatted = packed.text('web')
+            user_content += f"\n\n## Web search results\n**Query used**: '{optimized_query}'\n\n" + formatted
+        
+        if category in ('schedule','date_query'):
             # Add current time information for schedule queries with XML tags
-            current_time = get_vietnam_current_time()
-            user_content += f"\n\n<current_time>\n"
-            user_content += f"<today_info>\n"
-            user_content += f"Hôm nay là {current_time['weekday']}, ngày {current_time['date']}\n"
-            user_content += f"Giờ hiện tại: {current_time['time']}\n"
-            user_content += f"</today_info>\n"
-            user_content += f"</current_time>\n"
+            user_content += time_context
             
-            creds = data.get('university_credentials')
-            if creds:
-                success, err = ptit_auth_service.login(
-                    creds['university_username'], creds['university_password']
-                )
-                
-                if success:
-                    # Get current semester with cache
-                    current_sem, from_cache = await ptit_api_service.get_current_semester_with_cache(chat_session_id, ptit_auth_service)
-                    cache_status = "📋 [CACHED]" if from_cache else "🔄 [API]"
-                    logger.log_with_timestamp('PTIT_SEMESTER', f'{cache_status} Semester retrieved')
-                    
-                    if current_sem and classification.get('category') == 'schedule':
-                        # Parse time query (always executed, not cached)
-                        time_info = parse_time_lmstudio(message)
-                        logger.log_with_timestamp(
-                            "TIME_PARSER",
-                            f"Type: {time_info.get('type')}",
-                            f"Value: {time_info.get('value')}"
-                        )
-                        
-                        # Get schedule data with cache
-                        schedule_data, from_cache = await ptit_api_service.get_schedule_with_cache(
-                            chat_session_id, time_info, current_sem.get('hoc_ky'), schedule_service
-                        )
-                        cache_status = "📋 [CACHED]" if from_cache else "🔄 [API]"
-                        logger.log_with_timestamp('PTIT_SCHEDULE', f'{cache_status} Schedule retrieved')
-                        
-                        if schedule_data:
-                            sched_text = schedule_data.get('schedule_text', '') if isinstance(schedule_data, dict) else str(schedule_data)
-                            user_content += "\n<class_schedule>\n"
-                            user_content += f"<query_type>{time_info.get('type', 'unknown')}</query_type>\n"
-                            user_content += f"<query_value>{time_info.get('value', 'unknown')}</query_value>\n"
-                            user_content += f"<schedule_data>\n{sched_text}\n</schedule_data>\n"
-                            user_content += "</class_schedule>"
-
-        # Exam context: date_query should fetch filtered exams, examschedule fetch full schedule
-        if classification.get('category') in ('date_query','examschedule'):
+            if schedule_data:
+                context_parts.append(sched_text)
+                user_content += "\n<class_schedule>\n"
+                user_content += f"<query_type>{time_info.get('type', 'unknown')}</query_type>\n"
+                user_content += f"<query_value>{time_info.get('value', 'unknown')}</query_value>\n"
+                user_content += f"<schedule_data>\n{sched_text}\n</schedule_data>\n"
+                user_content += "</class_schedule>"
+        
+        if category in ('date_query','examschedule'):
             # Add current time information for exam schedule queries with XML tags
-            current_time = get_vietnam_current_time()
-            user_content += f"\n\n<current_time>\n"
-            user_content += f"<today_info>\n"
-            user_content += f"Hôm nay là {current_time['weekday']}, ngày {current_time['date']}\n"
-            user_content += f"Giờ hiện tại: {current_time['time']}\n"
-            user_content += f"</today_info>\n"
-            user_content += f"</current_time>\n"
-            
-            creds = data.get('university_credentials')
-            logger.log_with_timestamp('CREDENTIALS_CHECK_EXAM', f'Credentials provided: {bool(creds)}')
+            user_content += time_context
             
-            if creds:
-                logger.log_with_timestamp('CREDENTIALS_CHECK_EXAM', f'Username: {creds.get("university_username", "N/A")}')
-                success, err = ptit_auth_service.login(
-                    creds['university_username'], creds['university_password']
-                )
-                
-                if success:
-                    # Get current semester with cache
-                    current_sem, from_cache = await ptit_api_service.get_current_semester_with_cache(chat_session_id, ptit_auth_service)
-                    cache_status = "📋 [CACHED]" if from_cache else "🔄 [API]"
-                    logger.log_with_timestamp('PTIT_SEMESTER', f'{cache_status} Semester retrieved')
-                    
-                    if current_sem:
-                        semester = current_sem.get('hoc_ky')
-                        
-                        if classification.get('category') == 'date_query':
-                            # Determine if it's specific exam query or general
-                            exam_keywords = ['thi', 'exam', 'kiểm tra', 'test']
-                            is_specific_subject = any(keyword in message.lower() for keyword in ['môn', 'subject', 'ai', 'machine learning', 'python'])
-                            
-                            if is_specific_subject:
-                                # Specific subject exam query with cache
-                                exam_data, from_cache = await ptit_api_service.get_exams_with_cache(
-                                    chat_session_id, message, semester, exam_schedule_service
-                                )
-                            else:
-                                # General exam schedule query with cache
-                                exam_data, from_cache = await ptit_api_service.get_all_exams_with_cache(
-                                    chat_session_id, semester, exam_schedule_service
-                                )
-                            
-                            cache_status = "📋 [CACHED]" if from_cache else "🔄 [API]"
-                            logger.log_with_timestamp('PTIT_EXAMS', f'{cache_status} Exam data retrieved')
-                            
-                            if exam_data:
-                                exam_txt = exam_data.get('exam_text', '')
-                                exams_list = exam_data.get('exams_list', [])
-                                user_content += "\n<exam_schedule>\n"
-                                user_content += f"<query_type>{'specific' if is_specific_subject else 'general'}</query_type>\n"
-                                user_content += f"<exam_count>{len(exams_list)}</exam_count>\n"
-                                user_content += f"<exam_data>\n{exam_txt}\n</exam_data>\n"
-                                user_content += "</exam_schedule>"
-                        
-                        elif classification.get('category') == 'examschedule':
-                            # Full exam schedule with cache
-                            exam_data, from_cache = await ptit_api_service.get_all_exams_with_cache(
-                                chat_session_id, semester, exam_schedule_service
-                            )
-                            cache_status = "📋 [CACHED]" if from_cache else "🔄 [API]"
-                            logger.log_with_timestamp('PTIT_EXAMS', f'{cache_status} Full exam schedule retrieved')
-                            
-                            if exam_data:
-                                exam_txt = exam_data.get('exam_text', '')
-                                exams_list = exam_data.get('exams_list', [])
-                                user_content += "\n<exam_schedule>\n"
-                                user_content += f"<query_type>full_schedule</query_type>\n"
-                                user_content += f"<exam_count>{len(exams_list)}</exam_count>\n"
-                                user_content += f"<exam_data>\n{exam_txt}\n</exam_data>\n"
-                                user_content += "</exam_schedule>"
+            if exam_data:
+                context_parts.append(exam_txt)
+                exams_list = exam_data.get('exams_list', [])
+                user_content += "\n<exam_schedule>\n"
+                user_content += f"<query_type>{exam_query_type}</query_type>\n"
+                user_content += f"<exam_count>{len(exams_list)}</exam_count>\n"
+                user_content += f"<exam_data>\n{exam_txt}\n</exam_data>\n"
+                user_content += "</exam_schedule>"
+        
+        user_message_id = await save_user_task if save_user_task else None
+        pipeline_stats.record(timings)
+        logger.log_with_timestamp(
+            'PIPELINE',
+            f'Context ready in {timings.elapsed_ms()} ms',
+            json.dumps(timings.stages)
+        )
 
         # Append no_thinking flag at the end if present
         if flag:
@@ -318,50 +512,6 @@ async def chat():
             f"Category: {classification.get('category')}"
         )
 
-        # Prepare system prompt with category awareness and XML guidance
-        category = classification.get('category', 'general')
-        if category == 'other':
-            system_content = (
-                "You are a helpful AI assistant. While you primarily focus on educational topics, "
-                "you can also provide polite, brief responses to non-educational questions when appropriate. "
-                "If the question is clearly off-topic or inappropriate, you may politely redirect to educational topics. "
-                "Answer based on context when provided, otherwise use your general knowledge appropriately."
-            )
-        elif category in ('schedule', 'date_query', 'examschedule'):
-            system_content = (
-                "<role>You are a dedicated study assistant for university students in Vietnam specializing in academic schedule and exam information.</role>\n\n"
-                "<instructions>\n"
-                "- Analyze the provided XML-structured data carefully and use ALL information available\n"
-                "- Use ONLY the information provided in the <class_schedule>, <exam_schedule>, and <current_time> tags\n"
-                "- ALWAYS provide COMPLETE and COMPREHENSIVE responses that include ALL details from the data\n"
-                "- For schedule queries: Include ALL class details - subject name (both Vietnamese and English), time slots, room, instructor name with ID, credits, dates\n"
-                "- For exam queries: Include ALL exam details - subject name, exam type, format, time, weekday, date, room, location\n"
-                "- When user asks follow-up questions, refer to the conversation history to provide context and complete answers\n"
-                "- Always reference the current time context when explaining relative dates (today, tomorrow, next week)\n"
-                "- Use Vietnamese language naturally and professionally\n"
-                "- Organize information logically with clear headings, bullet points, and structured formatting\n"
-                "- Never provide partial information - if data is available, include it ALL\n"
-                "- Do not add or fabricate any information not present in the provided XML data\n"
-                "</instructions>\n\n"
-                "<response_format>\n"
-                "- NEVER start with summary, overview, or any introductory text\n"
-                "- Begin immediately with the specific information requested\n"
-                "- Do NOT use phrases like 'summary:', 'tóm tắt:', 'overview:', or similar introductory words\n"
-                "- Present ALL information from the provided data in a clear, organized format\n"
-                "- Use headers, lists, and bullet points to structure the complete information\n"
-                "- Include every single detail available in the data - subject names, times, rooms, instructors, credits, etc.\n"
-                "- Organize by date/time chronologically when showing multiple items\n"
-                "- End with brief helpful context only if relevant\n"
-                "- If user asks follow-up questions, check conversation history and provide complete context\n"
-                "</response_format>"
-            )
-        else:
-            system_content = (
-                "You are a dedicated study assistant for university students in Vietnam. "
-                "Provide clear, helpful answers based only on the provided context and focus strictly on the user's question. "
-                "Do not add or fabricate any information not present in the context."
-            )
-            
         system_message = {
             'role': 'system',
             'content': system_content
@@ -379,41 +529,81 @@ async def chat():
             "Skipping conversation history - sending only system prompt and current query"
         )
         # Handle streaming response
-        agent_cfg = get_agent(agent_id)
         payload = {
             'model': agent_cfg['model'],
             'messages': messages,
             'temperature': 0.2,
-            'stream': True
+            'stream': True,
+            # Final chunk carries usage.prompt_tokens, used to calibrate the token estimate
+            'stream_options': {'include_usage': True}
         }
-        # Log raw payload sent to LM Studio (full content)
-        print(f"[{Logger.get_timestamp()}] LMSTUDIO_PAYLOAD: {json.dumps(payload, ensure_ascii=False, indent=2)}")
-        
-        # Save user message to database first
-        if chat_id:
-            try:
-                # Save the original user message (before adding context/space prompt)
-                original_user_message = clean_message
-                await ai_service.web_search_service.save_message_with_sources(
-                    chat_id, 'user', original_user_message, None
-                )
-                logger.log_with_timestamp('MESSAGE_SAVE', f'Saved original user message (without space prompt)')
-            except Exception as e:
-                logger.log_with_timestamp('MESSAGE_SAVE_ERROR', f'Error saving user message: {str(e)}')
+        # Raw payload sent to LM Studio (full content, includes the student's schedule): debug only
+        if logger.debug_enabled():
+            logger.debug('LMSTUDIO_PAYLOAD', json.dumps(payload, ensure_ascii=False, indent=2))
         
         # Store web search results for later saving
         web_search_sources = None
         if web_search_enabled and web_results:
             web_search_sources = web_results
         
-        def generate():
+        # Semantic response cache: web results change over time, so those answers are never cached
+        cache_fingerprint = None
+        query_embedding = None
+        if response_cache.enabled and not web_search_enabled:
+            try:
+                # SentenceTransformer encode on a cache miss: keep it off the shared event loop
+                query_embedding = await asyncio.to_thread(file_service.embed_query, clean_message)
+                cache_fingerprint = response_cache.build_fingerprint(
+                    agent_cfg['model'], category, space_id, all_file_ids, context_parts + file_chunks, flag,
+                    user_key=user_key
+                )
+                cached = response_cache.lookup(cache_fingerprint, query_embedding, clean_message)
+            except Exception as e:
+                logger.log_with_timestamp('RESPONSE_CACHE_ERROR', f'Cache lookup failed: {str(e)}')
+                cache_fingerprint = None
+                cached = None
+            if cached:
+                logger.log_with_timestamp(
+                    'RESPONSE_CACHE',
+                    f'Cache HIT for category {category}',
+                    f'Similarity: {cached["similarity"]:.3f}'
+                )
+                
+                async def replay():
+                    started = time.perf_counter()
+                    for event in stream_preamble(timings, category, agent_cfg['model'], cached['sources'], cached=True):
+                        yield event
+                    answer = cached['answer']
+                    # Replay in small pieces so the client renders it like a live stream
+                    for i in range(0, len(answer), 64):
+                        yield answer[i:i+64]
+                    message_id = await save_assistant_message(answer, cached['sources'])
+                    yield stream_done(timings, started, message_id, user_message_id, cached['sources'])
+                return chat_stream_service.follow(chat_stream_service.start(replay())), 200, {}
+        
+        # Wait for a generation slot before answering, so a saturated model gives 429/503, not a dead stream
+        try:
+            ticket = await admission_control.aacquire(agent_cfg['model'], user_key)
+        except AdmissionRejected as e:
+            return admission_rejected_reply(e)
+        if ticket.waited_ms:
+            logger.log_with_timestamp('ADMISSION', f'Waited {ticket.waited_ms} ms for a {agent_cfg["model"]} slot')
+        
+        async def generate():
             full_response = ""
+            stream_failed = False
+            cancelled = False
+            # Content deltas, replaced by usage.completion_tokens when the backend sends it
+            completion_tokens = 0
+            stream_started = time.perf_counter()
             try:
+                for event in stream_preamble(timings, category, agent_cfg['model'], web_search_sources):
+                    yield event
                 logger.log_with_timestamp('STREAMING', 'Starting LM Studio request...')
-                with httpx.stream('POST', LMSTUDIO_URL, headers=HEADERS, json=payload, timeout=60) as r:
-                    logger.log_with_timestamp('STREAMING', f'Response status: {r.status_code}')
+                async with llm_router.astream(payload, timeout=60) as r:
+                    logger.log_with_timestamp('STREAMING', f'Response status: {r.status_code}', f'Backend: {r.backend.name}')
                     r.raise_for_status()
-                    for line in r.iter_lines():
+                    async for line in r.aiter_lines():
                         if not line: continue
                         d = line.decode('utf-8') if isinstance(line,(bytes,bytearray)) else line
                         if d.startswith('data: '):
@@ -423,46 +613,67 @@ async def chat():
                                 break
                             try:
                                 obj = json.loads(part)
+                                if obj.get('usage') and not obj.get('choices'):
+                                    token_counter.observe(
+                                        agent_cfg['model'], system_content + user_content,
+                                        obj['usage'].get('prompt_tokens')
+                                    )
+                                    completion_tokens = obj['usage'].get('completion_tokens') or completion_tokens
+                                    continue
                                 delta = obj['choices'][0].get('delta',{})
                                 text = delta.get('content')
                                 if text: 
                                     full_response += text
+                                    completion_tokens += 1
                                     yield text
                             except Exception as e:
                                 logger.log_with_timestamp('STREAMING_ERROR', f'Error parsing line: {str(e)}')
+            except (asyncio.CancelledError, GeneratorExit):
+                # No client followed the stream within the resume grace: leaving the 'async with'
+                # closed the upstream request, the backend stops generating and the slot is given back below
+                cancelled = True
+                raise
             except Exception as e:
+                stream_failed = True
                 logger.log_with_timestamp('STREAMING_ERROR', f'Error during streaming: {str(e)}')
-                yield f"data: Lỗi khi gọi AI: {str(e)}\n\n"
+                yield f"Lỗi khi gọi AI: {str(e)}"
+            finally:
+                ticket.release()
+                elapsed = time.perf_counter() - stream_started
+                if cancelled:
+                    tokens_saved, seconds_saved = stream_stats.record_cancelled(agent_cfg['model'], completion_tokens, elapsed)
+                    logger.log_with_timestamp(
+                        'STREAMING',
+                        f'Stream cancelled after {completion_tokens} tokens, upstream stream closed',
+                        f'Saved ~{tokens_saved} tokens / {seconds_saved:.1f}s of generation'
+                    )
+                elif not stream_failed:
+                    stream_stats.record_completed(agent_cfg['model'], completion_tokens, elapsed)
+                    # Only complete answers are reusable
+                    if cache_fingerprint and full_response:
+                        response_cache.store(
+                            cache_fingerprint, query_embedding, full_response, category,
+                            web_search_sources, all_file_ids, space_id, question=clean_message
+                        )
+                
+                if cancelled:
+                    # Nobody is left to receive 'done', the partial answer is saved in the background
+                    asyncio.ensure_future(save_assistant_message(full_response, web_search_sources))
             
-            # Save assistant message with sources after streaming is complete
-            if chat_id and full_response:
-                try:
-                    # Create a background task to save the message
-                    def save_message():
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        try:
-                            loop.run_until_complete(
-                                ai_service.web_search_service.save_message_with_sources(
-                                    chat_id, 'assistant', full_response, web_search_sources
-                                )
-                            )
-                            logger.log_with_timestamp('MESSAGE_SAVE', f'Saved assistant message with {len(web_search_sources) if web_search_sources else 0} sources')
-                        except Exception as e:
-                            logger.log_with_timestamp('MESSAGE_SAVE_ERROR', f'Error saving assistant message: {str(e)}')
-                        finally:
-                            loop.close()
-                    
-                    # Run in background thread
-                    thread = threading.Thread(target=save_message)
-                    thread.start()
-                except Exception as e:
-                    logger.log_with_timestamp('MESSAGE_SAVE_ERROR', f'Error starting save thread: {str(e)}')
-        return Response(generate(), content_type='text/event-stream')
+            # Save assistant message with sources after streaming ends, then close the stream with its id
+            message_id = await save_assistant_message(full_response, web_search_sources)
+            yield stream_done(
+                timings, stream_started, message_id, user_message_id, web_search_sources,
+                completion_tokens=completion_tokens
+            )
+        # The generation runs in the background and the response follows it, a dropped connection
+        # can resume with Last-Event-ID. The slot is given back even if the producer never starts.
+        stream_id = chat_stream_service.start(generate(), on_close=[ticket.release])
+        return chat_stream_service.follow(stream_id), 200, {}
         
     except Exception as e:
         logger.log_with_timestamp('ERROR', str(e))
-        return jsonify({'error': str(e)}), 500
+        return {'error': str(e)}, 500, {}
 
 @chat_bp.route('/chat/messages', methods=['GET'])
 async def get_chat_messages():
@@ -575,4 +786,131 @@ def get_vietnam_current_time():
         'time': time_str,
         'weekday': weekday_vn,
         'datetime_obj': now
-    }
\ No newline at end of file
+    }
+def format_current_time_context():
+    """Current Vietnam time as the <current_time> block added to schedule and exam prompts"""
+    current_time = get_vietnam_current_time()
+    return (
+        f"\n\n<current_time>\n"
+        f"<today_info>\n"
+        f"Hôm nay là {current_time['weekday']}, ngày {current_time['date']}\n"
+        f"Giờ hiện tại: {current_time['time']}\n"
+        f"</today_info>\n"
+        f"</current_time>\n"
+    )
+
+def admission_rejected_reply(error):
+    """429/503 (body, status, headers) with Retry-After for a request the admission control turned away"""
+    return (
+        {'error': str(error), 'retry_after': error.retry_after},
+        error.status_code,
+        {'Retry-After': str(error.retry_after)}
+    )
+
+def format_sources(sources):
+    """Web search results as sent to the client and saved with the message"""
+    return [
+        {'title': s.get('title', 'Untitled'), 'url': s.get('url', '#'), 'snippet': s.get('snippet', '')}
+        for s in sources or [] if isinstance(s, dict)
+    ]
+
+def stream_preamble(timings, category, model=None, sources=None, cached=False):
+    """
+    Typed events sent ahead of the answer text.
+
+    Args:
+        timings (StageTimings): Pre-generation timings of the request
+        category (str): Question category
+        model (str, optional): Model answering, None for template answers
+        sources (list, optional): Web search results the answer is based on
+        cached (bool): Answer replayed from the response cache
+
+    Returns:
+        list: 'metadata' event, then a 'sources' event when there are sources
+    """
+    events = [StreamEvent('metadata', {
+        'category': category,
+        'model': model,
+        'pipeline': timings.pipeline,
+        'cached': cached,
+        'context_ms': timings.elapsed_ms(),
+        'stages': timings.stages
+    })]
+    if sources:
+        events.append(StreamEvent('sources', {'sources': format_sources(sources)}))
+    return events
+
+def stream_done(timings, started, message_id, user_message_id, sources=None, completion_tokens=None):
+    """
+    Final event of an answer stream, sent once the assistant message is saved.
+
+    Args:
+        timings (StageTimings): Timings of the request
+        started (float): perf_counter() when the answer started streaming
+        message_id: Id of the saved assistant message, None when it was not saved
+        user_message_id: Id of the saved user message
+        sources (list, optional): Web search results saved with the message
+        completion_tokens (int, optional): Tokens generated by the model
+
+    Returns:
+        StreamEvent: 'done', the stream service adds the status
+    """
+    return StreamEvent('done', {
+        'message_id': message_id,
+        'user_message_id': user_message_id,
+        'sources': format_sources(sources),
+        'timing': {
+            'answer_ms': round((time.perf_counter() - started) * 1000, 1),
+            'total_ms': timings.elapsed_ms(),
+            'completion_tokens': completion_tokens
+        }
+    })
+
+def build_system_prompt(category, context_format='text'):
+    """System prompt for the query category (schedule/exam prompts expect the XML context)"""
+    if category == 'other':
+        return (
+            "You are a helpful AI assistant. While you primarily focus on educational topics, "
+            "you can also provide polite, brief responses to non-educational questions when appropriate. "
+            "If the question is clearly off-topic or inappropriate, you may politely redirect to educational topics. "
+            "Answer based on context when provided, otherwise use your general knowledge appropriately."
+        )
+    elif category in ('schedule', 'date_query', 'examschedule'):
+        table_instructions = (
+            "- <schedule_data> and <exam_data> are '|' separated tables: a line 'name: column|column|...' gives the columns of the rows below it\n"
+            "- Keys such as G1 (giang_vien) and K1 (ky_thi) refer to the legend rows with the same key, and ma_mon to the mon rows; always write out the full names in the answer\n"
+        ) if context_format == 'table' else ""
+        return (
+            "<role>You are a dedicated study assistant for university students in Vietnam specializing in academic schedule and exam information.</role>\n\n"
+            "<instructions>\n"
+            "- Analyze the provided XML-structured data carefully and use ALL information available\n"
+            "- Use ONLY the information provided in the <class_schedule>, <exam_schedule>, and <current_time> tags\n"
+            f"{table_instructions}"
+            "- ALWAYS provide COMPLETE and COMPREHENSIVE responses that include ALL details from the data\n"
+            "- For schedule queries: Include ALL class details - subject name (both Vietnamese and English), time slots, room, instructor name with ID, credits, dates\n"
+            "- For exam queries: Include ALL exam details - subject name, exam type, format, time, weekday, date, room, location\n"
+            "- When user asks follow-up questions, refer to the conversation history to provide context and complete answers\n"
+            "- Always reference the current time context when explaining relative dates (today, tomorrow, next week)\n"
+            "- Use Vietnamese language naturally and professionally\n"
+            "- Organize information logically with clear headings, bullet points, and structured formatting\n"
+            "- Never provide partial information - if data is available, include it ALL\n"
+            "- Do not add or fabricate any information not present in the provided XML data\n"
+            "</instructions>\n\n"
+            "<response_format>\n"
+            "- NEVER start with summary, overview, or any introductory text\n"
+            "- Begin immediately with the specific information requested\n"
+            "- Do NOT use phrases like 'summary:', 'tóm tắt:', 'overview:', or similar introductory words\n"
+            "- Present ALL information from the provided data in a clear, organized format\n"
+            "- Use headers, lists, and bullet points to structure the complete information\n"
+            "- Include every single detail available in the data - subject names, times, rooms, instructors, credits, etc.\n"
+            "- Organize by date/time chronologically when showing multiple items\n"
+            "- End with brief helpful context only if relevant\n"
+            "- If user asks follow-up questions, check conversation history and provide complete context\n"
+            "</response_format>"
+        )
+    else:
+        return (
+            "You are a dedicated study assistant for university students in Vietnam. "
+            "Provide clear, helpful answers based only on the provided context and focus strictly on the user's question. "
+            "Do not add or fabricate any information not present in the context."
+        )
@@ -0,0 +1,25 @@
+from flask import Blueprint, jsonify
+from ..services.llm_router import llm_router
+
+llm_bp = Blueprint('llm', __name__)
+
+@llm_bp.route('/llm/backends', methods=['GET'])
+def list_backends():
+    """Health, models and load of every LLM backend"""
+    try:
+        return jsonify(llm_router.get_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@llm_bp.route('/llm/backends/reload', methods=['POST'])
+def reload_backends():
+    """
+    Apply the configured LLM backends (config/agents.py or LLM_BACKENDS) without restarting.
+
+    The pool is never taken from the request: backends are only added or removed by changing
+    the configuration.
+    """
+    try:
+        return jsonify(llm_router.reload())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
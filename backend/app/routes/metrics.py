@@ -0,0 +1,104 @@
+from flask import Blueprint, jsonify
+from ..lib.http_client import http_clients
+from ..services.embedding_registry import embedding_registry
+from ..services.embedding_cache import query_embedding_cache
+from ..services.ingestion_service import ingestion_service
+from ..services.vector_index_service import vector_index_service
+from ..services.response_cache_service import response_cache
+from ..services.query_classifier import query_classifier
+from ..services.admission_control import admission_control
+from ..services.context_packer import context_packer
+from ..services.chat_stream_service import chat_stream_service
+from ..utils.pipeline import pipeline_stats, stream_stats
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics/embeddings', methods=['GET'])
+def embedding_metrics():
+    """Load time and memory usage of the shared embedding models, query cache counters"""
+    try:
+        stats = embedding_registry.get_stats()
+        stats['query_cache'] = query_embedding_cache.get_stats()
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@metrics_bp.route('/metrics/ingestion', methods=['GET'])
+def ingestion_metrics():
+    """Depth of the background file ingestion queue"""
+    try:
+        return jsonify(ingestion_service.get_queue_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@metrics_bp.route('/metrics/vector-index', methods=['GET'])
+def vector_index_metrics():
+    """Backend in use and size of the local vector indexes"""
+    try:
+        return jsonify(vector_index_service.get_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@metrics_bp.route('/metrics/response-cache', methods=['GET'])
+def response_cache_metrics():
+    """Hit rate and size of the semantic chat response cache"""
+    try:
+        return jsonify(response_cache.get_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@metrics_bp.route('/metrics/http', methods=['GET'])
+def http_pool_metrics():
+    """Request counters and pooled connections of the shared HTTP clients"""
+    try:
+        return jsonify(http_clients.get_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@metrics_bp.route('/metrics/classifier', methods=['GET'])
+def classifier_metrics():
+    """Share of queries and average latency per classifier tier (rules, knn, lmstudio)"""
+    try:
+        return jsonify(query_classifier.get_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@metrics_bp.route('/metrics/chat-pipeline', methods=['GET'])
+def chat_pipeline_metrics():
+    """Average and worst time spent in each pre-generation stage of /chat"""
+    try:
+        return jsonify(pipeline_stats.get_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@metrics_bp.route('/metrics/admission', methods=['GET'])
+def admission_metrics():
+    """Slots in use, queue depth, rejections and wait times of the LLM admission control"""
+    try:
+        return jsonify(admission_control.get_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@metrics_bp.route('/metrics/context-packer', methods=['GET'])
+def context_packer_metrics():
+    """How often prompts were truncated, dropped units per source and token estimate calibration"""
+    try:
+        return jsonify(context_packer.get_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@metrics_bp.route('/metrics/streams', methods=['GET'])
+def stream_metrics():
+    """Completed and client-cancelled answer streams, tokens and seconds of generation saved by cancelling"""
+    try:
+        return jsonify(stream_stats.get_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@metrics_bp.route('/metrics/chat-streams', methods=['GET'])
+def chat_stream_metrics():
+    """Resumable answer streams: generating, followers, resumes and streams cancelled for lack of a client"""
+    try:
+        return jsonify(chat_stream_service.get_stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,363 @@
+import os
+import math
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from ..config.agents import AVAILABLE_AGENTS
+from ..utils.logger import Logger
+
+logger = Logger()
+
+# Short structured calls on the critical path of /chat (classifier, time parser, query optimizer)
+PRIORITY_INTERACTIVE = 0
+# Long answer generations
+PRIORITY_GENERATION = 1
+
+
+class AdmissionRejected(Exception):
+    """The model is saturated: 429 when the user already has too much queued, 503 otherwise"""
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """A granted slot; release() is idempotent so it can be called from every exit path"""
+
+    def __init__(self, controller, model, user, priority, waited_ms):
+        self._controller = controller
+        self.model = model
+        self.user = user
+        self.priority = priority
+        self.waited_ms = waited_ms
+        self.started_at = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _Waiter:
+    """
+    A queued request. Threads wait on the controller's condition and admit themselves;
+    async waiters have a future on their loop that _dispatch resolves with the ticket.
+    """
+    __slots__ = ('user', 'priority', 'seq', 'started', 'loop', 'future')
+
+    def __init__(self, user, priority, seq, started, loop=None):
+        self.user = user
+        self.priority = priority
+        self.seq = seq
+        self.started = started
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+
+
+class _ModelQueue:
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.active_by_user = {}
+        self.waiters = []
+        self.stats = {
+            'admitted': 0, 'queued': 0, 'rejected_queue_full': 0, 'rejected_user_limit': 0,
+            'timeouts': 0, 'total_wait_ms': 0.0, 'max_wait_ms': 0.0
+        }
+        # Moving average of how long a generation holds its slot, for Retry-After
+        self.avg_generation_s = None
+
+
+class AdmissionController:
+    """
+    Per-model concurrency limits in front of the LLM backends.
+
+    - At most max_concurrency generations run per model (agent 'max_concurrency' or LLM_MAX_CONCURRENCY)
+    - Interactive calls may use LLM_INTERACTIVE_BURST extra slots and always go first in the queue
+    - Waiting generations are bounded (LLM_MAX_QUEUE per model, LLM_MAX_QUEUED_PER_USER per user)
+      and are served by priority, then the user with the fewest running requests, then arrival
+    - A request that cannot be queued or waits longer than LLM_QUEUE_TIMEOUT is rejected with a
+      Retry-After estimate instead of piling up on the backend until it times out
+    """
+
+    def __init__(self):
+        self.default_limit = int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+        self.interactive_burst = int(os.getenv('LLM_INTERACTIVE_BURST', 2))
+        self.max_queue = int(os.getenv('LLM_MAX_QUEUE', 16))
+        self.max_queued_per_user = int(os.getenv('LLM_MAX_QUEUED_PER_USER', 2))
+        self.queue_timeout = float(os.getenv('LLM_QUEUE_TIMEOUT', 20))
+        self._queues = {}
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def _queue(self, model):
+        queue = self._queues.get(model)
+        if queue is None:
+            limit = AVAILABLE_AGENTS.get(model, {}).get('max_concurrency', self.default_limit)
+            queue = self._queues[model] = _ModelQueue(limit)
+        return queue
+
+    def _has_capacity(self, queue, priority):
+        burst = self.interactive_burst if priority == PRIORITY_INTERACTIVE else 0
+        return queue.active < queue.limit + burst
+
+    def _next_waiter(self, queue):
+        return min(
+            queue.waiters,
+            key=lambda w: (w.priority, queue.active_by_user.get(w.user, 0), w.seq),
+            default=None
+        )
+
+    def _retry_after(self, queue):
+        per_slot = queue.avg_generation_s or 10.0
+        waiting = sum(1 for w in queue.waiters if w.priority == PRIORITY_GENERATION)
+        return max(1, min(60, math.ceil(per_slot * (waiting + 1) / max(queue.limit, 1))))
+
+    def _reject_reason(self, queue, user):
+        waiting = [w for w in queue.waiters if w.priority == PRIORITY_GENERATION]
+        if sum(1 for w in waiting if w.user == user) >= self.max_queued_per_user:
+            return 'rejected_user_limit', 429, 'Too many requests waiting for this user'
+        if len(waiting) >= self.max_queue:
+            return 'rejected_queue_full', 503, 'The model is busy, queue is full'
+        return None
+
+    def _admit(self, queue, model, user, priority, waited_ms):
+        queue.active += 1
+        queue.active_by_user[user] = queue.active_by_user.get(user, 0) + 1
+        queue.stats['admitted'] += 1
+        queue.stats['total_wait_ms'] += waited_ms
+        queue.stats['max_wait_ms'] = max(queue.stats['max_wait_ms'], waited_ms)
+        return AdmissionTicket(self, model, user, priority, waited_ms)
+
+    def check(self, model, user=None, priority=PRIORITY_GENERATION):
+        """
+        Fail fast before doing any work for a request that would be rejected anyway.
+
+        Raises:
+            AdmissionRejected: When a generation could not even be queued
+        """
+        if priority != PRIORITY_GENERATION:
+            return
+        user = user or 'anonymous'
+        with self._cond:
+            queue = self._queue(model)
+            if not queue.waiters and self._has_capacity(queue, priority):
+                return
+            reason = self._reject_reason(queue, user)
+            if reason:
+                raise AdmissionRejected(reason[2], reason[1], self._retry_after(queue))
+
+    def _enqueue(self, queue, user, priority, started, loop=None):
+        """Queue a waiter, or raise AdmissionRejected when a generation may not wait (under the lock)"""
+        if priority == PRIORITY_GENERATION:
+            reason = self._reject_reason(queue, user)
+            if reason:
+                queue.stats[reason[0]] += 1
+                raise AdmissionRejected(reason[2], reason[1], self._retry_after(queue))
+        self._seq += 1
+        waiter = _Waiter(user, priority, self._seq, started, loop)
+        queue.waiters.append(waiter)
+        queue.stats['queued'] += 1
+        return waiter
+
+    def _timed_out(self, queue, model, user, priority):
+        queue.stats['timeouts'] += 1
+        logger.log_with_timestamp('ADMISSION', f'Queue timeout on {model}', f'user={user} priority={priority}')
+        return AdmissionRejected('Timed out waiting for the model', 503, self._retry_after(queue))
+
+    def _dispatch(self, queue, model):
+        """
+        Hand free slots to async waiters at the head of the queue and wake the waiting threads
+        (under the lock, after every change of the slots or of the queue).
+        """
+        while True:
+            waiter = self._next_waiter(queue)
+            if waiter is None or waiter.future is None or not self._has_capacity(queue, waiter.priority):
+                break
+            queue.waiters.remove(waiter)
+            waited_ms = round((time.perf_counter() - waiter.started) * 1000, 1)
+            ticket = self._admit(queue, model, waiter.user, waiter.priority, waited_ms)
+            try:
+                waiter.loop.call_soon_threadsafe(self._deliver, waiter.future, ticket)
+            except RuntimeError:
+                # The waiter's loop is closed, nobody will use the slot
+                ticket._released = True
+                self._free_slot(queue, ticket)
+        self._cond.notify_all()
+
+    @staticmethod
+    def _deliver(future, ticket):
+        """Runs on the waiter's loop: resolve its future, or hand the slot back if it gave up"""
+        if future.done():
+            ticket.release()
+        else:
+            future.set_result(ticket)
+
+    def acquire(self, model, user=None, priority=PRIORITY_GENERATION, timeout=None, block=True):
+        """
+        Wait for a slot on model.
+
+        Args:
+            model (str): Model name of the request
+            user (str, optional): Fairness key (user id, falls back to a shared 'anonymous' bucket)
+            priority (int): PRIORITY_INTERACTIVE or PRIORITY_GENERATION
+            timeout (float, optional): Max seconds in the queue. Defaults to LLM_QUEUE_TIMEOUT.
+            block (bool): False returns None instead of queueing when no slot is free right now
+
+        Returns:
+            AdmissionTicket: Release it (or use it as a context manager) when the call is done
+
+        Raises:
+            AdmissionRejected: Queue full (503), user limit (429) or queue timeout (503)
+        """
+        user = user or 'anonymous'
+        started = time.perf_counter()
+        deadline = started + (self.queue_timeout if timeout is None else timeout)
+        with self._cond:
+            queue = self._queue(model)
+            ahead = self._next_waiter(queue)
+            if self._has_capacity(queue, priority) and (ahead is None or ahead.priority > priority):
+                return self._admit(queue, model, user, priority, 0.0)
+            if not block:
+                return None
+            waiter = self._enqueue(queue, user, priority, started)
+            try:
+                while True:
+                    if self._next_waiter(queue) is waiter and self._has_capacity(queue, priority):
+                        waited_ms = round((time.perf_counter() - started) * 1000, 1)
+                        queue.waiters.remove(waiter)
+                        ticket = self._admit(queue, model, user, priority, waited_ms)
+                        # More slots may be free for the waiters behind
+                        self._dispatch(queue, model)
+                        return ticket
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        raise self._timed_out(queue, model, user, priority)
+                    self._cond.wait(remaining)
+            finally:
+                if waiter in queue.waiters:
+                    queue.waiters.remove(waiter)
+                    # The head of the queue may have changed
+                    self._dispatch(queue, model)
+
+    async def aacquire(self, model, user=None, priority=PRIORITY_GENERATION, timeout=None):
+        """
+        Async variant of acquire: the waiter is a future on the running loop that _release
+        resolves with the ticket, no thread is held while queued.
+        """
+        user = user or 'anonymous'
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            queue = self._queue(model)
+            ahead = self._next_waiter(queue)
+            if self._has_capacity(queue, priority) and (ahead is None or ahead.priority > priority):
+                return self._admit(queue, model, user, priority, 0.0)
+            waiter = self._enqueue(queue, user, priority, started, loop)
+        try:
+            return await self._await_ticket(queue, model, waiter, self.queue_timeout if timeout is None else timeout)
+        except asyncio.CancelledError:
+            self._abandon(queue, model, waiter)
+            raise
+
+    async def _await_ticket(self, queue, model, waiter, timeout):
+        try:
+            # Shielded: a timeout must not cancel a future _dispatch may be resolving right now
+            return await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            with self._cond:
+                if waiter in queue.waiters:
+                    queue.waiters.remove(waiter)
+                    waiter.future.cancel()
+                    self._dispatch(queue, model)
+                    raise self._timed_out(queue, model, waiter.user, waiter.priority)
+            # Admitted as the timeout fired, the ticket is already on its way
+            return await asyncio.shield(waiter.future)
+
+    def _abandon(self, queue, model, waiter):
+        """The caller of aacquire was cancelled: leave the queue, give back a slot granted meanwhile"""
+        with self._cond:
+            if waiter in queue.waiters:
+                queue.waiters.remove(waiter)
+                self._dispatch(queue, model)
+        if waiter.future.done() and not waiter.future.cancelled():
+            waiter.future.result().release()
+        else:
+            # A _deliver already scheduled sees the cancelled future and releases its ticket
+            waiter.future.cancel()
+
+    def slot(self, model, user=None, priority=PRIORITY_GENERATION, timeout=None):
+        """Context manager: with admission_control.slot(model): ..."""
+        return self.acquire(model, user, priority, timeout)
+
+    @asynccontextmanager
+    async def aslot(self, model, user=None, priority=PRIORITY_GENERATION, timeout=None):
+        """Async context manager: async with admission_control.aslot(model): ..."""
+        ticket = await self.aacquire(model, user, priority, timeout)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def _free_slot(self, queue, ticket):
+        queue.active -= 1
+        remaining = queue.active_by_user.get(ticket.user, 1) - 1
+        if remaining > 0:
+            queue.active_by_user[ticket.user] = remaining
+        else:
+            queue.active_by_user.pop(ticket.user, None)
+
+    def _release(self, ticket):
+        held_s = time.perf_counter() - ticket.started_at
+        with self._cond:
+            queue = self._queue(ticket.model)
+            self._free_slot(queue, ticket)
+            if ticket.priority == PRIORITY_GENERATION:
+                if queue.avg_generation_s is None:
+                    queue.avg_generation_s = held_s
+                else:
+                    queue.avg_generation_s += 0.2 * (held_s - queue.avg_generation_s)
+            self._dispatch(queue, ticket.model)
+
+    def get_stats(self):
+        """Slots in use, queue depth and wait times per model"""
+        with self._cond:
+            models = {}
+            for model, queue in self._queues.items():
+                stats = queue.stats
+                models[model] = {
+                    'limit': queue.limit,
+                    'active': queue.active,
+                    'active_users': len(queue.active_by_user),
+                    'waiting': len(queue.waiters),
+                    'waiting_interactive': sum(1 for w in queue.waiters if w.priority == PRIORITY_INTERACTIVE),
+                    'admitted': stats['admitted'],
+                    'queued': stats['queued'],
+                    'rejected_queue_full': stats['rejected_queue_full'],
+                    'rejected_user_limit': stats['rejected_user_limit'],
+                    'timeouts': stats['timeouts'],
+                    'avg_wait_ms': round(stats['total_wait_ms'] / stats['admitted'], 1) if stats['admitted'] else 0.0,
+                    'max_wait_ms': stats['max_wait_ms'],
+                    'avg_generation_s': round(queue.avg_generation_s, 2) if queue.avg_generation_s else None
+                }
+            return {
+                'default_limit': self.default_limit,
+                'interactive_burst': self.interactive_burst,
+                'max_queue': self.max_queue,
+                'max_queued_per_user': self.max_queued_per_user,
+                'queue_timeout': self.queue_timeout,
+                'models': models
+            }
+
+# Global instance
+admission_control = AdmissionController()
@@ -1,4 +1,3 @@
-import httpx
 from .file_service import FileService
 from .web_search_service import WebSearchService
 from .web_scraper_service import WebScraperService
@@ -6,20 +5,16 @@ import zlib
 from ..config.agents import get_agent
 import json
 from ..utils.logger import Logger
+from .llm_router import llm_router
+from .admission_control import admission_control
 
 logger = Logger()
 
-LMSTUDIO_URL = "http://192.168.1.216:1234/v1/chat/completions"
-LMSTUDIO_AUTH = "lm-studio"
-HEADERS = {
-    "Authorization": f"Bearer {LMSTUDIO_AUTH}",
-    "Content-Type": "application/json"
-}
-
 class AiService:
     def __init__(self):
         self.web_search_service = WebSearchService()
         self.web_scraper_service = WebScraperService()
+        self.file_service = FileService()
 
     @staticmethod
     def _plantuml_encode(text: str) -> str:
@@ -70,7 +65,8 @@ class AiService:
         # LOG PROMPT GỬI CHO LM STUDIO
         print("[AI PROMPT PAYLOAD]", json.dumps(payload, ensure_ascii=False, indent=2))
         try:
-            response = httpx.post(LMSTUDIO_URL, headers=HEADERS, json=payload, timeout=60)
+            with admission_control.slot(model):
+                response = llm_router.post(payload, timeout=60)
             response.raise_for_status()
             data = response.json()
             content = data["choices"][0]["message"]["content"]
@@ -96,8 +92,7 @@ class AiService:
             f'File context with agent: {agent_config["display_name"]}',
             f'Model: {model}, Temperature: {temperature}'
         )
-        file_service = FileService()
-        chunks = file_service.search_relevant_chunks_in_supabase(message, file_id)
+        chunks = self.file_service.search_relevant_chunks_in_supabase(message, file_id)
         if chunks is None:
             chunks = []
         logger.log_with_timestamp('AI_SERVICE', f'Retrieved {len(chunks)} chunks for query: "{message[:30]}..."')
@@ -119,7 +114,8 @@ class AiService:
             "max_tokens": 1024
         }
         try:
-            response = httpx.post(LMSTUDIO_URL, headers=HEADERS, json=payload, timeout=60)
+            with admission_control.slot(model):
+                response = llm_router.post(payload, timeout=60)
             response.raise_for_status()
             data = response.json()
             content = data["choices"][0]["message"]["content"]
@@ -186,7 +182,8 @@ class AiService:
             "max_tokens": 1024
         }
         try:
-            response = httpx.post(LMSTUDIO_URL, headers=HEADERS, json=payload, timeout=60)
+            with admission_control.slot(model):
+                response = llm_router.post(payload, timeout=60)
             response.raise_for_status()
             data = response.json()
             content = data["choices"][0]["message"]["content"]
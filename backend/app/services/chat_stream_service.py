@@ -0,0 +1,357 @@
+import os
+import json
+import uuid
+import asyncio
+import threading
+from collections import deque
+from ..config.redis_config import redis_service
+from ..utils.logger import Logger
+from ..utils.sse import format_event, coalesce, StreamEvent
+from ..utils.streaming import ResponseStream
+from ..utils.background_loop import background_loop
+
+logger = Logger()
+
+STREAM_KEY_PREFIX = 'chatstream:'
+
+
+class StreamNotFound(Exception):
+    """Unknown or expired stream (404), or the requested offset was already trimmed (410)"""
+
+    def __init__(self, message, status_code=404):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _StreamLog:
+    """Events of one generation produced in this process, and the clients following it"""
+
+    def __init__(self, stream_id, maxlen):
+        self.stream_id = stream_id
+        self.entries = deque(maxlen=maxlen)  # (offset, event, data), data is the text of 'content' entries
+        self.next_offset = 1
+        self.status = None  # None while generating, then completed / cancelled / failed
+        self.done = None  # Payload of the final 'done' event, set with the status
+        self.followers = 0
+        self.future = None
+        self.redis = True
+        self._waiters = set()
+        self._lock = threading.Lock()
+
+    def _wake(self):
+        # Followers wait on their own event loops
+        for loop, event in list(self._waiters):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                self._waiters.discard((loop, event))
+
+    def append(self, event, data):
+        with self._lock:
+            offset = self.next_offset
+            self.next_offset += 1
+            self.entries.append((offset, event, data))
+        self._wake()
+        return offset
+
+    def finish(self, status, data=None):
+        with self._lock:
+            self.done = dict(data or {}, status=status)
+            self.status = status
+        self._wake()
+
+    def first_offset(self):
+        with self._lock:
+            return self.entries[0][0] if self.entries else self.next_offset
+
+    def read(self, after):
+        """Entries after the offset and the status at the time of the read (done is set once it is)"""
+        with self._lock:
+            return [entry for entry in self.entries if entry[0] > after], self.status
+
+    def waiter(self):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        self._waiters.add(waiter)
+        return waiter
+
+    def remove_waiter(self, waiter):
+        self._waiters.discard(waiter)
+
+
+class ChatStreamService:
+    """
+    Answer streams that outlive the HTTP connection.
+
+    Each generation gets a stream id and runs as a producer on one background event loop,
+    independent of the request. Its events are appended to a bounded log, in memory and in a
+    Redis stream (chatstream:<id>, entry ids 0-<offset>) so any worker can serve a reconnect.
+    Content deltas are coalesced first (CHAT_STREAM_COALESCE_MS / CHAT_STREAM_COALESCE_BYTES):
+    one-character deltas no longer cost a frame, a flush and a client re-render each.
+    Responses only follow the log: a reconnect with Last-Event-ID replays from that offset
+    and keeps following the live generation, the answer is generated once.
+
+    When no client follows a stream for CHAT_STREAM_RESUME_GRACE seconds the producer is
+    cancelled, which closes the upstream LLM request.
+    """
+
+    def __init__(self):
+        self.maxlen = int(os.getenv('CHAT_STREAM_MAXLEN', 2048))
+        self.ttl = int(os.getenv('CHAT_STREAM_TTL', 300))
+        self.resume_grace = float(os.getenv('CHAT_STREAM_RESUME_GRACE', 15))
+        self.use_redis = os.getenv('CHAT_STREAM_REDIS', 'true').lower() == 'true'
+        self.coalesce_ms = float(os.getenv('CHAT_STREAM_COALESCE_MS', 50))
+        self.coalesce_bytes = int(os.getenv('CHAT_STREAM_COALESCE_BYTES', 512))
+        # Poll interval of followers reading another worker's stream from Redis
+        self.redis_block_ms = int(os.getenv('CHAT_STREAM_REDIS_BLOCK_MS', 5000))
+        self._logs = {}
+        self._lock = threading.Lock()
+        self._aredis = None
+        self._stats = {
+            'started': 0, 'resumed': 0, 'remote_follows': 0, 'unattended_cancels': 0, 'redis_errors': 0,
+            'deltas_in': 0, 'content_frames': 0
+        }
+
+    # Producer side
+
+    def _runner(self):
+        # Producers share the app loop, and its pooled LLM client
+        return background_loop.loop()
+
+    def _redis(self):
+        # Only used on the runner loop
+        if self._aredis is None:
+            self._aredis = redis_service.create_async_client()
+        return self._aredis
+
+    @staticmethod
+    def _key(stream_id):
+        return STREAM_KEY_PREFIX + stream_id
+
+    async def _redis_append(self, log, fields, entry_id):
+        if not (self.use_redis and log.redis and redis_service.redis_client):
+            return
+        try:
+            key = self._key(log.stream_id)
+            async with self._redis().pipeline(transaction=False) as pipe:
+                pipe.xadd(key, fields, id=entry_id, maxlen=self.maxlen, approximate=True)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            # Keep streaming from memory, this stream just cannot be resumed on another worker
+            log.redis = False
+            with self._lock:
+                self._stats['redis_errors'] += 1
+            logger.log_with_timestamp('CHAT_STREAM_ERROR', f'Redis append failed for {log.stream_id}: {str(e)}')
+
+    async def _counted(self, chunks):
+        async for item in chunks:
+            if isinstance(item, str):
+                if not item:
+                    continue
+                with self._lock:
+                    self._stats['deltas_in'] += 1
+            yield item
+
+    async def _produce(self, log, chunks, on_close):
+        status = 'completed'
+        done = None
+        events = coalesce(self._counted(chunks), self.coalesce_ms, self.coalesce_bytes)
+        try:
+            async for item in events:
+                if isinstance(item, StreamEvent) and item.event == 'done':
+                    # Sent with the status once the producer ended
+                    done = item.data
+                    continue
+                if isinstance(item, StreamEvent):
+                    offset = log.append(item.event, item.data)
+                    await self._redis_append(log, {'e': item.event, 'd': json.dumps(item.data, ensure_ascii=False)}, f'0-{offset}')
+                    continue
+                with self._lock:
+                    self._stats['content_frames'] += 1
+                offset = log.append('content', item)
+                await self._redis_append(log, {'t': item}, f'0-{offset}')
+        except asyncio.CancelledError:
+            status = 'cancelled'
+            raise
+        except Exception as e:
+            status = 'failed'
+            logger.log_with_timestamp('CHAT_STREAM_ERROR', f'Producer of {log.stream_id} failed: {str(e)}')
+        finally:
+            await events.aclose()
+            await chunks.aclose()
+            for callback in on_close or []:
+                callback()
+            log.finish(status, done)
+            await self._redis_append(
+                log, {'end': status, 'd': json.dumps(log.done, ensure_ascii=False)}, f'0-{log.next_offset}'
+            )
+            self._runner().call_later(self.ttl, self._expire, log.stream_id)
+
+    def _expire(self, stream_id):
+        with self._lock:
+            self._logs.pop(stream_id, None)
+
+    def start(self, chunks, on_close=None):
+        """
+        Run a generation in the background.
+
+        Args:
+            chunks: Async iterator of answer text deltas (str) and StreamEvent (metadata, sources,
+                    and a last 'done' whose data is added to the final event)
+            on_close (list, optional): Callbacks run when the producer ends, also when it never started
+
+        Returns:
+            str: Stream id to follow
+        """
+        stream_id = uuid.uuid4().hex
+        log = _StreamLog(stream_id, self.maxlen)
+        with self._lock:
+            self._logs[stream_id] = log
+            self._stats['started'] += 1
+        # Counted as followed until the first response attaches
+        log.followers = 1
+        log.future = asyncio.run_coroutine_threadsafe(self._produce(log, chunks, on_close), self._runner())
+        return stream_id
+
+    def _detach(self, log):
+        with self._lock:
+            log.followers -= 1
+            unattended = log.followers <= 0 and log.status is None
+        if unattended:
+            asyncio.run_coroutine_threadsafe(self._cancel_unattended(log), self._runner())
+
+    async def _cancel_unattended(self, log):
+        await asyncio.sleep(self.resume_grace)
+        while log.status is None and log.followers <= 0:
+            # A follower on another worker keeps the stream alive through a heartbeat key
+            if self.use_redis and log.redis and redis_service.redis_client:
+                try:
+                    if await self._redis().exists(self._key(log.stream_id) + ':alive'):
+                        await asyncio.sleep(self.resume_grace)
+                        continue
+                except Exception:
+                    pass
+            with self._lock:
+                self._stats['unattended_cancels'] += 1
+            logger.log_with_timestamp(
+                'CHAT_STREAM', f'No client reattached to {log.stream_id} within {self.resume_grace}s, cancelling'
+            )
+            log.future.cancel()
+            return
+
+    # Follower side
+
+    async def open(self, stream_id, after=0):
+        """
+        Follow a stream from an offset.
+
+        Args:
+            stream_id (str): Id of start()
+            after (int): Last offset the client received (Last-Event-ID), 0 for everything
+
+        Returns:
+            ResponseStream: SSE frames: 'stream' (the id) first, then 'metadata', 'sources' and
+                            'content' events with their offset as event id, and a final 'done'
+                            event with the status and the producer's done data (saved message id,
+                            sources, timing)
+
+        Raises:
+            StreamNotFound: Unknown/expired stream or offset no longer kept
+        """
+        with self._lock:
+            log = self._logs.get(stream_id)
+            if log is not None:
+                if after + 1 < log.first_offset():
+                    raise StreamNotFound(f'Stream {stream_id} no longer has offset {after + 1}', 410)
+                log.followers += 1
+                if after:
+                    self._stats['resumed'] += 1
+        if log is not None:
+            return ResponseStream(self._follow_local(log, after), on_close=[lambda: self._detach(log)])
+        if not (self.use_redis and redis_service.redis_client):
+            raise StreamNotFound(f'Unknown stream {stream_id}')
+        client = redis_service.create_async_client()
+        try:
+            first = await client.xrange(self._key(stream_id), count=1)
+        except Exception as e:
+            await client.aclose()
+            raise StreamNotFound(f'Stream {stream_id} unavailable: {str(e)}')
+        if not first:
+            await client.aclose()
+            raise StreamNotFound(f'Unknown stream {stream_id}')
+        if after + 1 < int(first[0][0].split('-')[1]):
+            await client.aclose()
+            raise StreamNotFound(f'Stream {stream_id} no longer has offset {after + 1}', 410)
+        with self._lock:
+            self._stats['remote_follows'] += 1
+            if after:
+                self._stats['resumed'] += 1
+        return ResponseStream(self._follow_redis(client, stream_id, after))
+
+    def follow(self, stream_id):
+        """Response of the request that started the stream (takes over start()'s follower count)"""
+        with self._lock:
+            log = self._logs[stream_id]
+        return ResponseStream(self._follow_local(log, 0), on_close=[lambda: self._detach(log)])
+
+    async def _follow_local(self, log, after):
+        yield format_event({'stream_id': log.stream_id}, event='stream')
+        offset = after
+        while True:
+            # Register before reading so no append is missed
+            waiter = log.waiter()
+            try:
+                entries, status = log.read(offset)
+                for offset, event, data in entries:
+                    yield format_event({'content': data} if event == 'content' else data, event=event, event_id=offset)
+                if status is not None and not entries:
+                    yield format_event(log.done, event='done')
+                    return
+                if not entries:
+                    await waiter[1].wait()
+            finally:
+                log.remove_waiter(waiter)
+
+    async def _follow_redis(self, client, stream_id, after):
+        key = self._key(stream_id)
+        last_id = f'0-{after}'
+        try:
+            yield format_event({'stream_id': stream_id}, event='stream')
+            while True:
+                # Heartbeat: the producing worker does not cancel a stream someone follows
+                await client.set(key + ':alive', 1, ex=max(1, int(self.resume_grace)))
+                response = await client.xread({key: last_id}, count=256, block=self.redis_block_ms)
+                if not response:
+                    if not await client.exists(key):
+                        yield format_event({'status': 'expired'}, event='done')
+                        return
+                    continue
+                for entry_id, fields in response[0][1]:
+                    last_id = entry_id
+                    if 'end' in fields:
+                        yield format_event(fields.get('d') or {'status': fields['end']}, event='done')
+                        return
+                    offset = entry_id.split('-')[1]
+                    if 'e' in fields:
+                        yield format_event(fields['d'], event=fields['e'], event_id=offset)
+                    else:
+                        yield format_event({'content': fields.get('t', '')}, event='content', event_id=offset)
+        finally:
+            await client.aclose()
+
+    def get_stats(self):
+        with self._lock:
+            logs = list(self._logs.values())
+            return dict(
+                self._stats,
+                kept=len(logs),
+                generating=sum(1 for log in logs if log.status is None),
+                followers=sum(max(log.followers, 0) for log in logs),
+                resume_grace=self.resume_grace,
+                coalesce_ms=self.coalesce_ms,
+                coalesce_bytes=self.coalesce_bytes,
+                redis=self.use_redis and redis_service.redis_client is not None
+            )
+
+# Global instance
+chat_stream_service = ChatStreamService()
@@ -0,0 +1,156 @@
+import os
+from datetime import datetime
+from ..config.agents import AVAILABLE_AGENTS, get_agent
+from .context_packer import token_counter
+
+# 'text': the display formatting of ScheduleService/ExamScheduleService
+# 'table': header row + '|' delimited rows, subjects/lecturers/exam sessions listed once and referenced by key
+DEFAULT_CONTEXT_FORMAT = os.getenv('CONTEXT_FORMAT', 'text')
+
+WEEKDAY_CODES = ["T2", "T3", "T4", "T5", "T6", "T7", "CN"]
+
+# Exam rows per block: the context packer cuts between blocks
+EXAM_ROWS_PER_BLOCK = 10
+
+
+def context_format_for(model):
+    """Context format of an agent model ('text' or 'table')"""
+    return AVAILABLE_AGENTS.get(model, {}).get('context_format', DEFAULT_CONTEXT_FORMAT)
+
+
+def _cell(value):
+    return str(value if value not in (None, '') else '-').replace('|', '/').replace('\n', ' ')
+
+
+def _daily_schedules(schedule_data):
+    schedules = (schedule_data or {}).get('all_schedules') or {}
+    if 'daily_schedules' in schedules:
+        return schedules['daily_schedules']
+    if schedules.get('schedule'):
+        return [schedules['schedule']]
+    return []
+
+
+def encode_schedule_table(schedule_data):
+    """
+    Compact encoding of a schedule query result.
+
+    Args:
+        schedule_data (dict): Result of ScheduleService.process_schedule_query
+
+    Returns:
+        str: Legend block then one block of rows per day, or the plain schedule_text when
+             the result has no structured days (far_time, API error...)
+    """
+    days = _daily_schedules(schedule_data)
+    if not days:
+        return (schedule_data or {}).get('schedule_text', '')
+    subjects = {}
+    lecturers = {}
+    day_blocks = []
+    for day in days:
+        date = datetime.strptime(day['date'], '%Y-%m-%d').date()
+        prefix = f"{date.strftime('%d/%m/%Y')}|{WEEKDAY_CODES[date.weekday()]}"
+        rows = []
+        for class_info in day.get('classes') or []:
+            code = class_info.get('ma_mon', '')
+            subjects.setdefault(code, (
+                class_info.get('ten_mon', ''), class_info.get('ten_mon_eg', ''), class_info.get('so_tin_chi', '')
+            ))
+            lecturer = (class_info.get('lecturer', ''), class_info.get('ma_giang_vien', ''))
+            lecturer_key = lecturers.setdefault(lecturer, f"G{len(lecturers) + 1}")
+            periods = class_info.get('time', '').replace('Tiết ', '').replace(' - ', '-')
+            rows.append(f"{prefix}|{_cell(periods)}|{_cell(code)}|{_cell(class_info.get('room'))}|{lecturer_key}")
+        day_blocks.append("\n".join(rows) if rows else f"{prefix}|không có lớp")
+    legend = [
+        f"{days[0].get('semester', '')}, {schedule_data.get('date_info', '')}".strip(', '),
+        "mon: ma|ten|ten_tieng_anh|tin_chi"
+    ]
+    legend += [f"{_cell(code)}|{_cell(name)}|{_cell(name_en)}|{_cell(credits)}" for code, (name, name_en, credits) in subjects.items()]
+    legend.append("giang_vien: key|ten|ma_gv")
+    legend += [f"{key}|{_cell(name)}|{_cell(code)}" for (name, code), key in lecturers.items()]
+    legend.append("lich: ngay|thu|tiet|ma_mon|phong|giang_vien")
+    return "\n\n".join(["\n".join(legend)] + day_blocks)
+
+
+def encode_exam_table(exams):
+    """
+    Compact encoding of exam entries (ds_lich_thi items).
+
+    Returns:
+        str: Legend block then blocks of up to EXAM_ROWS_PER_BLOCK rows, in the order of exams
+    """
+    if not exams:
+        return "Không có lịch thi."
+    sessions = {}
+    rows = []
+    for exam in exams:
+        session = (exam.get('ky_thi', ''), exam.get('hinh_thuc_thi', ''), exam.get('dia_diem_thi', ''))
+        session_key = sessions.setdefault(session, f"K{len(sessions) + 1}")
+        try:
+            weekday = WEEKDAY_CODES[datetime.strptime(exam.get('ngay_thi', ''), '%d/%m/%Y').weekday()]
+        except ValueError:
+            weekday = '-'
+        rows.append("|".join(_cell(v) for v in (
+            exam.get('ma_mon'), exam.get('ten_mon'), exam.get('ten_mon_eg'),
+            exam.get('ngay_thi'), weekday, exam.get('gio_bat_dau'), exam.get('so_phut'), exam.get('ma_phong')
+        )) + f"|{session_key}")
+    legend = ["ky_thi: key|ky_thi|hinh_thuc|dia_diem"]
+    legend += [f"{key}|{'|'.join(_cell(v) for v in session)}" for session, key in sessions.items()]
+    legend.append("lich_thi: ma_mon|ten_mon|ten_tieng_anh|ngay|thu|gio|phut|phong|ky_thi")
+    blocks = ["\n".join(legend)]
+    blocks += ["\n".join(rows[i:i + EXAM_ROWS_PER_BLOCK]) for i in range(0, len(rows), EXAM_ROWS_PER_BLOCK)]
+    return "\n\n".join(blocks)
+
+
+def compare_encodings(agent_id, schedule_data=None, exams=None, question=None, text=None):
+    """
+    Token cost of both encodings of the same data, and optionally the answers they produce.
+
+    Run it with python -m benchmarks.context_encoding (fixture timetable and exams).
+
+    Args:
+        agent_id (str): Agent (config/agents.py) whose model counts the tokens and answers
+        schedule_data (dict, optional): process_schedule_query result
+        exams (list, optional): Exam entries
+        question (str, optional): When given, the question is answered with each encoding
+        text (str, optional): The 'text' encoding, defaults to schedule_text / format_exam_schedule output
+
+    Returns:
+        dict: tokens per encoding, saving ratio and, with a question, both answers plus the
+              subject codes/rooms/dates each answer is missing
+    """
+    model = get_agent(agent_id)['model']
+    if schedule_data is not None:
+        table = encode_schedule_table(schedule_data)
+        text = text if text is not None else schedule_data.get('schedule_text', '')
+        facts = {c.get('ma_mon') for d in _daily_schedules(schedule_data) for c in d.get('classes') or []}
+        facts |= {c.get('room') for d in _daily_schedules(schedule_data) for c in d.get('classes') or []}
+    else:
+        table = encode_exam_table(exams or [])
+        if text is None:
+            from .exam_schedule_service import ExamScheduleService
+            text = ExamScheduleService().format_exam_schedule(exams or [])
+        facts = {e.get('ma_mon') for e in exams or []} | {e.get('ngay_thi') for e in exams or []}
+    facts.discard(None)
+    facts.discard('')
+    text_tokens = token_counter.count(text, model)
+    table_tokens = token_counter.count(table, model)
+    result = {
+        'agent_id': agent_id,
+        'model': model,
+        'text_tokens': text_tokens,
+        'table_tokens': table_tokens,
+        'saving': round(1 - table_tokens / text_tokens, 3) if text_tokens else 0.0
+    }
+    if question:
+        # Imported here: the LLM stack is only needed when answers are compared
+        from .ai_service import AiService
+        ai_service = AiService()
+        for name, encoded in (('text', text), ('table', table)):
+            prompt = f"{question}\n\n<data>\n{encoded}\n</data>"
+            answer, _ = ai_service.chat_with_ai(prompt, [{"role": "user", "content": prompt}], agent_id=agent_id)
+            result[f'{name}_answer'] = answer
+            result[f'{name}_missing'] = sorted(fact for fact in facts if str(fact) not in answer)
+        result['same_facts'] = result['text_missing'] == result['table_missing']
+    return result
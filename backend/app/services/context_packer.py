@@ -0,0 +1,197 @@
+import os
+import re
+import math
+import threading
+from typing import NamedTuple, Optional
+from ..config.agents import AVAILABLE_AGENTS
+from ..utils.logger import Logger
+
+logger = Logger()
+
+DEFAULT_CONTEXT_WINDOW = int(os.getenv('LLM_CONTEXT_WINDOW', 8192))
+# Tokens kept free for the answer
+DEFAULT_ANSWER_RESERVE = int(os.getenv('LLM_ANSWER_RESERVE', 1536))
+
+_WORD_PATTERN = re.compile(r'\w+|[^\w\s]', re.UNICODE)
+
+
+class TokenCounter:
+    """
+    Prompt token counts per model.
+
+    Uses the model's Hugging Face tokenizer when the agent config names one ('tokenizer') and
+    the tokenizers package can load it. Otherwise a word/character heuristic is scaled by a
+    per-model factor learned from the prompt_tokens the backend reports (observe()).
+    """
+
+    def __init__(self):
+        self._tokenizers = {}
+        self._scale = {}
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def _tokenizer(self, model):
+        if model in self._tokenizers:
+            return self._tokenizers[model]
+        name = AVAILABLE_AGENTS.get(model, {}).get('tokenizer')
+        tokenizer = None
+        if name:
+            try:
+                from tokenizers import Tokenizer
+                tokenizer = Tokenizer.from_pretrained(name)
+                logger.log_with_timestamp('TOKEN_COUNTER', f'Loaded tokenizer {name} for {model}')
+            except Exception as e:
+                # Optional: fall back to the calibrated estimate
+                logger.log_with_timestamp('TOKEN_COUNTER_ERROR', f'Tokenizer {name} unavailable: {str(e)}')
+        self._tokenizers[model] = tokenizer
+        return tokenizer
+
+    @staticmethod
+    def estimate(text):
+        """Uncalibrated estimate: one token per word or symbol, more for long and accented words"""
+        tokens = 0
+        for piece in _WORD_PATTERN.findall(text):
+            if piece.isascii():
+                tokens += 1 + (len(piece) - 1) // 5
+            else:
+                # Vietnamese syllables with diacritics are often split in two by BPE vocabularies
+                tokens += 1 + len(piece) // 3
+        return tokens
+
+    def count(self, text, model=None):
+        if not text:
+            return 0
+        tokenizer = self._tokenizer(model) if model else None
+        if tokenizer is not None:
+            return len(tokenizer.encode(text, add_special_tokens=False).ids)
+        return math.ceil(self.estimate(text) * self._scale.get(model, 1.0))
+
+    def observe(self, model, text, prompt_tokens):
+        """
+        Calibrate the estimate with the prompt_tokens the backend counted for text.
+
+        Args:
+            model (str): Model that served the request
+            text (str): Everything that was sent as prompt (system + user content)
+            prompt_tokens (int): usage.prompt_tokens of the response
+        """
+        estimated = self.estimate(text)
+        if not estimated or not prompt_tokens:
+            return
+        ratio = prompt_tokens / estimated
+        with self._lock:
+            previous = self._scale.get(model)
+            self._scale[model] = ratio if previous is None else previous + 0.2 * (ratio - previous)
+            self._samples[model] = self._samples.get(model, 0) + 1
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                model: {
+                    'tokenizer': self._tokenizers.get(model) is not None,
+                    'scale': round(scale, 3),
+                    'samples': self._samples.get(model, 0)
+                }
+                for model, scale in self._scale.items()
+            }
+
+
+class ContextSource(NamedTuple):
+    """
+    One kind of context for the prompt.
+
+    units are kept whole and in order (file chunks, web results, schedule days...), the packer
+    stops at the first unit that no longer fits. share caps the source to that fraction of
+    the budget; priority 0 is packed first.
+    """
+    name: str
+    units: list
+    priority: int
+    share: float = 1.0
+    separator: str = "\n\n"
+
+
+class PackedContext(NamedTuple):
+    units: dict  # source name -> kept units
+    tokens: int
+    budget: int
+    report: dict  # source name -> {'kept', 'dropped', 'tokens'}
+
+    def text(self, name, separator="\n\n"):
+        return separator.join(self.units.get(name, []))
+
+    @property
+    def dropped(self):
+        return {name: r['dropped'] for name, r in self.report.items() if r['dropped']}
+
+
+class ContextPacker:
+    """Fits prompt context into the agent's context window by priority and per-source budget"""
+
+    def __init__(self, counter):
+        self.counter = counter
+        self._stats = {'requests': 0, 'truncated': 0, 'dropped_units': {}}
+        self._lock = threading.Lock()
+
+    def budget_for(self, model, *fixed_texts):
+        """
+        Tokens left for context once the fixed parts of the prompt and the answer are accounted for.
+
+        Args:
+            model (str): Agent model
+            *fixed_texts (str): System prompt, question and anything else always sent
+
+        Returns:
+            int: Context token budget (never negative)
+        """
+        agent = AVAILABLE_AGENTS.get(model, {})
+        window = agent.get('context_window', DEFAULT_CONTEXT_WINDOW)
+        reserve = agent.get('answer_reserve', DEFAULT_ANSWER_RESERVE)
+        fixed = sum(self.counter.count(text, model) for text in fixed_texts)
+        return max(0, window - reserve - fixed)
+
+    def pack(self, sources, budget, model=None):
+        """
+        Keep as many units as fit, highest priority source first.
+
+        Returns:
+            PackedContext: Kept units per source, token total and what was dropped
+        """
+        remaining = budget
+        units = {}
+        report = {}
+        for source in sorted(sources, key=lambda s: s.priority):
+            cap = min(remaining, int(budget * source.share))
+            separator_tokens = self.counter.count(source.separator, model)
+            kept, used = [], 0
+            for unit in source.units:
+                cost = self.counter.count(unit, model) + (separator_tokens if kept else 0)
+                if used + cost > cap:
+                    break
+                kept.append(unit)
+                used += cost
+            units[source.name] = kept
+            report[source.name] = {'kept': len(kept), 'dropped': len(source.units) - len(kept), 'tokens': used}
+            remaining -= used
+        packed = PackedContext(units, budget - remaining, budget, report)
+        with self._lock:
+            self._stats['requests'] += 1
+            if packed.dropped:
+                self._stats['truncated'] += 1
+                for name, dropped in packed.dropped.items():
+                    self._stats['dropped_units'][name] = self._stats['dropped_units'].get(name, 0) + dropped
+        return packed
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self._stats, dropped_units=dict(self._stats['dropped_units']),
+                        calibration=self.counter.get_stats())
+
+
+def split_blocks(text):
+    """Split formatted text at blank lines, joining the blocks with '\\n\\n' gives it back unchanged"""
+    return text.split("\n\n") if text else []
+
+# Global instance
+token_counter = TokenCounter()
+context_packer = ContextPacker(token_counter)
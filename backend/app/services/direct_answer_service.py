@@ -0,0 +1,112 @@
+from datetime import datetime
+from ..utils.logger import Logger
+
+logger = Logger()
+
+VIETNAMESE_WEEKDAYS = ["Thứ Hai", "Thứ Ba", "Thứ Tư", "Thứ Năm", "Thứ Sáu", "Thứ Bảy", "Chủ Nhật"]
+
+
+class DirectAnswerService:
+    """
+    Renders schedule and exam answers straight from the PTIT data.
+
+    The schedule/exam prompt asks the LLM to repeat every detail of the data, so for those
+    categories the template below gives the same answer in milliseconds instead of a full
+    generation. Each render returns a list of blocks (one per day or exam) so it can be streamed.
+    """
+
+    def render(self, category, schedule_data=None, exam_query_type=None, exam_data=None):
+        """
+        Direct answer for a schedule/examschedule question.
+
+        Returns:
+            list: Markdown blocks of the answer, or None when the question needs the LLM
+        """
+        try:
+            if category == 'schedule' and isinstance(schedule_data, dict):
+                return self.render_schedule(schedule_data)
+            if category == 'examschedule' and isinstance(exam_data, dict):
+                return self.render_exams(exam_query_type, exam_data)
+        except Exception as e:
+            # Unexpected data shape: let the LLM answer from the raw text instead
+            logger.log_with_timestamp('DIRECT_ANSWER_ERROR', f'Could not render {category}: {str(e)}')
+        return None
+
+    @staticmethod
+    def _class_block(index, class_info):
+        lines = [f"{index}. **{class_info.get('ten_mon', '')}** ({class_info.get('ma_mon', '')})"]
+        if class_info.get('ten_mon_eg'):
+            lines.append(f"   - Tên tiếng Anh: {class_info['ten_mon_eg']}")
+        lines.append(f"   - Thời gian: {class_info.get('time', '')}")
+        lines.append(f"   - Phòng: {class_info.get('room', '')}")
+        lecturer = class_info.get('lecturer', '')
+        if class_info.get('ma_giang_vien'):
+            lecturer += f" (Mã GV: {class_info['ma_giang_vien']})"
+        lines.append(f"   - Giảng viên: {lecturer}")
+        if class_info.get('so_tin_chi'):
+            lines.append(f"   - Số tín chỉ: {class_info['so_tin_chi']}")
+        return "\n".join(lines)
+
+    def _day_block(self, daily_schedule):
+        day = datetime.strptime(daily_schedule['date'], '%Y-%m-%d').date()
+        header = f"### {VIETNAMESE_WEEKDAYS[day.weekday()]}, ngày {day.strftime('%d/%m/%Y')}"
+        classes = daily_schedule.get('classes') or []
+        if not classes:
+            return f"{header}\n\nKhông có lớp học."
+        return header + "\n\n" + "\n".join(self._class_block(i, c) for i, c in enumerate(classes, 1))
+
+    def render_schedule(self, schedule_data):
+        """Blocks for the days of ScheduleService.process_schedule_query's result"""
+        schedules = schedule_data.get('all_schedules') or {}
+        if 'daily_schedules' in schedules:
+            days = schedules['daily_schedules']
+        elif schedules.get('schedule'):
+            days = [schedules['schedule']]
+        else:
+            # far_time, no matching date or API failure: the service already wrote the message
+            return [schedule_data.get('schedule_text', '')]
+        semester = days[0].get('semester', '') if days else ''
+        title = f"**Lịch học {schedule_data.get('date_info', '').replace(' to ', ' - ')}**"
+        blocks = [f"{title} ({semester})" if semester else title]
+        blocks.extend(self._day_block(day) for day in days)
+        if not any(day.get('classes') for day in days):
+            blocks.append("Không có lớp học nào trong khoảng thời gian này.")
+        return blocks
+
+    @staticmethod
+    def _exam_sort_key(exam):
+        try:
+            return datetime.strptime(f"{exam.get('ngay_thi', '')} {exam.get('gio_bat_dau', '')}", '%d/%m/%Y %H:%M')
+        except ValueError:
+            return datetime.max
+
+    def _exam_block(self, index, exam):
+        lines = [f"{index}. **{exam.get('ten_mon', 'N/A')}** ({exam.get('ma_mon', 'N/A')})"]
+        if exam.get('ten_mon_eg'):
+            lines.append(f"   - Tên tiếng Anh: {exam['ten_mon_eg']}")
+        if exam.get('ky_thi'):
+            lines.append(f"   - Kỳ thi: {exam['ky_thi']}")
+        lines.append(f"   - Hình thức: {exam.get('hinh_thuc_thi', 'N/A')}")
+        date = exam.get('ngay_thi', 'N/A')
+        try:
+            date = f"{VIETNAMESE_WEEKDAYS[datetime.strptime(date, '%d/%m/%Y').weekday()]}, ngày {date}"
+        except ValueError:
+            pass
+        lines.append(f"   - Thời gian: {exam.get('gio_bat_dau', 'N/A')}, {exam.get('so_phut', 'N/A')} phút, {date}")
+        lines.append(f"   - Phòng thi: {exam.get('ma_phong', 'N/A')}, {exam.get('dia_diem_thi', 'N/A')}")
+        return "\n".join(lines)
+
+    def render_exams(self, exam_query_type, exam_data):
+        """Blocks for the exams of get_all_exams_with_cache/get_exams_with_cache, in date order"""
+        exams = sorted(exam_data.get('exams_list') or [], key=self._exam_sort_key)
+        semester = exam_data.get('semester', '')
+        if not exams:
+            return ["Không tìm thấy lịch thi nào" + (f" trong học kỳ {semester}." if semester else ".")]
+        if exam_query_type == 'full_schedule':
+            header = f"**Lịch thi học kỳ {semester}** ({len(exams)} môn)"
+        else:
+            header = f"**Lịch thi** ({len(exams)} môn)"
+        return [header] + [self._exam_block(i, exam) for i, exam in enumerate(exams, 1)]
+
+# Global instance
+direct_answer_service = DirectAnswerService()
@@ -0,0 +1,91 @@
+import os
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from ..config.redis_config import redis_service
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings with TTL.
+
+    Keys are the normalized query text plus the model name. When QUERY_EMBEDDING_CACHE_REDIS
+    is enabled, entries are also written to Redis so every worker process shares them.
+    """
+
+    def __init__(self):
+        self.max_size = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', 1024))
+        self.ttl = int(os.getenv('QUERY_EMBEDDING_CACHE_TTL', 3600))  # 1 hour
+        self.use_redis = os.getenv('QUERY_EMBEDDING_CACHE_REDIS', 'true').lower() == 'true'
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_query(text):
+        """Unicode NFC, lowercase and collapsed whitespace"""
+        text = unicodedata.normalize('NFC', text or '')
+        return re.sub(r'\s+', ' ', text).strip().lower()
+
+    def _generate_cache_key(self, text, model_name):
+        text_hash = hashlib.sha1(self.normalize_query(text).encode('utf-8')).hexdigest()
+        return f"emb:{model_name}:{text_hash}"
+
+    def get(self, text, model_name):
+        """Return the cached embedding (list of floats) or None"""
+        key = self._generate_cache_key(text, model_name)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+
+        if self.use_redis:
+            cached = redis_service.get_cache(key)
+            if isinstance(cached, list):
+                self._store(key, cached, now)
+                with self._lock:
+                    self.redis_hits += 1
+                return cached
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, text, model_name, embedding):
+        key = self._generate_cache_key(text, model_name)
+        self._store(key, embedding, time.time())
+        if self.use_redis:
+            redis_service.set_cache(key, embedding, self.ttl)
+
+    def _store(self, key, embedding, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'redis_enabled': self.use_redis,
+                'hits': self.hits,
+                'redis_hits': self.redis_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.redis_hits) / lookups, 3) if lookups else 0.0
+            }
+
+# Global instance
+query_embedding_cache = QueryEmbeddingCache()
@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import threading
+from ..utils.logger import Logger
+
+logger = Logger()
+
+DEFAULT_EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+
+
+def _current_rss_bytes():
+    """Return the resident set size of this process in bytes (0 if unknown)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return 0
+
+
+class EmbeddingModelRegistry:
+    """
+    Process-wide registry of sentence-transformers models.
+
+    Each model is loaded lazily on first use, exactly once per process, and then
+    shared by every service (FileService, routes, background workers...).
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._stats = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+
+    def _get_lock(self, model_name):
+        with self._registry_lock:
+            if model_name not in self._locks:
+                self._locks[model_name] = threading.Lock()
+            return self._locks[model_name]
+
+    def get_model(self, model_name=None):
+        """
+        Get a loaded model, loading it on first access.
+
+        Args:
+            model_name (str, optional): sentence-transformers model name. Defaults to EMBEDDING_MODEL.
+
+        Returns:
+            SentenceTransformer: The shared model instance
+        """
+        model_name = model_name or DEFAULT_EMBEDDING_MODEL
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+
+        with self._get_lock(model_name):
+            # Another thread may have finished loading while we waited for the lock
+            model = self._models.get(model_name)
+            if model is not None:
+                return model
+            return self._load(model_name)
+
+    def _load(self, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        rss_before = _current_rss_bytes()
+        started = time.perf_counter()
+        try:
+            model = SentenceTransformer(model_name)
+        except Exception as e:
+            logger.log_with_timestamp('EMBEDDING_REGISTRY_ERROR', f'Failed to load model {model_name}: {e}')
+            raise
+        load_seconds = time.perf_counter() - started
+        rss_after = _current_rss_bytes()
+
+        try:
+            param_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+        except Exception:
+            param_bytes = 0
+
+        self._stats[model_name] = {
+            'model': model_name,
+            'dimension': model.get_sentence_embedding_dimension(),
+            'load_seconds': round(load_seconds, 3),
+            'parameter_bytes': param_bytes,
+            'rss_delta_bytes': max(rss_after - rss_before, 0),
+            'loaded_at': Logger.get_timestamp()
+        }
+        self._models[model_name] = model
+        logger.log_with_timestamp(
+            'EMBEDDING_REGISTRY',
+            f'Loaded model {model_name} in {load_seconds:.2f}s',
+            f'Parameters: {param_bytes / (1024 * 1024):.1f} MB'
+        )
+        return model
+
+    def get_dimension(self, model_name=None):
+        """Return the embedding dimension of a model (loads it if needed)"""
+        model_name = model_name or DEFAULT_EMBEDDING_MODEL
+        self.get_model(model_name)
+        return self._stats[model_name]['dimension']
+
+    def is_loaded(self, model_name=None):
+        return (model_name or DEFAULT_EMBEDDING_MODEL) in self._models
+
+    def warm_up(self, model_names=None):
+        """
+        Load models ahead of the first request.
+
+        Args:
+            model_names (list, optional): Models to load. Defaults to the EMBEDDING_WARMUP_MODELS
+                env var (comma separated) or the default model.
+        """
+        if model_names is None:
+            configured = os.getenv('EMBEDDING_WARMUP_MODELS', DEFAULT_EMBEDDING_MODEL)
+            model_names = [name.strip() for name in configured.split(',') if name.strip()]
+        for model_name in model_names:
+            try:
+                self.get_model(model_name)
+            except Exception as e:
+                # Do not block startup, the model will be retried lazily on first use
+                logger.log_with_timestamp('EMBEDDING_REGISTRY_ERROR', f'Warm-up failed for {model_name}: {e}')
+
+    def get_stats(self):
+        """Return load time and memory usage for every loaded model"""
+        return {
+            'models': list(self._stats.values()),
+            'loaded_count': len(self._models),
+            'process_rss_bytes': _current_rss_bytes()
+        }
+
+# Global instance
+embedding_registry = EmbeddingModelRegistry()
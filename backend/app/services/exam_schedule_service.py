@@ -1,7 +1,8 @@
 from datetime import datetime, timedelta
-import httpx
+from unidecode import unidecode
 from ..utils.logger import Logger
-from .lmstudio_service import parse_time_lmstudio
+from ..lib.http_client import http_clients
+from .time_parser import aparse_time
 
 logger = Logger()
 
@@ -27,29 +28,35 @@ class ExamScheduleService:
         """
         self.schedule_service = schedule_service
         
-    def check_auth(self):
+    def check_auth(self, auth_service=None):
         """Check if the service is properly authenticated
 
+        Args:
+            auth_service (PTITAuthService, optional): Session of the request, defaults to the service's own
+
         Returns:
             bool: True if authenticated, False otherwise
         """
-        return self.auth_service is not None and self.auth_service.access_token is not None
+        auth_service = auth_service or self.auth_service
+        return auth_service is not None and auth_service.access_token is not None
         
-    async def get_exam_schedule_by_semester(self, hoc_ky=None, is_giua_ky=False):
+    async def get_exam_schedule_by_semester(self, hoc_ky=None, is_giua_ky=False, auth_service=None):
         """Get exam schedule data for a specific semester
 
         Args:
             hoc_ky (str): Semester ID, will use current semester if None
             is_giua_ky (bool): Whether to get midterm or final exam schedule
+            auth_service (PTITAuthService, optional): Session of the student, defaults to the service's own
 
         Returns:
             dict: Exam schedule data
         """
         # Minimal logging for exam schedule
+        auth_service = auth_service or self.auth_service
 
-        if not self.check_auth():
+        if not self.check_auth(auth_service):
             logger.log_with_timestamp("EXAM SCHEDULE API", "No auth token found, retrieving current semester...")
-            current_semester, error = self.auth_service.get_current_semester()
+            current_semester, error = auth_service.get_current_semester()
             if error:
                 logger.log_with_timestamp("EXAM SCHEDULE ERROR", f"Authentication error: {error}")
                 raise ValueError(f"Authentication error: {error}")
@@ -58,7 +65,7 @@ class ExamScheduleService:
 
         url = f"{self.base_url}/w-locdslichthisvtheohocky"
         headers = {
-            "Authorization": f"Bearer {self.auth_service.access_token}",
+            "Authorization": f"Bearer {auth_service.access_token}",
             "Content-Type": "application/json"
         }
         payload = {
@@ -79,14 +86,14 @@ class ExamScheduleService:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload, headers=headers)
-                response.raise_for_status()
-                data = response.json()
-                if data.get('data'):
-                    exams = data['data'].get('ds_lich_thi', [])
-                    logger.log_with_timestamp("EXAM SCHEDULE API", f"Fetched {len(exams)} exams for semester {hoc_ky}")
-                return data
+            client = http_clients.get_async_client('ptit')
+            response = await client.post(url, json=payload, headers=headers)
+            response.raise_for_status()
+            data = response.json()
+            if data.get('data'):
+                exams = data['data'].get('ds_lich_thi', [])
+                logger.log_with_timestamp("EXAM SCHEDULE API", f"Fetched {len(exams)} exams for semester {hoc_ky}")
+            return data
         except Exception as e:
             logger.log_with_timestamp("EXAM SCHEDULE ERROR", f"Error getting exam schedule: {str(e)}")
             raise
@@ -239,7 +246,7 @@ class ExamScheduleService:
         exam_data = await self.get_exam_schedule_by_semester(hoc_ky, is_giua_ky)
         all_exams = exam_data['data']['ds_lich_thi'] if exam_data.get('data') and exam_data['data'].get('ds_lich_thi') else []
         # Gọi AI để phân tích thời gian
-        time_info = parse_time_lmstudio(question)
+        time_info = await aparse_time(question)
         type_ = time_info.get('type')
         value = time_info.get('value')
         from datetime import datetime, timedelta
@@ -384,13 +391,22 @@ class ExamScheduleService:
             'all_exams': exams_to_display
         } 
 
-    async def get_exams_for_query(self, message, hoc_ky):
+    async def get_exams_for_query(self, message, hoc_ky, time_info=None, subjects=None, auth_service=None):
         """
         Phân tích ngày từ message, auto-fill tháng/năm nếu thiếu, lọc exam đúng ngày hoặc trong tuần, trả về danh sách exam và text.
+
+        Args:
+            message (str): User question
+            hoc_ky (str): Semester code
+            time_info (dict, optional): Already parsed {"type", "value"} (e.g. from the fused
+                classifier call), the message is only parsed when it is not given
+            subjects (list, optional): Subject names/codes to keep, matched on ten_mon/ma_mon
+            auth_service (PTITAuthService, optional): Session of the student, defaults to the service's own
         """
-        exam_data = await self.get_exam_schedule_by_semester(hoc_ky, False)
+        exam_data = await self.get_exam_schedule_by_semester(hoc_ky, False, auth_service)
         all_exams = exam_data['data']['ds_lich_thi'] if exam_data.get('data') and exam_data['data'].get('ds_lich_thi') else []
-        time_info = parse_time_lmstudio(message)
+        if time_info is None:
+            time_info = await aparse_time(message)
         type_ = time_info.get('type')
         value = time_info.get('value')
         today = datetime.now().date()
@@ -476,9 +492,30 @@ class ExamScheduleService:
                 date_info = exam_dates[0]
         # Lọc exam
         filtered_exams = [e for e in all_exams if e.get('ngay_thi') in exam_dates]
+        if subjects:
+            # No time in the question: the subject alone selects the exams
+            filtered_exams = self.filter_exams_by_subject(filtered_exams if exam_dates else all_exams, subjects)
         exam_text = self.format_exam_schedule(filtered_exams)
         return filtered_exams, exam_text, date_info 
 
+    def filter_exams_by_subject(self, exams, subjects):
+        """Keep the exams whose subject name or code contains one of the subject hints
+
+        Args:
+            exams (list): Exam entries from ds_lich_thi
+            subjects (list): Subject names or codes, with or without diacritics
+
+        Returns:
+            list: Matching exams, in the original order
+        """
+        hints = [unidecode(s).lower().strip() for s in subjects if s and s.strip()]
+        result = []
+        for exam in exams:
+            name = unidecode(f"{exam.get('ten_mon', '')} {exam.get('ma_mon', '')} {exam.get('ten_mon_eg', '')}").lower()
+            if any(hint in name for hint in hints):
+                result.append(exam)
+        return result
+
     def get_weekday_from_date(self, date_str):
         """Convert date string (DD/MM/YYYY) to Vietnamese weekday name
         
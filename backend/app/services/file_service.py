@@ -1,23 +1,38 @@
+import io
 import os
+import re
 import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 import random
-from sentence_transformers import SentenceTransformer
+import numpy as np
 from werkzeug.utils import secure_filename
 from ..lib.supabase import supabase
 from ..utils.logger import Logger
+from .embedding_registry import embedding_registry, DEFAULT_EMBEDDING_MODEL
+from .vector_index_service import vector_index_service
+from .embedding_cache import query_embedding_cache
 
 logger = Logger()
 
+# Number of chunks encoded per model.encode call during ingest
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 64))
+# Maximum number of files searched concurrently in search_relevant_chunks_multi
+RETRIEVAL_MAX_WORKERS = int(os.getenv('RETRIEVAL_MAX_WORKERS', 8))
+
 class FileService:
-    def __init__(self):
-        try:
-            # Load sentence-transformers model
-            self.model = SentenceTransformer('all-MiniLM-L6-v2')
-            self.embedding_dimension = 384  # Matches the model dimension
-            logger.log_with_timestamp('FILE_SERVICE', 'Sentence transformer model initialized')
-        except Exception as e:
-            logger.log_with_timestamp('FILE_SERVICE_ERROR', f'Failed to initialize model: {e}')
-            raise
+    def __init__(self, model_name=None):
+        # Model is shared process-wide through the registry and loaded on first use
+        self.model_name = model_name or DEFAULT_EMBEDDING_MODEL
+
+    @property
+    def model(self):
+        return embedding_registry.get_model(self.model_name)
+
+    @property
+    def embedding_dimension(self):
+        # Dimension of the configured model, not of all-MiniLM-L6-v2
+        return embedding_registry.get_dimension(self.model_name)
 
     def _create_embedding(self, text):
         """Generate proper embedding using sentence-transformers"""
@@ -35,21 +50,193 @@ class FileService:
             # Fallback to zeros in case of error
             return [0.0] * self.embedding_dimension
 
-    def save_file_and_chunks_to_supabase(self, user_id, file, file_content, space_id=None):
+    def embed_query(self, query):
+        """Embed a search query, reusing cached embeddings of the same normalized text"""
+        cached = query_embedding_cache.get(query, self.model_name)
+        if cached is not None:
+            return cached
+        embedding = self._create_embedding(query)
+        # Do not cache the all-zero fallback returned when encoding failed
+        if any(embedding):
+            query_embedding_cache.set(query, self.model_name, embedding)
+        return embedding
+
+    def _create_embeddings(self, texts, batch_size=None):
         """
-        Save file metadata and its text chunks with embeddings into Supabase.
+        Generate embeddings for many texts with batched model.encode calls.
+
+        Args:
+            texts (list): Texts to embed
+            batch_size (int, optional): Texts per encode call. Defaults to EMBEDDING_BATCH_SIZE.
+
+        Returns:
+            np.ndarray: float32 matrix of shape (len(texts), embedding_dimension)
+        """
+        if not texts:
+            return np.zeros((0, self.embedding_dimension), dtype=np.float32)
+        batch_size = batch_size or EMBEDDING_BATCH_SIZE
+        # Same placeholder as _create_embedding for empty or very short text
+        texts = [text if text and len(text.strip()) >= 3 else "empty document" for text in texts]
+        try:
+            embeddings = self.model.encode(
+                texts,
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            return np.asarray(embeddings, dtype=np.float32)
+        except Exception as e:
+            logger.log_with_timestamp('FILE_SERVICE_ERROR', f'Batch embedding error: {e}, falling back to per-chunk encoding')
+            return np.asarray([self._create_embedding(text) for text in texts], dtype=np.float32)
+
+    def extract_text_content(self, raw_bytes, content_type):
+        """
+        Extract plain text from an uploaded file (PDF, DOCX/DOC or text).
+
+        Args:
+            raw_bytes (bytes): Raw file content
+            content_type (str): MIME type sent by the client
+
+        Returns:
+            str: Extracted text
+        """
+        if content_type == 'application/pdf':
+            try:
+                logger.log_with_timestamp('FILE_UPLOAD', 'Processing PDF file...')
+                # For PDF files, we need to use a PDF parser
+                import PyPDF2
+                
+                # Create PDF reader
+                pdf_reader = PyPDF2.PdfReader(io.BytesIO(raw_bytes))
+                
+                # Extract text from all pages
+                text_content = ""
+                for page in pdf_reader.pages:
+                    text_content += page.extract_text() + "\n"
+                    
+                logger.log_with_timestamp('FILE_UPLOAD', f'Successfully extracted {len(text_content)} characters from PDF')
+                return text_content
+            except ImportError:
+                logger.log_with_timestamp('FILE_UPLOAD_ERROR', 'PyPDF2 library not installed, trying fallback method')
+                # Fallback to binary read if PyPDF2 is not available
+                return raw_bytes.decode('utf-8', errors='ignore')
+        elif content_type in ['application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'application/msword']:
+            try:
+                logger.log_with_timestamp('FILE_UPLOAD', 'Processing Word document...')
+                logger.log_with_timestamp('FILE_UPLOAD', f'Read {len(raw_bytes)} bytes from uploaded file')
+                if content_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
+                    return self._extract_docx_text(raw_bytes)
+                return self._extract_doc_text(raw_bytes)
+            except ImportError:
+                logger.log_with_timestamp('FILE_UPLOAD_ERROR', 'python-docx library not available, trying fallback method')
+                # Fallback to binary read if python-docx is not available
+                return raw_bytes.decode('utf-8', errors='ignore')
+            except Exception as e:
+                logger.log_with_timestamp('FILE_UPLOAD_ERROR', f'Error processing Word document: {str(e)}, trying fallback method')
+                # Fallback to binary read if document processing fails
+                return raw_bytes.decode('utf-8', errors='ignore')
+        else:
+            # For text files, just read as text
+            content = raw_bytes.decode('utf-8', errors='ignore')
+            logger.log_with_timestamp('FILE_UPLOAD', f'Extracted {len(content)} characters from text file')
+            return content
+
+    def _read_docx(self, docx_file):
+        """Extract paragraphs and table rows from a python-docx document"""
+        from docx import Document
+        doc = Document(docx_file)
+        
+        # Extract text from all paragraphs
+        text_content = ""
+        for paragraph in doc.paragraphs:
+            if paragraph.text.strip():  # Only add non-empty paragraphs
+                text_content += paragraph.text + "\n"
+        
+        # Extract text from tables if any
+        for table in doc.tables:
+            for row in table.rows:
+                row_text = ""
+                for cell in row.cells:
+                    if cell.text.strip():
+                        row_text += cell.text.strip() + " | "
+                if row_text:
+                    text_content += row_text.rstrip(" | ") + "\n"
+        
+        # Remove excessive whitespace
+        return '\n'.join(line.strip() for line in text_content.split('\n') if line.strip())
+
+    def _extract_docx_text(self, raw_bytes):
+        """DOCX extraction with a ZIP structure check before retrying"""
+        docx_file = io.BytesIO(raw_bytes)
+        
+        # Try to verify it's a valid ZIP file and process with python-docx
+        try:
+            # Try to open with python-docx directly first
+            text_content = self._read_docx(docx_file)
+            if text_content:
+                logger.log_with_timestamp('FILE_UPLOAD', f'Successfully extracted {len(text_content)} characters from DOCX')
+                return text_content
+            logger.log_with_timestamp('FILE_UPLOAD', 'No text content found in DOCX, using fallback')
+            raise Exception("No readable text content found")
+                
+        except Exception as docx_error:
+            logger.log_with_timestamp('FILE_UPLOAD_ERROR', f'python-docx processing failed: {str(docx_error)}, trying ZIP verification')
+            
+        # Try ZIP verification as fallback
+        try:
+            docx_file.seek(0)
+            with zipfile.ZipFile(docx_file, 'r') as zip_file:
+                # Check if it has the typical DOCX structure
+                if 'word/document.xml' not in zip_file.namelist():
+                    raise Exception("Not a valid DOCX file structure")
+            
+            # If ZIP is valid, try python-docx again
+            docx_file.seek(0)
+            text_content = self._read_docx(docx_file)
+            if text_content:
+                logger.log_with_timestamp('FILE_UPLOAD', f'Successfully extracted {len(text_content)} characters from DOCX on retry')
+                return text_content
+            logger.log_with_timestamp('FILE_UPLOAD', 'No text content found in DOCX on retry, using fallback')
+            raise Exception("No readable text content found on retry")
+                
+        except zipfile.BadZipFile:
+            logger.log_with_timestamp('FILE_UPLOAD_ERROR', 'File is not a valid ZIP/DOCX file, using fallback')
+            raise Exception("Invalid DOCX format")
+        except Exception as retry_error:
+            logger.log_with_timestamp('FILE_UPLOAD_ERROR', f'Retry also failed: {str(retry_error)}, using fallback')
+            raise Exception("DOCX processing failed completely")
+
+    def _extract_doc_text(self, raw_bytes):
+        """Best-effort text extraction for legacy DOC files"""
+        logger.log_with_timestamp('FILE_UPLOAD', 'DOC file detected, trying text extraction')
+        try:
+            # Convert bytes to string and extract readable text
+            raw_text = raw_bytes.decode('utf-8', errors='ignore')
+            # Remove control characters and keep only printable text
+            text_content = re.sub(r'[^\x20-\x7E\n\r\t]', ' ', raw_text)
+            # Clean up multiple spaces and empty lines
+            text_content = re.sub(r'\s+', ' ', text_content)
+            text_content = re.sub(r'\n\s*\n', '\n', text_content)
+            
+            if len(text_content.strip()) > 50:  # If we got reasonable amount of text
+                logger.log_with_timestamp('FILE_UPLOAD', f'Extracted {len(text_content)} characters from DOC file')
+                return text_content
+            raise Exception("Insufficient readable content from DOC file")
+        except Exception as doc_error:
+            logger.log_with_timestamp('FILE_UPLOAD_ERROR', f'DOC processing failed: {str(doc_error)}, using raw fallback')
+            return raw_bytes.decode('utf-8', errors='ignore')
+
+    def create_file_record(self, user_id, filename, content_type, file_size, space_id=None):
+        """
+        Insert the user_files row for a new upload with status 'processing'.
         Returns the generated file_id.
         """
-        # create file_id and temp path
         file_id = str(uuid.uuid4())
-        filename = secure_filename(file.filename)
-        # metadata
-        file_size = len(file_content)
         meta = {
             'id': file_id,
             'user_id': user_id,
-            'filename': filename,
-            'content_type': file.content_type,
+            'filename': secure_filename(filename),
+            'content_type': content_type,
             'file_size_bytes': file_size,
             'status': 'processing'
         }
@@ -61,31 +248,76 @@ class FileService:
         # Sử dụng phương thức đồng bộ thay vì await
         supabase.table('user_files').insert(meta).execute()
         logger.log_with_timestamp('FILE_SERVICE', f'Metadata inserted for {file_id}')
+        return file_id
+
+    def update_file_status(self, file_id, status):
+        """Update user_files.status ('processing', 'ready' or 'failed')"""
+        supabase.table('user_files').update({'status': status}).eq('id', file_id).execute()
+
+    def delete_file_chunks(self, file_id):
+        """Remove all chunks of a file (used before re-processing a failed ingest)"""
+        supabase.table('file_chunks').delete().eq('file_id', file_id).execute()
+
+    def process_file_chunks(self, file_id, file_content, batch_size=None, progress_callback=None):
+        """
+        Chunk, embed and insert the text of an already registered file, then mark it ready.
+
+        Args:
+            file_id (str): ID returned by create_file_record
+            file_content (str): Extracted text of the file
+            batch_size (int, optional): Chunks per embedding/insert batch. Defaults to EMBEDDING_BATCH_SIZE.
+            progress_callback (callable, optional): Called as progress_callback(chunks_done, chunks_total)
+
+        Returns:
+            int: Number of chunks saved
+        """
+        batch_size = batch_size or EMBEDDING_BATCH_SIZE
         
         # chunk text
         chunks = [ file_content[i:i+500] for i in range(0, len(file_content), 400) ]
+        total = len(chunks)
+        if progress_callback:
+            progress_callback(0, total)
         
-        # generate real embeddings using sentence-transformers
-        embeddings = [self._create_embedding(chunk) for chunk in chunks]
-        
-        # prepare records
-        records = []
-        for idx, (chunk, emb) in enumerate(zip(chunks, embeddings)):
-            records.append({
-                'file_id': file_id,
-                'chunk_index': idx,
-                'content': chunk,
-                'embedding': emb
-            })
+        # embed and insert batch by batch so progress can be reported while ingesting
+        all_embeddings = []
+        for start in range(0, total, batch_size):
+            batch_chunks = chunks[start:start + batch_size]
+            embeddings = self._create_embeddings(batch_chunks, batch_size)
+            all_embeddings.append(embeddings)
+            records = [
+                {
+                    'file_id': file_id,
+                    'chunk_index': start + offset,
+                    'content': chunk,
+                    'embedding': emb.tolist()
+                }
+                for offset, (chunk, emb) in enumerate(zip(batch_chunks, embeddings))
+            ]
+            for i in range(0, len(records), 100):
+                supabase.table('file_chunks').insert(records[i:i+100]).execute()
+            if progress_callback:
+                progress_callback(start + len(batch_chunks), total)
             
-        # batch insert
-        for i in range(0, len(records), 100):
-            batch = records[i:i+100]
-            supabase.table('file_chunks').insert(batch).execute()
+        # keep the local vector index in sync before the file becomes searchable
+        if vector_index_service.is_enabled():
+            try:
+                vector_index_service.add_file(file_id, chunks, np.vstack(all_embeddings) if all_embeddings else [])
+            except Exception as e:
+                logger.log_with_timestamp('FILE_SERVICE_ERROR', f'Error indexing file {file_id} locally: {str(e)}')
             
         # update status
-        supabase.table('user_files').update({'status':'ready'}).eq('id', file_id).execute()
-        logger.log_with_timestamp('FILE_SERVICE', f'File {file_id} saved with {len(records)} chunks')
+        self.update_file_status(file_id, 'ready')
+        logger.log_with_timestamp('FILE_SERVICE', f'File {file_id} saved with {total} chunks')
+        return total
+
+    def save_file_and_chunks_to_supabase(self, user_id, file, file_content, space_id=None, batch_size=None):
+        """
+        Save file metadata and its text chunks with embeddings into Supabase.
+        Returns the generated file_id.
+        """
+        file_id = self.create_file_record(user_id, file.filename, file.content_type, len(file_content), space_id)
+        self.process_file_chunks(file_id, file_content, batch_size)
         return file_id
 
     def search_relevant_chunks_in_supabase(self, query, file_id, top_k=10):
@@ -94,69 +326,142 @@ class FileService:
         Returns list of text chunks.
         """
         # generate embedding for query using sentence-transformers
-        emb = self._create_embedding(query)
+        emb = self.embed_query(query)
+        return [content for _, content in self._search_file_scored(query, emb, file_id, top_k)]
+
+    def search_relevant_chunks_multi(self, query, file_ids, top_k=10):
+        """
+        Retrieve the top_k chunks across several files for one query.
+
+        The query is embedded once, the per-file searches run concurrently and the
+        results are merged by similarity score before the top_k cut.
+
+        Args:
+            query (str): User question
+            file_ids (list): IDs of the files to search
+            top_k (int): Number of chunks to return across all files
+
+        Returns:
+            tuple: (chunks, file_ids that contributed at least one chunk)
+        """
+        # Keep order but drop files attached both to the chat and to the space
+        file_ids = list(dict.fromkeys(file_ids or []))
+        if not file_ids:
+            return [], []
+
+        emb = self.embed_query(query)
+        workers = min(RETRIEVAL_MAX_WORKERS, len(file_ids))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            per_file = list(pool.map(
+                lambda current_file_id: self._search_file_scored(query, emb, current_file_id, top_k),
+                file_ids
+            ))
+
+        scored = []
+        for current_file_id, results in zip(file_ids, per_file):
+            for score, content in results:
+                scored.append((score, current_file_id, content))
+        # Stable sort keeps per-file order (vector, keyword, fallback) among equal scores
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        chunks = []
+        contributing_files = []
+        seen = set()
+        for score, current_file_id, content in scored:
+            if content in seen:
+                continue
+            seen.add(content)
+            chunks.append(content)
+            if current_file_id not in contributing_files:
+                contributing_files.append(current_file_id)
+            if len(chunks) >= top_k:
+                break
+        return chunks, contributing_files
+
+    def _match_file_chunks(self, emb, file_id, top_k, match_threshold=0.5):
+        """
+        Vector search for one file through the local index (VECTOR_SEARCH_BACKEND=local)
+        or the match_file_chunks RPC.
+        Returns list of (similarity, content) sorted by similarity.
+        """
+        if vector_index_service.is_enabled():
+            try:
+                return vector_index_service.search(emb, file_id, top_k, match_threshold)
+            except Exception as e:
+                logger.log_with_timestamp('FILE_SERVICE_ERROR', f'Local vector search failed, using RPC: {str(e)}')
+
+        # call RPC for vector search - Sử dụng tên parameter đúng từ database function
+        response = supabase.rpc('match_file_chunks', {
+            'query_embedding': emb,
+            'match_file_id': file_id,  # Sử dụng tên parameter đúng từ RPC function
+            'match_threshold': match_threshold,
+            'match_count': top_k
+        }).execute()
+        
+        # Kiểm tra lỗi theo cách khác thay vì dùng .error
+        if hasattr(response, 'error') and response.error:
+            raise Exception(f'RPC error: {response.error.message}')
+            
+        # Truy cập dữ liệu bằng .data hoặc []
+        data = []
+        if hasattr(response, 'data'):
+            data = response.data or []
+        elif isinstance(response, dict) and 'data' in response:
+            data = response['data'] or []
+        elif hasattr(response, '__getitem__'):
+            try:
+                data = response[:] or []  # Truy cập bằng slicing nếu là iterable
+            except (TypeError, IndexError):
+                data = []
         
+        return [
+            (float(item.get('similarity') or match_threshold), item['content'])
+            for item in data if isinstance(item, dict) and 'content' in item
+        ]
+
+    def _search_file_scored(self, query, emb, file_id, top_k=10):
+        """
+        Search one file with a precomputed query embedding.
+
+        Returns list of (score, content): vector matches keep their similarity, keyword
+        matches score 0 and random fallback chunks score -1 so they rank last when merged.
+        """
         try:
             # Set cosine similarity threshold for semantic matching
             match_threshold = 0.5  # Higher value for better quality matches
-            
-            # call RPC for vector search - Sử dụng tên parameter đúng từ database function
-            response = supabase.rpc('match_file_chunks', {
-                'query_embedding': emb,
-                'match_file_id': file_id,  # Sử dụng tên parameter đúng từ RPC function
-                'match_threshold': match_threshold,
-                'match_count': top_k
-            }).execute()
-            
-            # Xử lý kết quả phù hợp với phiên bản mới của Supabase Python Client
             try:
-                # Kiểm tra lỗi theo cách khác thay vì dùng .error
-                if hasattr(response, 'error') and response.error:
-                    logger.log_with_timestamp('FILE_SERVICE_ERROR', f'RPC error: {response.error.message}')
-                    # Fallback: lấy một số chunks ngẫu nhiên từ file
-                    return self._get_fallback_chunks(file_id, top_k)
-                    
-                # Truy cập dữ liệu bằng .data hoặc []
-                data = []
-                if hasattr(response, 'data'):
-                    data = response.data or []
-                elif isinstance(response, dict) and 'data' in response:
-                    data = response['data'] or []
-                elif hasattr(response, '__getitem__'):
-                    try:
-                        data = response[:] or []  # Truy cập bằng slicing nếu là iterable
-                    except (TypeError, IndexError):
-                        data = []
-                
-                chunks = [item['content'] for item in data if isinstance(item, dict) and 'content' in item]
-                
-                # Thêm tìm kiếm từ khóa trực tiếp khi vector search không đủ kết quả
-                if len(chunks) < top_k:
-                    logger.log_with_timestamp('FILE_SERVICE', f'Vector search found only {len(chunks)} chunks, supplementing with keyword search')
-                    keyword_chunks = self._keyword_search_chunks(query, file_id, top_k - len(chunks))
-                    # Thêm các chunks tìm được bằng từ khóa mà không trùng với vector search
-                    for chunk in keyword_chunks:
-                        if chunk not in chunks:
-                            chunks.append(chunk)
-                            if len(chunks) >= top_k:
-                                break
-                
-                # Nếu không tìm thấy kết quả nào, lấy một số chunks ngẫu nhiên từ file
-                if not chunks:
-                    logger.log_with_timestamp('FILE_SERVICE', f'No matching chunks found, using fallback')
-                    return self._get_fallback_chunks(file_id, top_k)
-                    
-                logger.log_with_timestamp('FILE_SERVICE', f'Found {len(chunks)} matching chunks')
-                return chunks
-                
+                results = self._match_file_chunks(emb, file_id, top_k, match_threshold)
             except Exception as e:
-                logger.log_with_timestamp('FILE_SERVICE_ERROR', f'Error processing response: {str(e)}')
-                # Fallback khi có lỗi xử lý response
-                return self._get_fallback_chunks(file_id, top_k)
+                logger.log_with_timestamp('FILE_SERVICE_ERROR', f'RPC call error: {str(e)}')
+                # Fallback: lấy một số chunks ngẫu nhiên từ file
+                return [(-1.0, chunk) for chunk in self._get_fallback_chunks(file_id, top_k)]
+            
+            chunks = [content for _, content in results]
+            
+            # Thêm tìm kiếm từ khóa trực tiếp khi vector search không đủ kết quả
+            if len(results) < top_k:
+                logger.log_with_timestamp('FILE_SERVICE', f'Vector search found only {len(results)} chunks, supplementing with keyword search')
+                keyword_chunks = self._keyword_search_chunks(query, file_id, top_k - len(results))
+                # Thêm các chunks tìm được bằng từ khóa mà không trùng với vector search
+                for chunk in keyword_chunks:
+                    if chunk not in chunks:
+                        chunks.append(chunk)
+                        results.append((0.0, chunk))
+                        if len(results) >= top_k:
+                            break
+            
+            # Nếu không tìm thấy kết quả nào, lấy một số chunks ngẫu nhiên từ file
+            if not results:
+                logger.log_with_timestamp('FILE_SERVICE', f'No matching chunks found, using fallback')
+                return [(-1.0, chunk) for chunk in self._get_fallback_chunks(file_id, top_k)]
                 
+            logger.log_with_timestamp('FILE_SERVICE', f'Found {len(results)} matching chunks')
+            return results
+            
         except Exception as e:
-            logger.log_with_timestamp('FILE_SERVICE_ERROR', f'RPC call error: {str(e)}')
-            return self._get_fallback_chunks(file_id, top_k)
+            logger.log_with_timestamp('FILE_SERVICE_ERROR', f'Error processing response: {str(e)}')
+            # Fallback khi có lỗi xử lý response
+            return [(-1.0, chunk) for chunk in self._get_fallback_chunks(file_id, top_k)]
             
     def _get_fallback_chunks(self, file_id, count=5):
         """
@@ -261,7 +566,7 @@ class FileService:
             match_threshold = 0.5  # Higher value for better quality matches
             
             # Embed câu query với sentence-transformers
-            embedding = self._create_embedding(query)
+            embedding = self.embed_query(query)
             
             # Vector search với số lượng chunks tăng lên
             response = supabase.rpc(
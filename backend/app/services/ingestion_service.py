@@ -0,0 +1,199 @@
+import os
+import time
+import queue
+import threading
+from ..utils.logger import Logger
+from .response_cache_service import response_cache
+from .vector_index_service import vector_index_service
+
+logger = Logger()
+
+class IngestionQueueFull(Exception):
+    """Raised when the ingestion queue cannot accept another upload"""
+    pass
+
+class IngestionService:
+    """
+    Background ingestion of uploaded files.
+
+    Uploads are registered in user_files with status 'processing' and pushed to a bounded
+    job queue. A pool of worker threads extracts text, chunks, embeds and inserts the chunks,
+    retrying failed jobs, and keeps user_files.status in sync with the outcome.
+    """
+
+    def __init__(self, file_service=None):
+        self.file_service = file_service
+        self.max_workers = int(os.getenv('INGEST_WORKERS', 2))
+        self.max_queue_size = int(os.getenv('INGEST_QUEUE_SIZE', 32))
+        self.max_retries = int(os.getenv('INGEST_MAX_RETRIES', 2))
+        self.retry_backoff = float(os.getenv('INGEST_RETRY_BACKOFF', 2.0))
+        # Finished jobs are kept this long so clients can still poll their final status
+        self.job_retention = int(os.getenv('INGEST_JOB_RETENTION', 3600))
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def set_file_service(self, file_service):
+        """Set the FileService used to process jobs
+
+        Args:
+            file_service (FileService): The file service instance
+        """
+        self.file_service = file_service
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._workers = [w for w in self._workers if w.is_alive()]
+            for i in range(len(self._workers), self.max_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f'ingest-worker-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, user_id, filename, content_type, raw_bytes, space_id=None):
+        """
+        Register an upload and queue it for background processing.
+
+        Returns:
+            dict: Public job status (file_id, status, progress...)
+
+        Raises:
+            IngestionQueueFull: If the queue is at capacity
+        """
+        if self._queue.full():
+            raise IngestionQueueFull(f'Ingestion queue is full ({self.max_queue_size} jobs)')
+
+        file_id = self.file_service.create_file_record(user_id, filename, content_type, len(raw_bytes), space_id)
+        job = {
+            'file_id': file_id,
+            'user_id': user_id,
+            'filename': filename,
+            'content_type': content_type,
+            'space_id': space_id,
+            'raw_bytes': raw_bytes,
+            'status': 'processing',
+            'attempts': 0,
+            'chunks_done': 0,
+            'chunks_total': None,
+            'error': None,
+            'queued_at': time.time(),
+            'finished_at': None
+        }
+        with self._lock:
+            self._prune_jobs()
+            self._jobs[file_id] = job
+
+        try:
+            self._queue.put_nowait(file_id)
+        except queue.Full:
+            # Lost the race for the last slot: do not leave a row stuck in 'processing'
+            self._finish(job, 'failed', 'Ingestion queue is full')
+            raise IngestionQueueFull(f'Ingestion queue is full ({self.max_queue_size} jobs)')
+
+        self._ensure_workers()
+        logger.log_with_timestamp('INGEST', f'Queued {filename} as {file_id}', f'Queue size: {self._queue.qsize()}')
+        return self.get_status(file_id)
+
+    def _worker_loop(self):
+        while True:
+            file_id = self._queue.get()
+            try:
+                job = self._jobs.get(file_id)
+                if job:
+                    self._process(job)
+            except Exception as e:
+                logger.log_with_timestamp('INGEST_ERROR', f'Unexpected worker error for {file_id}: {str(e)}')
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job):
+        file_id = job['file_id']
+        while True:
+            job['attempts'] += 1
+            try:
+                content = self.file_service.extract_text_content(job['raw_bytes'], job['content_type'])
+
+                def on_progress(done, total):
+                    job['chunks_done'] = done
+                    job['chunks_total'] = total
+
+                self.file_service.process_file_chunks(file_id, content, progress_callback=on_progress)
+                self._finish(job, 'ready')
+                if job['space_id']:
+                    # The space has new material, cached answers for it are stale
+                    response_cache.invalidate_space(job['space_id'])
+                logger.log_with_timestamp('INGEST', f'File {file_id} ready after {job["attempts"]} attempt(s)')
+                return
+            except Exception as e:
+                job['error'] = str(e)
+                logger.log_with_timestamp('INGEST_ERROR', f'Attempt {job["attempts"]} failed for {file_id}: {str(e)}')
+                if job['attempts'] > self.max_retries:
+                    self._finish(job, 'failed', str(e))
+                    return
+                # Drop partially inserted chunks so the retry does not duplicate them
+                try:
+                    self.file_service.delete_file_chunks(file_id)
+                except Exception as cleanup_error:
+                    logger.log_with_timestamp('INGEST_ERROR', f'Error cleaning chunks for {file_id}: {str(cleanup_error)}')
+                job['chunks_done'] = 0
+                time.sleep(self.retry_backoff * job['attempts'])
+
+    def _finish(self, job, status, error=None):
+        job['status'] = status
+        job['error'] = error
+        job['finished_at'] = time.time()
+        # Raw upload bytes are no longer needed once the job is settled
+        job['raw_bytes'] = None
+        try:
+            self.file_service.update_file_status(job['file_id'], status)
+        except Exception as e:
+            logger.log_with_timestamp('INGEST_ERROR', f'Error updating status for {job["file_id"]}: {str(e)}')
+        if status == 'failed':
+            # A search during the ingest may have indexed chunks that are now gone
+            vector_index_service.remove_file(job['file_id'])
+
+    def _prune_jobs(self):
+        now = time.time()
+        expired = [
+            file_id for file_id, job in self._jobs.items()
+            if job['finished_at'] and now - job['finished_at'] > self.job_retention
+        ]
+        for file_id in expired:
+            del self._jobs[file_id]
+
+    def get_status(self, file_id, user_id=None):
+        """
+        Get the progress of an ingestion job.
+
+        Args:
+            file_id (str): File id returned by submit
+            user_id (str, optional): Only return the job if this user uploaded it
+
+        Returns:
+            dict: Job status, or None if the job is unknown to this process (or not the user's)
+        """
+        job = self._jobs.get(file_id)
+        if not job or (user_id is not None and str(job['user_id']) != str(user_id)):
+            return None
+        total = job['chunks_total']
+        return {
+            'file_id': job['file_id'],
+            'filename': job['filename'],
+            'status': job['status'],
+            'attempts': job['attempts'],
+            'chunks_done': job['chunks_done'],
+            'chunks_total': total,
+            'progress': round(job['chunks_done'] / total, 3) if total else (1.0 if job['status'] == 'ready' else 0.0),
+            'error': job['error']
+        }
+
+    def get_queue_stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'max_queue_size': self.max_queue_size,
+            'workers': self.max_workers,
+            'active_jobs': sum(1 for job in self._jobs.values() if job['status'] == 'processing')
+        }
+
+# Global instance
+ingestion_service = IngestionService()
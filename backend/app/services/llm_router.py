@@ -0,0 +1,474 @@
+import os
+import time
+import threading
+from contextlib import contextmanager, asynccontextmanager
+import httpx
+from ..config.agents import get_llm_backends
+from ..lib.http_client import http_clients
+from ..utils.logger import Logger
+
+logger = Logger()
+
+CHAT_COMPLETIONS_PATH = "/v1/chat/completions"
+MODELS_PATH = "/v1/models"
+
+
+class NoBackendAvailable(Exception):
+    """No configured backend serves the requested model"""
+
+
+class LLMBackend:
+    """One OpenAI-compatible server and its live load figures"""
+
+    def __init__(self, name, url, models=None, api_key="lm-studio"):
+        self.name = name
+        self.url = url.rstrip('/')
+        # None: serves whatever the server lists on /v1/models
+        self.models = set(models) if models else None
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        self.healthy = True  # optimistic until the first health check says otherwise
+        self.listed_models = None
+        self.in_flight = 0
+        self.tokens_per_sec = None  # moving average of completion throughput
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_check = None
+        # Failed requests in a row, the backend is marked down at LLM_FAILURE_THRESHOLD
+        self.consecutive_failures = 0
+
+    @property
+    def completions_url(self):
+        return self.url + CHAT_COMPLETIONS_PATH
+
+    def serves(self, model):
+        if self.models is not None:
+            return model in self.models
+        return self.listed_models is None or model in self.listed_models
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'url': self.url,
+            'models': sorted(self.models) if self.models is not None else None,
+            'listed_models': self.listed_models,
+            'healthy': self.healthy,
+            'in_flight': self.in_flight,
+            'tokens_per_sec': round(self.tokens_per_sec, 1) if self.tokens_per_sec else None,
+            'requests': self.requests,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'last_error': self.last_error,
+            'last_check': self.last_check
+        }
+
+
+class _RoutedStream:
+    """Streaming response of a backend; counts streamed chunks for the throughput figure"""
+
+    def __init__(self, response, backend):
+        self._response = response
+        self.backend = backend
+        self.chunks = 0
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def iter_lines(self):
+        for line in self._response.iter_lines():
+            if line.startswith('data: '):
+                self.chunks += 1
+            yield line
+
+    async def aiter_lines(self):
+        async for line in self._response.aiter_lines():
+            if line.startswith('data: '):
+                self.chunks += 1
+            yield line
+
+
+class LLMRouter:
+    """
+    Dispatches chat completion requests over a pool of OpenAI-compatible backends.
+
+    - Only backends that serve the request's model (config/agents.py LLM_BACKENDS) are used
+    - The least-loaded healthy backend wins: lowest (requests in flight + 1) / recent tokens per second
+    - Connection errors and 5xx responses fail over to the next backend before anything is returned
+    - LLM_FAILURE_THRESHOLD failed requests in a row mark a backend down (ranked last) until a
+      request or health check succeeds again, one 5xx does not take it out of rotation
+    - A daemon thread checks /v1/models on every backend every LLM_HEALTH_INTERVAL seconds
+    - The pool comes from config/agents.py or LLM_BACKENDS only, reload() applies config changes
+    """
+
+    def __init__(self):
+        self.health_interval = float(os.getenv('LLM_HEALTH_INTERVAL', 15))
+        self.health_timeout = float(os.getenv('LLM_HEALTH_TIMEOUT', 3))
+        # Weight of the newest sample in the tokens/sec moving average
+        self.throughput_alpha = float(os.getenv('LLM_THROUGHPUT_ALPHA', 0.3))
+        self.failure_threshold = max(1, int(os.getenv('LLM_FAILURE_THRESHOLD', 3)))
+        self._backends = {}
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self._stop = threading.Event()
+        for config in get_llm_backends():
+            self.add_backend(config['name'], config['url'], config.get('models'), config.get('api_key', 'lm-studio'))
+
+    @staticmethod
+    def _same_config(backend, config):
+        models = config.get('models')
+        return (
+            backend.url == config['url'].rstrip('/')
+            and backend.models == (set(models) if models else None)
+            and backend.headers['Authorization'] == f"Bearer {config.get('api_key', 'lm-studio')}"
+        )
+
+    def reload(self):
+        """
+        Apply the configured backends (config/agents.py, LLM_BACKENDS) without restarting.
+
+        Unchanged backends keep their health and throughput figures, changed ones are replaced
+        and probed, the ones no longer configured are removed.
+
+        Returns:
+            dict: Names of the added and removed backends
+        """
+        configs = get_llm_backends()
+        with self._lock:
+            current = dict(self._backends)
+        added = []
+        for config in configs:
+            backend = current.get(config['name'])
+            if backend is None or not self._same_config(backend, config):
+                self.add_backend(
+                    config['name'], config['url'], config.get('models'), config.get('api_key', 'lm-studio'), check=True
+                )
+                added.append(config['name'])
+        configured = {config['name'] for config in configs}
+        removed = [name for name in current if name not in configured and self.remove_backend(name)]
+        return {'added': added, 'removed': removed}
+
+    def init_app(self, app):
+        """Attach the router to the Flask app and start the health checks"""
+        app.extensions['llm_router'] = self
+        self.start_health_checks()
+
+    # Backend pool
+
+    def add_backend(self, name, url, models=None, api_key="lm-studio", check=False):
+        """
+        Add (or replace) a backend, from configuration only (see reload).
+
+        Args:
+            name (str): Unique backend name
+            url (str): Base URL, e.g. http://192.168.1.216:1234
+            models (list, optional): Models it serves, None for everything it lists
+            check (bool): Probe it right away instead of waiting for the next health check
+
+        Returns:
+            dict: The backend state
+        """
+        backend = LLMBackend(name, url, models, api_key)
+        with self._lock:
+            self._backends[name] = backend
+        logger.log_with_timestamp('LLM_ROUTER', f'Backend {name} added', f'{backend.url} models={models}')
+        if check:
+            self.check_backend(backend)
+        return backend.to_dict()
+
+    def remove_backend(self, name):
+        """Remove a backend; requests already running on it finish normally"""
+        with self._lock:
+            removed = self._backends.pop(name, None)
+        if removed:
+            logger.log_with_timestamp('LLM_ROUTER', f'Backend {name} removed')
+        return removed is not None
+
+    def candidates(self, model):
+        """
+        Backends serving model, best first.
+
+        Healthy backends are ordered by expected wait: (in flight + 1) / tokens per second,
+        a backend without throughput samples yet is ranked like the average one.
+        Unhealthy backends come last so a failed health check never blocks every request.
+        """
+        with self._lock:
+            backends = [b for b in self._backends.values() if b.serves(model)]
+            known = [b.tokens_per_sec for b in backends if b.tokens_per_sec]
+            default_tps = sum(known) / len(known) if known else 1.0
+            return sorted(
+                backends,
+                key=lambda b: (not b.healthy, (b.in_flight + 1) / (b.tokens_per_sec or default_tps), b.in_flight)
+            )
+
+    def _acquire(self, backend):
+        with self._lock:
+            backend.in_flight += 1
+            backend.requests += 1
+
+    def _release(self, backend, started, tokens=None, error=None):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            backend.in_flight -= 1
+            if error is not None:
+                backend.failures += 1
+                backend.last_error = error
+                return
+            backend.consecutive_failures = 0
+            backend.healthy = True
+            if tokens and elapsed > 0:
+                sample = tokens / elapsed
+                if backend.tokens_per_sec is None:
+                    backend.tokens_per_sec = sample
+                else:
+                    backend.tokens_per_sec += self.throughput_alpha * (sample - backend.tokens_per_sec)
+
+    def _record_failure(self, backend, error):
+        """Count a failed request, the backend is marked down once it failed failure_threshold times in a row"""
+        with self._lock:
+            backend.consecutive_failures += 1
+            trip = backend.healthy and backend.consecutive_failures >= self.failure_threshold
+            if trip:
+                # Ranked last until a request or health check succeeds again
+                backend.healthy = False
+        if trip:
+            logger.log_with_timestamp(
+                'LLM_ROUTER_ERROR',
+                f'Backend {backend.name} failed {backend.consecutive_failures} times in a row, marked down',
+                error
+            )
+        else:
+            logger.log_with_timestamp('LLM_ROUTER_ERROR', f'Backend {backend.name} failed, failing over', error)
+
+    @staticmethod
+    def _completion_tokens(response):
+        try:
+            return response.json().get('usage', {}).get('completion_tokens')
+        except Exception:
+            return None
+
+    def _backends_for(self, payload):
+        backends = self.candidates(payload.get('model'))
+        if not backends:
+            raise NoBackendAvailable(f"No LLM backend serves model {payload.get('model')}")
+        return backends
+
+    # Requests
+
+    def post(self, payload, timeout=60):
+        """
+        Send a non-streaming chat completion to the best backend, failing over on errors.
+
+        Returns:
+            httpx.Response: Response of the first backend that did not fail (check raise_for_status)
+        """
+        last_error = None
+        for backend in self._backends_for(payload):
+            started = time.perf_counter()
+            self._acquire(backend)
+            try:
+                response = http_clients.get_client('lmstudio').post(
+                    backend.completions_url, headers=backend.headers, json=payload, timeout=timeout
+                )
+            except httpx.TransportError as e:
+                last_error = e
+                self._release(backend, started, error=str(e))
+                self._record_failure(backend, str(e))
+                continue
+            if response.status_code >= 500:
+                last_error = httpx.HTTPStatusError(
+                    f'{backend.name} returned {response.status_code}', request=response.request, response=response
+                )
+                self._release(backend, started, error=f'HTTP {response.status_code}')
+                self._record_failure(backend, f'HTTP {response.status_code}')
+                continue
+            self._release(backend, started, tokens=self._completion_tokens(response))
+            return response
+        raise last_error
+
+    async def apost(self, payload, timeout=60):
+        """Async variant of post on the pooled async client"""
+        last_error = None
+        for backend in self._backends_for(payload):
+            started = time.perf_counter()
+            self._acquire(backend)
+            try:
+                response = await http_clients.get_async_client('lmstudio').post(
+                    backend.completions_url, headers=backend.headers, json=payload, timeout=timeout
+                )
+            except httpx.TransportError as e:
+                last_error = e
+                self._release(backend, started, error=str(e))
+                self._record_failure(backend, str(e))
+                continue
+            except BaseException:
+                # Cancelled by the caller: not the backend's fault
+                self._release(backend, started)
+                raise
+            if response.status_code >= 500:
+                last_error = httpx.HTTPStatusError(
+                    f'{backend.name} returned {response.status_code}', request=response.request, response=response
+                )
+                self._release(backend, started, error=f'HTTP {response.status_code}')
+                self._record_failure(backend, f'HTTP {response.status_code}')
+                continue
+            self._release(backend, started, tokens=self._completion_tokens(response))
+            return response
+        raise last_error
+
+    @contextmanager
+    def stream(self, payload, timeout=60):
+        """
+        Open a streaming chat completion on the best backend.
+
+        Failover happens until a backend answers with a non-5xx status, once chunks
+        are flowing the stream stays on that backend.
+
+        Yields:
+            _RoutedStream: httpx streaming response wrapper (iter_lines, status_code, raise_for_status)
+        """
+        last_error = None
+        client = http_clients.get_client('lmstudio')
+        for backend in self._backends_for(payload):
+            started = time.perf_counter()
+            self._acquire(backend)
+            try:
+                request = client.build_request(
+                    'POST', backend.completions_url, headers=backend.headers, json=payload, timeout=timeout
+                )
+                response = client.send(request, stream=True)
+            except httpx.TransportError as e:
+                last_error = e
+                self._release(backend, started, error=str(e))
+                self._record_failure(backend, str(e))
+                continue
+            if response.status_code >= 500:
+                response.close()
+                last_error = httpx.HTTPStatusError(
+                    f'{backend.name} returned {response.status_code}', request=request, response=response
+                )
+                self._release(backend, started, error=f'HTTP {response.status_code}')
+                self._record_failure(backend, f'HTTP {response.status_code}')
+                continue
+            routed = _RoutedStream(response, backend)
+            error = None
+            try:
+                yield routed
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                response.close()
+                self._release(backend, started, tokens=routed.chunks if error is None else None, error=error)
+            return
+        raise last_error
+
+    @asynccontextmanager
+    async def astream(self, payload, timeout=60):
+        """
+        Async variant of stream on the pooled async client: chunks are relayed by the event loop,
+        no thread is held for the duration of the generation.
+
+        Yields:
+            _RoutedStream: httpx streaming response wrapper (aiter_lines, status_code, raise_for_status)
+        """
+        last_error = None
+        client = http_clients.get_async_client('lmstudio')
+        for backend in self._backends_for(payload):
+            started = time.perf_counter()
+            self._acquire(backend)
+            try:
+                request = client.build_request(
+                    'POST', backend.completions_url, headers=backend.headers, json=payload, timeout=timeout
+                )
+                response = await client.send(request, stream=True)
+            except httpx.TransportError as e:
+                last_error = e
+                self._release(backend, started, error=str(e))
+                self._record_failure(backend, str(e))
+                continue
+            except BaseException:
+                # Cancelled by the caller: not the backend's fault
+                self._release(backend, started)
+                raise
+            if response.status_code >= 500:
+                await response.aclose()
+                last_error = httpx.HTTPStatusError(
+                    f'{backend.name} returned {response.status_code}', request=request, response=response
+                )
+                self._release(backend, started, error=f'HTTP {response.status_code}')
+                self._record_failure(backend, f'HTTP {response.status_code}')
+                continue
+            routed = _RoutedStream(response, backend)
+            error = None
+            try:
+                yield routed
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                await response.aclose()
+                self._release(backend, started, tokens=routed.chunks if error is None else None, error=error)
+            return
+        raise last_error
+
+    # Health checks
+
+    def check_backend(self, backend):
+        """Probe /v1/models and refresh the health and model list of a backend"""
+        try:
+            response = http_clients.get_client('lmstudio').get(
+                backend.url + MODELS_PATH, headers=backend.headers, timeout=self.health_timeout
+            )
+            response.raise_for_status()
+            listed = [m.get('id') for m in response.json().get('data', [])]
+            with self._lock:
+                was_healthy = backend.healthy
+                backend.healthy = True
+                backend.consecutive_failures = 0
+                backend.listed_models = listed
+                backend.last_check = time.time()
+            if not was_healthy:
+                logger.log_with_timestamp('LLM_ROUTER', f'Backend {backend.name} is healthy again')
+        except Exception as e:
+            with self._lock:
+                was_healthy = backend.healthy
+                backend.healthy = False
+                backend.last_error = str(e)
+                backend.last_check = time.time()
+            if was_healthy:
+                logger.log_with_timestamp('LLM_ROUTER_ERROR', f'Health check failed for {backend.name}', str(e))
+
+    def check_all(self):
+        with self._lock:
+            backends = list(self._backends.values())
+        for backend in backends:
+            self.check_backend(backend)
+
+    def _health_loop(self):
+        while not self._stop.is_set():
+            self.check_all()
+            self._stop.wait(self.health_interval)
+
+    def start_health_checks(self):
+        if self.health_interval <= 0 or (self._health_thread and self._health_thread.is_alive()):
+            return
+        self._stop.clear()
+        self._health_thread = threading.Thread(target=self._health_loop, name='llm-health', daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self):
+        self._stop.set()
+
+    def get_stats(self):
+        """State and load of every backend"""
+        with self._lock:
+            return {
+                'health_interval': self.health_interval,
+                'backends': [backend.to_dict() for backend in self._backends.values()]
+            }
+
+# Global instance
+llm_router = LLMRouter()
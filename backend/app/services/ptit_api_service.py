@@ -22,7 +22,8 @@ class PTITAPIService:
         
         # Cache miss - call API
         try:
-            current_sem, _ = ptit_auth_service.get_current_semester()
+            # Blocking HTTP call, keep it off the event loop so other chat stages keep running
+            current_sem, _ = await asyncio.to_thread(ptit_auth_service.get_current_semester)
             
             # Cache the result
             if current_sem:
@@ -38,10 +39,13 @@ class PTITAPIService:
             print(f"❌ Current semester API error: {e}")
             return None, False
     
-    async def get_schedule_with_cache(self, chat_session_id: str, time_info: Dict, semester: str, schedule_service) -> Tuple[Optional[Dict], bool]:
-        """Get schedule data with caching"""
+    async def get_schedule_with_cache(self, chat_session_id: str, time_info: Dict, semester: str, schedule_service,
+                                      auth_service=None) -> Tuple[Optional[Dict], bool]:
+        """Get schedule data with caching, auth_service is the session of the student asking"""
         cache_params = {
             "time_type": time_info.get('type'),
+            # The parsed value ("today", ["Monday", "next_week"]...) decides which days are returned
+            "value": time_info.get('value'),
             "date": time_info.get('date'),
             "week": time_info.get('week'),
             "semester": semester
@@ -59,7 +63,7 @@ class PTITAPIService:
         
         # Cache miss - call API
         try:
-            schedule_data = await schedule_service.process_schedule_query(time_info, semester)
+            schedule_data = await schedule_service.process_schedule_query(time_info, semester, auth_service)
             
             # Cache the result
             if schedule_data:
@@ -76,8 +80,10 @@ class PTITAPIService:
             print(f"❌ Schedule API error: {e}")
             return None, False
 
-    async def get_exams_with_cache(self, chat_session_id: str, query: str, semester: str, exam_schedule_service) -> Tuple[Optional[Dict], bool]:
-        """Get exam data with caching"""
+    async def get_exams_with_cache(self, chat_session_id: str, query: str, semester: str, exam_schedule_service,
+                                   time_info: Optional[Dict] = None, subjects: Optional[list] = None,
+                                   auth_service=None) -> Tuple[Optional[Dict], bool]:
+        """Get exam data with caching, time_info/subjects are passed on when already extracted"""
         cache_params = {
             "query": query.lower().strip(),
             "semester": semester
@@ -95,7 +101,9 @@ class PTITAPIService:
         
         # Cache miss - call API
         try:
-            exams_list, exam_txt, raw_data = await exam_schedule_service.get_exams_for_query(query, semester)
+            exams_list, exam_txt, raw_data = await exam_schedule_service.get_exams_for_query(
+                query, semester, time_info=time_info, subjects=subjects, auth_service=auth_service
+            )
             
             exam_data = {
                 "exams_list": exams_list,
@@ -121,8 +129,9 @@ class PTITAPIService:
             print(f"❌ Exams API error: {e}")
             return None, False
 
-    async def get_all_exams_with_cache(self, chat_session_id: str, semester: str, exam_schedule_service) -> Tuple[Optional[Dict], bool]:
-        """Get all exam schedule with caching"""
+    async def get_all_exams_with_cache(self, chat_session_id: str, semester: str, exam_schedule_service,
+                                       auth_service=None) -> Tuple[Optional[Dict], bool]:
+        """Get all exam schedule with caching, auth_service is the session of the student asking"""
         cache_params = {
             "query": "all_exams",
             "semester": semester
@@ -141,7 +150,7 @@ class PTITAPIService:
         # Cache miss - call API
         try:
             # Get full exam schedule for semester
-            exam_data = await exam_schedule_service.get_exam_schedule_by_semester(semester, False)
+            exam_data = await exam_schedule_service.get_exam_schedule_by_semester(semester, False, auth_service)
             all_exams = exam_data.get('data', {}).get('ds_lich_thi', [])
             
             # Format exam list
@@ -1,19 +1,25 @@
 from datetime import datetime, timedelta
-import requests
 from ..utils.logger import Logger
+from ..lib.http_client import http_clients
 
 logger = Logger()
 
 class PTITAuthService:
+    """
+    One PTIT login session: the token of the last successful login() is kept on the instance,
+    so concurrent users each need their own instance (chat creates one per request).
+    """
+
     def __init__(self):
         self.base_url = "https://uis.ptithcm.edu.vn/api"
         self.access_token = None
         self.token_expiry = None
+        self.username = None
 
     def login(self, username, password):
         """Authenticate with PTIT API and get access token"""
         try:
-            response = requests.post(
+            response = http_clients.get_client('ptit').post(
                 f"{self.base_url}/auth/login",
                 headers={'Content-Type': 'application/x-www-form-urlencoded'},
                 data={
@@ -23,9 +29,10 @@ class PTITAuthService:
                 }
             )
 
-            if response.ok:
+            if response.is_success:
                 data = response.json()
                 self.access_token = data.get('access_token')
+                self.username = username
                 # Set token expiry (typically 24 hours from now)
                 self.token_expiry = datetime.now() + timedelta(hours=2)
                 return True, None
@@ -64,7 +71,7 @@ class PTITAuthService:
                 'User-Agent': 'StudyAssistant/1.0'
             }
             
-            response = requests.post(url, data=payload, headers=headers)
+            response = http_clients.get_client('ptit').post(url, data=payload, headers=headers)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -98,9 +105,9 @@ class PTITAuthService:
                 }
             }
 
-            response = requests.post(url, headers=headers, json=data)
+            response = http_clients.get_client('ptit').post(url, headers=headers, json=data)
 
-            if response.ok:
+            if response.is_success:
                 semester_data = response.json()
                 if semester_data.get('result') and semester_data.get('data'):
                     semesters = semester_data['data'].get('ds_hoc_ky', [])
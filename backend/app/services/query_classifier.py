@@ -1,30 +1,322 @@
-from ..services.lmstudio_service import classify_query_lmstudio
+import os
+import re
+import time
+import asyncio
+import threading
+import numpy as np
+from unidecode import unidecode
+from ..services.lmstudio_service import (
+    classify_query_lmstudio, aclassify_query_lmstudio, analyze_query_lmstudio, aanalyze_query_lmstudio
+)
+from ..services.embedding_registry import embedding_registry, DEFAULT_EMBEDDING_MODEL
+from ..services.embedding_cache import query_embedding_cache
+from ..config.classifier_examples import LABELLED_EXAMPLES, BENCHMARK_EXAMPLES
+from ..utils.logger import Logger
+
+logger = Logger()
+
+TIME_WORDS = (
+    r'hom nay|hnay|ngay mai|nmai|mai|hom qua|tuan nay|tuan sau|t nay|t sau'
+    r'|(sang|chieu|toi) (nay|mai)|thu ?[2-7]|t[2-7]|chu nhat|cn|\d{1,2}/\d{1,2}'
+)
+
+# Keyword/regex tier, matched against the normalized (no diacritics, lowercase) query.
+# Checked in order, the first category with a matching rule wins.
+RULES = [
+    ('other', re.compile(r'\b(nam sau|nam toi)\b.*\blop\b')),
+    ('uml', re.compile(
+        r'\b(uml|plantuml|use ?case|(class|sequence|activity|state) diagram'
+        r'|so do (lop|tuan tu|hoat dong|trang thai|thanh phan|trien khai|use ?case))\b'
+    )),
+    ('examschedule', re.compile(
+        r'\b(lich thi|lt|phong thi|ca thi|exams?|thi (mon|cuoi ky|giua ky|hk|hoc ky|lai)'
+        r'|(ngay|khi nao|bao gio|may gio|luc nao|nao|mon \w+) thi)\b'
+    )),
+    ('schedule', re.compile(
+        # A schedule noun, or a time expression right before "học ... gì/không"
+        r'\b(tkb|thoi khoa bieu|lich hoc)\b'
+        r'|\b(co|may|bao nhieu|nhung|cac) tiet\b|\btiet (nao|may|gi|j|\d{1,2})\b|\bphong (hoc|nao)\b'
+        rf'|\b({TIME_WORDS})( ({TIME_WORDS}))* (co )?(hoc|hc) (gi|j|mon (gi|j|nao)|nhung mon|cac mon|khong|ko|k)\b'
+        rf'|\b(co )?(hoc|hc) ({TIME_WORDS}) (khong|ko|k)\b'
+    )),
+    ('date_query', re.compile(r'\b(ngay|thu) (may|bao nhieu)\b|\bla ngay (nao|gi)\b')),
+    ('general', re.compile(r'^(xin chao|chao|hello|hi|hey|cam on|thanks|thank you)( ban| em| anh| chi)?$')),
+]
+
+# Weaker cues ("mai ... học", "học môn gì"): also common in study questions, so they only
+# break ties when the kNN and LLM tiers give no answer
+HINT_RULES = [
+    ('schedule', re.compile(
+        rf'\b({TIME_WORDS})\b.*\b(hoc|hc|lop)\b'
+        r'|\bhc (gi|j)\b|\b(hoc|hc) (mon gi|mon j|mon nao|nhung mon|cac mon)\b'
+    )),
+]
+HINT_CONFIDENCE = 0.5
+
 
 class QueryClassifier:
+    """
+    Tiered query classifier.
+
+    1. rules: Vietnamese-aware keyword and regex layer (tkb, hc, lt, lịch thi...). Weak cues
+       (HINT_RULES) are not final: they are used only when the LLM tier fails
+    2. knn: similarity vote over LABELLED_EXAMPLES with the shared MiniLM model
+    3. lmstudio: the LLM classifier, only when the local tiers are not confident
+
+    With CLASSIFIER_FUSED_LLM the LLM tier is one structured call that also returns the time
+    expression ('time_info') and exam subjects ('subjects'), so schedule and exam questions
+    need no separate time parser round-trip.
+
+    Every result reports the tier in 'method' and the time it took in 'latency_ms'.
+    """
+
     def __init__(self):
-        pass
+        self.fast_path_enabled = os.getenv('CLASSIFIER_FAST_PATH', 'true').lower() == 'true'
+        self.fused_llm_enabled = os.getenv('CLASSIFIER_FUSED_LLM', 'false').lower() == 'true'
+        self.knn_k = int(os.getenv('CLASSIFIER_KNN_K', 5))
+        # Share of the k neighbours' similarity that must agree on one category
+        self.knn_threshold = float(os.getenv('CLASSIFIER_KNN_THRESHOLD', 0.7))
+        # The nearest example must be at least this similar
+        self.knn_min_similarity = float(os.getenv('CLASSIFIER_KNN_MIN_SIMILARITY', 0.6))
+        self.model_name = DEFAULT_EMBEDDING_MODEL
+        self._example_matrix = None
+        self._example_labels = None
+        self._knn_available = True
+        self._examples_lock = threading.Lock()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text):
+        """Same normalization as ScheduleService.normalize_vietnamese, plus punctuation to spaces"""
+        text = unidecode(text or '').lower()
+        text = re.sub(r'[^a-z0-9/]+', ' ', text)
+        return text.strip()
 
     def classify_query(self, text):
         """
-        Classify the input query using LM Studio Classifier API only.
-        Returns: dict with 'category', 'method', ...
+        Classify the input query: local tiers first, LM Studio Classifier API as fallback.
+        Returns: dict with 'category', 'method', 'latency_ms', ...
         """
+        started = time.perf_counter()
         if not text or text.strip() == '':
-            return {
-                'category': 'general',
-                'method': 'empty-input'
-            }
+            return self._finish(self._empty_result(), started)
+        hint = None
+        if self.fast_path_enabled:
+            result = self._classify_rules(text)
+            if result and result['confidence'] < 1.0:
+                hint, result = result, None
+            result = result or self._classify_knn(text)
+            if result:
+                return self._finish(result, started)
         # Gọi LM Studio Classifier API
-        result = classify_query_lmstudio(text)
-        # result là dict kiểu {"type": ...}
+        if self.fused_llm_enabled:
+            result = self._to_classification(analyze_query_lmstudio(text))
+        else:
+            result = self._to_classification(classify_query_lmstudio(text))
+        return self._finish(self._or_hint(result, hint), started)
+
+    async def aclassify_query(self, text):
+        """
+        Async variant of classify_query, does not block the event loop.
+        Returns: dict with 'category', 'method', 'latency_ms', ...
+        """
+        started = time.perf_counter()
+        if not text or text.strip() == '':
+            return self._finish(self._empty_result(), started)
+        hint = None
+        if self.fast_path_enabled:
+            result = self._classify_rules(text)
+            if result and result['confidence'] < 1.0:
+                hint, result = result, None
+            # Embedding is CPU bound, keep it off the event loop
+            result = result or await asyncio.to_thread(self._classify_knn, text)
+            if result:
+                return self._finish(result, started)
+        if self.fused_llm_enabled:
+            result = self._to_classification(await aanalyze_query_lmstudio(text))
+        else:
+            result = self._to_classification(await aclassify_query_lmstudio(text))
+        return self._finish(self._or_hint(result, hint), started)
+
+    def rules_category(self, text):
+        """
+        Category of the keyword/regex tier alone, None when no rule matches or only a hint
+        rule does (no model, no I/O)
+        """
+        result = self._classify_rules(text)
+        return result['category'] if result and result['confidence'] >= 1.0 else None
+
+    def _classify_rules(self, text):
+        normalized = self.normalize(text)
+        for category, pattern in RULES:
+            if pattern.search(normalized):
+                return {'category': category, 'method': 'rules', 'confidence': 1.0}
+        for category, pattern in HINT_RULES:
+            if pattern.search(normalized):
+                return {'category': category, 'method': 'rules-hint', 'confidence': HINT_CONFIDENCE}
+        return None
+
+    @staticmethod
+    def _or_hint(result, hint):
+        # LM Studio unreachable: a rule hint beats the 'general' default
+        if hint and result['method'] == 'lmstudio-error':
+            return dict(hint, error=result.get('error'))
+        return result
+
+    def _load_examples(self):
+        if self._example_matrix is not None:
+            return self._example_matrix, self._example_labels
+        with self._examples_lock:
+            if self._example_matrix is None:
+                model = embedding_registry.get_model(self.model_name)
+                texts = [text for text, _ in LABELLED_EXAMPLES]
+                matrix = np.asarray(model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+                self._example_labels = [label for _, label in LABELLED_EXAMPLES]
+                self._example_matrix = matrix
+            return self._example_matrix, self._example_labels
+
+    def _embed(self, text):
+        cached = query_embedding_cache.get(text, self.model_name)
+        if cached is not None:
+            return np.asarray(cached, dtype=np.float32)
+        embedding = embedding_registry.get_model(self.model_name).encode(text)
+        # Shared with FileService.embed_query, so retrieval and the response cache reuse it
+        query_embedding_cache.set(text, self.model_name, embedding.tolist())
+        return np.asarray(embedding, dtype=np.float32)
+
+    def _classify_knn(self, text):
+        if not self._knn_available:
+            return None
+        try:
+            matrix, labels = self._load_examples()
+        except Exception as e:
+            # Model missing or failed to load: skip the tier instead of failing every request
+            self._knn_available = False
+            logger.log_with_timestamp('CLASSIFIER_ERROR', f'kNN tier disabled, examples could not be embedded: {str(e)}')
+            return None
+        try:
+            query = self._embed(text)
+            norm = np.linalg.norm(query)
+            if not norm:
+                return None
+            scores = matrix @ (query / norm)
+            top = np.argsort(-scores)[:self.knn_k]
+            if scores[top[0]] < self.knn_min_similarity:
+                return None
+            votes = {}
+            for i in top:
+                votes[labels[i]] = votes.get(labels[i], 0.0) + max(float(scores[i]), 0.0)
+            category, weight = max(votes.items(), key=lambda item: item[1])
+            confidence = weight / (sum(votes.values()) or 1.0)
+            if confidence < self.knn_threshold:
+                return None
+            return {'category': category, 'method': 'knn', 'confidence': round(confidence, 3)}
+        except Exception as e:
+            logger.log_with_timestamp('CLASSIFIER_ERROR', f'kNN tier failed: {str(e)}')
+            return None
+
+    def _empty_result(self):
+        return {
+            'category': 'general',
+            'method': 'empty-input'
+        }
+
+    def _to_classification(self, result):
+        # result là dict kiểu {"type": ...}, fused calls also carry "time" and "subjects"
         if 'type' in result:
-            return {
+            classification = {
                 'category': result['type'],
                 'method': 'lmstudio'
             }
+            if 'time' in result:
+                classification['method'] = 'lmstudio-fused'
+                # None means the question has no time expression, callers must not re-parse it
+                classification['time_info'] = result['time'] or {}
+                classification['subjects'] = result.get('subjects') or []
+            return classification
         else:
             return {
                 'category': 'general',
                 'method': 'lmstudio-error',
                 'error': result.get('error', 'Unknown error')
-            }
\ No newline at end of file
+            }
+
+    def _finish(self, result, started):
+        latency_ms = round((time.perf_counter() - started) * 1000, 2)
+        result['latency_ms'] = latency_ms
+        with self._stats_lock:
+            tier = self._stats.setdefault(result['method'], {'count': 0, 'total_ms': 0.0})
+            tier['count'] += 1
+            tier['total_ms'] += latency_ms
+        return result
+
+    def get_stats(self):
+        """Requests answered and average latency per tier"""
+        with self._stats_lock:
+            total = sum(tier['count'] for tier in self._stats.values())
+            return {
+                'fast_path_enabled': self.fast_path_enabled,
+                'fused_llm_enabled': self.fused_llm_enabled,
+                'knn_threshold': self.knn_threshold,
+                'tiers': {
+                    method: {
+                        'count': tier['count'],
+                        'share': round(tier['count'] / total, 3) if total else 0.0,
+                        'avg_ms': round(tier['total_ms'] / tier['count'], 2)
+                    }
+                    for method, tier in self._stats.items()
+                }
+            }
+
+    def evaluate(self, examples=None, use_llm=True):
+        """
+        Benchmark the tiers on a labelled set.
+
+        Args:
+            examples (list, optional): (text, category) pairs. Defaults to BENCHMARK_EXAMPLES.
+            use_llm (bool): Send questions the local tiers cannot answer to LM Studio
+
+        Returns:
+            dict: Overall accuracy and latency, plus coverage/accuracy/latency per tier
+        """
+        examples = examples or BENCHMARK_EXAMPLES
+        tiers = {}
+        correct = 0
+        total_ms = 0.0
+        for text, expected in examples:
+            started = time.perf_counter()
+            result = self._classify_rules(text)
+            hint = None
+            if result and result['confidence'] < 1.0:
+                hint, result = result, None
+            result = result or self._classify_knn(text)
+            if result is None and use_llm:
+                llm = analyze_query_lmstudio if self.fused_llm_enabled else classify_query_lmstudio
+                result = self._or_hint(self._to_classification(llm(text)), hint)
+            result = result or hint
+            elapsed = (time.perf_counter() - started) * 1000
+            method = result['method'] if result else 'unanswered'
+            hit = bool(result) and result['category'] == expected
+            tier = tiers.setdefault(method, {'count': 0, 'correct': 0, 'total_ms': 0.0})
+            tier['count'] += 1
+            tier['correct'] += hit
+            tier['total_ms'] += elapsed
+            correct += hit
+            total_ms += elapsed
+        return {
+            'examples': len(examples),
+            'accuracy': round(correct / len(examples), 3),
+            'avg_ms': round(total_ms / len(examples), 2),
+            'tiers': {
+                method: {
+                    'coverage': round(tier['count'] / len(examples), 3),
+                    'accuracy': round(tier['correct'] / tier['count'], 3),
+                    'avg_ms': round(tier['total_ms'] / tier['count'], 2)
+                }
+                for method, tier in tiers.items()
+            }
+        }
+
+# Global instance
+query_classifier = QueryClassifier()
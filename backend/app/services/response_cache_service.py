@@ -0,0 +1,207 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from ..utils.logger import Logger
+
+logger = Logger()
+
+# Default TTL (seconds) per query category, overridable with RESPONSE_CACHE_TTL_<CATEGORY>
+DEFAULT_CATEGORY_TTLS = {
+    'schedule': 1800,
+    'examschedule': 3600,
+    'date_query': 600,
+    'uml': 86400,
+    'general': 86400,
+    'other': 3600
+}
+
+def normalize_question(text):
+    """Lowercase, collapse whitespace and drop trailing punctuation (Vietnamese tone marks are kept)"""
+    return re.sub(r'[\s?.!]+$', '', re.sub(r'\s+', ' ', (text or '').strip().lower()))
+
+
+class SemanticResponseCache:
+    """
+    Cache of final chat answers looked up by prompt similarity.
+
+    Entries are bucketed by a context fingerprint (model, category, user, space, file ids and
+    a hash of the schedule/exam data given to the model), so a cached answer is only reused
+    for the same user and identical underlying data. Inside a bucket the question must be
+    the same after normalization, or its embedding must reach the similarity threshold.
+
+    Categories in RESPONSE_CACHE_SHARED_CATEGORIES (course knowledge such as 'uml') are
+    shared between users, and only for the exact same normalized question: short
+    Vietnamese questions often embed close together while asking different things.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+        self.threshold = float(os.getenv('RESPONSE_CACHE_THRESHOLD', 0.97))
+        self.shared_categories = {
+            category.strip() for category in os.getenv('RESPONSE_CACHE_SHARED_CATEGORIES', 'uml').split(',')
+            if category.strip()
+        }
+        self.max_entries = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 2000))
+        self.category_ttls = {
+            category: int(os.getenv(f'RESPONSE_CACHE_TTL_{category.upper()}', ttl))
+            for category, ttl in DEFAULT_CATEGORY_TTLS.items()
+        }
+        # fingerprint -> list of entries, ordered by last use for LRU eviction
+        self._buckets = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def build_fingerprint(self, model, category, space_id=None, file_ids=None, context_parts=None, extra=None,
+                          user_key=None):
+        """
+        Hash everything besides the question that determines the answer.
+
+        Args:
+            model (str): LLM model name
+            category (str): Query category
+            space_id (str, optional): Space of the chat
+            file_ids (list, optional): Files searched for context
+            context_parts (list, optional): Data given to the model (schedule text, exam text...)
+            extra (str, optional): Any other flag that changes the answer
+            user_key (str, optional): User asking, left out only for shared categories without
+                                      a space or files
+        """
+        shared = category in self.shared_categories and not space_id and not file_ids
+        payload = {
+            'model': model,
+            'category': category,
+            'user': None if shared else user_key,
+            'space_id': space_id,
+            'file_ids': sorted(set(file_ids or [])),
+            'context': hashlib.sha1('\x1e'.join(context_parts or []).encode('utf-8')).hexdigest(),
+            # Relative dates ("hôm nay", "tuần sau") depend on the current day
+            'date': time.strftime('%Y-%m-%d'),
+            'extra': extra or ''
+        }
+        return hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get_ttl(self, category):
+        return self.category_ttls.get(category, self.category_ttls['general'])
+
+    def lookup(self, fingerprint, embedding, question=None):
+        """
+        Args:
+            fingerprint (str): build_fingerprint() of the request
+            embedding (list): Question embedding
+            question (str, optional): Question text, an exact match after normalization always hits
+
+        Returns:
+            dict: Cached entry ({'answer', 'sources', 'similarity', ...}) or None
+        """
+        if not self.enabled:
+            return None
+        query = self._normalize(embedding)
+        question_key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            entries = self._buckets.get(fingerprint)
+            best, best_score = None, self.threshold
+            if entries:
+                alive = [entry for entry in entries if entry['expires_at'] > now]
+                self._size -= len(entries) - len(alive)
+                entries[:] = alive
+                for entry in alive:
+                    score = float(entry['embedding'] @ query)
+                    if question_key and entry['question_key'] == question_key:
+                        best, best_score = entry, max(score, best_score)
+                        break
+                    if entry['category'] in self.shared_categories:
+                        # Shared between users: exact question only
+                        continue
+                    if score >= best_score:
+                        best, best_score = entry, score
+                if alive:
+                    self._buckets.move_to_end(fingerprint)
+                else:
+                    del self._buckets[fingerprint]
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(best, similarity=best_score)
+
+    def store(self, fingerprint, embedding, answer, category, sources=None, file_ids=None, space_id=None,
+              question=None):
+        if not self.enabled or not answer:
+            return
+        entry = {
+            'embedding': self._normalize(embedding),
+            'question_key': normalize_question(question),
+            'answer': answer,
+            'sources': sources,
+            'category': category,
+            'file_ids': set(file_ids or []),
+            'space_id': space_id,
+            'expires_at': time.time() + self.get_ttl(category)
+        }
+        with self._lock:
+            self._buckets.setdefault(fingerprint, []).append(entry)
+            self._buckets.move_to_end(fingerprint)
+            self._size += 1
+            while self._size > self.max_entries and self._buckets:
+                _, evicted = self._buckets.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _invalidate(self, predicate):
+        removed = 0
+        with self._lock:
+            for fingerprint in list(self._buckets):
+                entries = self._buckets[fingerprint]
+                kept = [entry for entry in entries if not predicate(entry)]
+                removed += len(entries) - len(kept)
+                if kept:
+                    self._buckets[fingerprint] = kept
+                else:
+                    del self._buckets[fingerprint]
+            self._size -= removed
+        return removed
+
+    def invalidate_file(self, file_id):
+        """Drop answers built from a file that was deleted or re-ingested"""
+        removed = self._invalidate(lambda entry: file_id in entry['file_ids'])
+        if removed:
+            logger.log_with_timestamp('RESPONSE_CACHE', f'Invalidated {removed} answers for file {file_id}')
+        return removed
+
+    def invalidate_space(self, space_id):
+        """Drop answers of a space whose files or prompt changed"""
+        removed = self._invalidate(lambda entry: entry['space_id'] == space_id)
+        if removed:
+            logger.log_with_timestamp('RESPONSE_CACHE', f'Invalidated {removed} answers for space {space_id}')
+        return removed
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': self._size,
+                'buckets': len(self._buckets),
+                'threshold': self.threshold,
+                'shared_categories': sorted(self.shared_categories),
+                'category_ttls': self.category_ttls,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+# Global instance
+response_cache = SemanticResponseCache()
@@ -1,9 +1,13 @@
+import os
+import time
+import threading
 from datetime import datetime, timedelta
 import calendar
 import re
-import httpx
 from unidecode import unidecode
 from ..utils.logger import Logger
+from ..lib.http_client import http_clients
+from .timetable_model import TimetableModel
 
 logger = Logger()
 
@@ -13,6 +17,10 @@ class ScheduleService:
         self.base_url = "https://uis.ptithcm.edu.vn/api/sch"
         self.auth_service = auth_service
         self.ai_service = ai_service
+        # (student, hoc_ky) -> (expires_at, TimetableModel)
+        self._timetables = {}
+        self._timetables_lock = threading.Lock()
+        self.timetable_ttl = int(os.getenv('TIMETABLE_CACHE_TTL', 900))  # 15 minutes
 
     def set_auth_service(self, auth_service):
         """Set the authentication service for token management
@@ -30,13 +38,17 @@ class ScheduleService:
         """
         self.ai_service = ai_service
         
-    def check_auth(self):
+    def check_auth(self, auth_service=None):
         """Check if the service is properly authenticated
 
+        Args:
+            auth_service (PTITAuthService, optional): Session of the request, defaults to the service's own
+
         Returns:
             bool: True if authenticated, False otherwise
         """
-        return self.auth_service is not None and self.auth_service.access_token is not None
+        auth_service = auth_service or self.auth_service
+        return auth_service is not None and auth_service.access_token is not None
     
     def normalize_vietnamese(self, text):
         """
@@ -60,20 +72,22 @@ class ScheduleService:
         }
         return weekday_names.get(weekday_index, '')
 
-    async def get_schedule_by_semester(self, hoc_ky):
+    async def get_schedule_by_semester(self, hoc_ky, auth_service=None):
         """Get schedule data for a specific semester
 
         Args:
             hoc_ky (str): Semester ID
+            auth_service (PTITAuthService, optional): Session of the student, defaults to the service's own
 
         Returns:
             dict: Schedule data including weekly schedules and class periods
         """
         logger.log_with_timestamp("SCHEDULE API", f"Getting schedule for semester: {hoc_ky}")
+        auth_service = auth_service or self.auth_service
         
-        if not self.check_auth():
+        if not self.check_auth(auth_service):
             logger.log_with_timestamp("SCHEDULE API", "No auth token found, getting current semester...")
-            current_semester, error = self.auth_service.get_current_semester()
+            current_semester, error = auth_service.get_current_semester()
             if error:
                 logger.log_with_timestamp("SCHEDULE ERROR", f"Authentication error: {error}")
                 raise ValueError(f"Authentication error: {error}")
@@ -82,7 +96,7 @@ class ScheduleService:
 
         url = f"{self.base_url}/w-locdstkbtuanusertheohocky"
         headers = {
-            "Authorization": f"Bearer {self.auth_service.access_token}",
+            "Authorization": f"Bearer {auth_service.access_token}",
             "Content-Type": "application/json"
         }
         payload = {
@@ -103,182 +117,82 @@ class ScheduleService:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                logger.log_with_timestamp("SCHEDULE API", f"Sending request to {url} with semester {hoc_ky}")
-                response = await client.post(url, json=payload, headers=headers)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Log detailed response information
-                logger.log_with_timestamp("SCHEDULE API", f"Received response: Status {response.status_code}")
-                logger.log_with_timestamp("SCHEDULE API", "Response data details:")
-                
-                if data.get('data'):
-                    # Log semester information
-                    semester_info = data['data'].get('hoc_ky', {})
-                    logger.log_with_timestamp("SCHEDULE API", f"Semester: {semester_info.get('ten_hoc_ky', 'N/A')}")
-                    
-                    # Log weeks information
-                    weeks = data['data'].get('ds_tuan_tkb', [])
-                    logger.log_with_timestamp("SCHEDULE API", f"Total weeks: {len(weeks)}")
+            client = http_clients.get_async_client('ptit')
+            logger.log_with_timestamp("SCHEDULE API", f"Sending request to {url} with semester {hoc_ky}")
+            response = await client.post(url, json=payload, headers=headers)
+            response.raise_for_status()
+            data = response.json()
+            
+            # Log detailed response information
+            logger.log_with_timestamp("SCHEDULE API", f"Received response: Status {response.status_code}")
+            logger.log_with_timestamp("SCHEDULE API", "Response data details:")
+            
+            if data.get('data'):
+                # Log semester information
+                semester_info = data['data'].get('hoc_ky', {})
+                logger.log_with_timestamp("SCHEDULE API", f"Semester: {semester_info.get('ten_hoc_ky', 'N/A')}")
                 
-                return data
+                # Log weeks information
+                weeks = data['data'].get('ds_tuan_tkb', [])
+                logger.log_with_timestamp("SCHEDULE API", f"Total weeks: {len(weeks)}")
+            
+            return data
         except Exception as e:
             logger.log_with_timestamp("SCHEDULE ERROR", f"Error getting schedule: {str(e)}")
             raise
 
-    def find_current_week_schedule(self, schedule_data, query_time=None):
-        """Find the schedule for the week containing the query time
+    async def get_timetable(self, hoc_ky, auth_service=None):
+        """Get the parsed timetable of a semester, cached in-process for TIMETABLE_CACHE_TTL seconds
 
         Args:
-            schedule_data (dict): Full schedule data from API
-            query_time (datetime, optional): Time to find schedule for. Defaults to current time.
+            hoc_ky (str): Semester ID
+            auth_service (PTITAuthService, optional): Session of the student, defaults to the service's own
 
         Returns:
-            dict: Schedule information for the matching week, or None if not found
+            TimetableModel: Classes grouped by date (classes_on) and the sorted teaching weeks
         """
-        if query_time is None:
-            query_time = datetime.now()
-        # Đảm bảo query_time là date
-        if isinstance(query_time, datetime):
-            query_time = query_time.date()
-        for week in schedule_data.get("data", {}).get("ds_tuan_tkb", []):
-            start_date = datetime.strptime(week["ngay_bat_dau"], "%d/%m/%Y").date()
-            end_date = datetime.strptime(week["ngay_ket_thuc"], "%d/%m/%Y").date()
-            if start_date <= query_time <= end_date:
-                return week
-        return None
-
-    def get_class_schedule(self, week_data, query_date):
-        """Get class schedule for a specific date within a week
-
-        Args:
-            week_data (dict): Week schedule data
-            query_date (datetime): Date to get schedule for
+        auth_service = auth_service or self.auth_service
+        # Keyed by student: the token changes on every login, the username does not
+        student = (auth_service.username or auth_service.access_token) if auth_service else None
+        key = (student, hoc_ky)
+        now = time.time()
+        with self._timetables_lock:
+            cached = self._timetables.get(key)
+            if cached and cached[0] > now:
+                return cached[1]
 
-        Returns:
-            list: List of classes scheduled for the query date
-        """
-        if not week_data:
-            logger.log_with_timestamp("SCHEDULE API", f"No week data found for date: {query_date.strftime('%Y-%m-%d')}")
-            return []
+        timetable = TimetableModel.from_payload(await self.get_schedule_by_semester(hoc_ky, auth_service))
+        with self._timetables_lock:
+            self._timetables = {k: v for k, v in self._timetables.items() if v[0] > now}
+            self._timetables[key] = (now + self.timetable_ttl, timetable)
+        logger.log_with_timestamp("SCHEDULE API", f"Indexed {len(timetable)} classes in {len(timetable.weeks)} weeks for semester {hoc_ky}")
+        return timetable
 
-        classes = []
-        logger.log_with_timestamp("SCHEDULE API", f"Searching classes for date: {query_date.strftime('%Y-%m-%d')}")
-        logger.log_with_timestamp("SCHEDULE API", f"Week data structure: {week_data.keys()}")
-        
-        # Check if we have the correct week data structure or if we're working with the entire schedule data
-        # The correct structure should have 'ds_thoi_khoa_bieu', otherwise we need to find the right week first
-        if "ds_thoi_khoa_bieu" in week_data:
-            class_list = week_data.get("ds_thoi_khoa_bieu", [])
-        else:
-            # We might have received the entire schedule data instead of a specific week
-            # Try to find classes for this date from all weeks
-            query_date_obj = query_date.date() if hasattr(query_date, 'date') else query_date
-            all_weeks = week_data.get("data", {}).get("ds_tuan_tkb", [])
-            
-            # Find all classes across all weeks
-            all_classes = []
-            for week in all_weeks:
-                all_classes.extend(week.get("ds_thoi_khoa_bieu", []))
-            
-            # Filter to only classes for the requested date
-            class_list = []
-            for class_info in all_classes:
-                try:
-                    api_date = class_info.get("ngay_hoc", "")
-                    class_date_str = api_date.split("T")[0] if "T" in api_date else api_date
-                    class_date = datetime.strptime(class_date_str, "%Y-%m-%d").date()
-                    
-                    if class_date == query_date_obj:
-                        class_list.append(class_info)
-                except Exception:
-                    continue
-        
-        logger.log_with_timestamp("SCHEDULE API", f"Total classes in week: {len(class_list)}")
-        
-        for class_info in class_list:
-            logger.log_with_timestamp("SCHEDULE API", f"Processing class: {class_info.get('ten_mon')} ({class_info.get('ma_mon')})")
-            logger.log_with_timestamp("SCHEDULE API", f"Class data structure: {class_info.keys()}")
-            
-            api_date = class_info["ngay_hoc"]
-            logger.log_with_timestamp("SCHEDULE API", f"Raw API date: {api_date}")
-            
-            try:
-                # Ensure we're comparing dates properly by converting both to date objects
-                class_date_str = api_date.split("T")[0] if "T" in api_date else api_date
-                class_date = datetime.strptime(class_date_str, "%Y-%m-%d").date()
-                
-                # Make sure query_date is a date object
-                query_date_obj = query_date.date() if hasattr(query_date, 'date') else query_date
-                
-                logger.log_with_timestamp("SCHEDULE API", f"Parsed class date: {class_date}, Query date: {query_date_obj} | Match: {class_date == query_date_obj}")
-                
-                if class_date == query_date_obj:
-                    start_time = f"Tiết {class_info['tiet_bat_dau']}"
-                    end_time = f"Tiết {class_info['tiet_bat_dau'] + class_info['so_tiet'] - 1}"
-                    class_detail = {
-                        "subject": f"{class_info['ten_mon']} ({class_info['ma_mon']})",
-                        "time": f"{start_time} - {end_time}",
-                        "room": class_info['ma_phong'],
-                        "lecturer": class_info['ten_giang_vien'] or "Chưa cập nhật",
-                        "ngay_hoc": class_date.strftime('%d/%m/%Y'),
-                        "thu_kieu_so": class_info.get('thu_kieu_so', 0),
-                        "ten_mon_eg": class_info.get('ten_mon_eg', ''),
-                        "so_tin_chi": class_info.get('so_tin_chi', ''),
-                        "ma_giang_vien": class_info.get('ma_giang_vien', ''),
-                        "ten_mon": class_info.get('ten_mon', ''),
-                        "ma_mon": class_info.get('ma_mon', '')
-                    }
-                    classes.append(class_detail)
-                    logger.log_with_timestamp("SCHEDULE API", f"Found class: {class_detail['subject']} | Room: {class_detail['room']} | Time: {class_detail['time']} | Lecturer: {class_detail['lecturer']}")
-            except Exception as e:
-                logger.log_with_timestamp("SCHEDULE ERROR", f"Error processing class date: {str(e)}")
-                continue
-        
-        if not classes:
-            logger.log_with_timestamp("SCHEDULE API", f"No classes found for date: {query_date.strftime('%Y-%m-%d')}")
-        else:
-            logger.log_with_timestamp("SCHEDULE API", f"Total classes found for {query_date.strftime('%d/%m/%Y')}: {len(classes)}")
-            
-        return classes
+    def _daily_schedule(self, date, hoc_ky, classes):
+        return {
+            "date": date.strftime('%Y-%m-%d'),
+            "day_of_week": date.strftime('%A'),
+            "thu_kieu_so": date.weekday() + 2,  # Convert to Vietnamese day format (2=Monday, 8=Sunday)
+            "semester": f"Học kỳ {hoc_ky}",
+            "classes": classes
+        }
 
-    async def get_schedule(self, date, hoc_ky):
+    async def get_schedule(self, date, hoc_ky, timetable=None, auth_service=None):
         """Get schedule for a specific date from PTIT API
 
         Args:
             date (datetime.date): The date to get schedule for
             hoc_ky (str): Semester ID
+            timetable (TimetableModel, optional): Already loaded timetable
+            auth_service (PTITAuthService, optional): Session of the student, defaults to the service's own
 
         Returns:
             dict: Schedule data for the specified date
         """
         try:
-            # Get schedule data from API
-            schedule_data = await self.get_schedule_by_semester(hoc_ky)
-            
-            # Find the current week's schedule
-            week_data = self.find_current_week_schedule(schedule_data, date)
-            if not week_data:
-                return {
-                    "date": date.strftime('%Y-%m-%d'),
-                    "day_of_week": date.strftime('%A'),
-                    "thu_kieu_so": date.weekday() + 2,  # Convert to Vietnamese day format (2=Monday, 8=Sunday)
-                    "semester": f"Học kỳ {hoc_ky}",
-                    "classes": []
-                }
-            
-            # Get classes for the specific date
-            classes = self.get_class_schedule(week_data, date)
-            
-            return {
-                "date": date.strftime('%Y-%m-%d'),
-                "day_of_week": date.strftime('%A'),
-                "thu_kieu_so": date.weekday() + 2,  # Convert to Vietnamese day format (2=Monday, 8=Sunday)
-                "semester": f"Học kỳ {hoc_ky}",
-                "classes": classes
-            }
-            
+            if timetable is None:
+                timetable = await self.get_timetable(hoc_ky, auth_service)
+            return self._daily_schedule(date, hoc_ky, [c.to_detail() for c in timetable.classes_on(date)])
         except Exception as e:
             print(f"Error getting schedule from PTIT API: {e}")
             return None
@@ -350,9 +264,10 @@ class ScheduleService:
         
         return result
         
-    async def process_schedule_query(self, time_info, hoc_ky):
+    async def process_schedule_query(self, time_info, hoc_ky, auth_service=None):
         """
         Process schedule query based on pre-parsed time_info.
+        auth_service is the session of the student asking (defaults to the service's own).
         """
         import calendar
         today = datetime.now().date()
@@ -499,15 +414,20 @@ class ScheduleService:
         # Sau khi tính xong schedule_dates
         if not schedule_dates:
             schedule_dates = get_week_dates('current_week')
-        # Lấy lịch học cho các ngày đã xác định
+        # Lấy thời khóa biểu đã index một lần (có cache), sau đó tra từng ngày
         all_daily_schedules = []
         has_any_classes = False
-        for d in schedule_dates:
-            daily_schedule = await self.get_schedule(d, hoc_ky)
-            if daily_schedule:
+        try:
+            timetable = await self.get_timetable(hoc_ky, auth_service)
+        except Exception as e:
+            logger.log_with_timestamp("SCHEDULE ERROR", f"Error getting schedule from PTIT API: {str(e)}")
+            timetable = None
+        if timetable is not None:
+            for d in schedule_dates:
+                daily_schedule = self._daily_schedule(d, hoc_ky, [c.to_detail() for c in timetable.classes_on(d)])
                 all_daily_schedules.append(daily_schedule)
-            if daily_schedule.get("classes"):
-                has_any_classes = True
+                if daily_schedule["classes"]:
+                    has_any_classes = True
         # Format kết quả
         if len(schedule_dates) > 1:
             formatted_message = f"Đây là lịch học cho truy vấn của bạn ({type_}):\n\n"
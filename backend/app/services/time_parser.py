@@ -0,0 +1,124 @@
+import re
+import calendar
+from unidecode import unidecode
+from .lmstudio_service import parse_time_lmstudio, aparse_time_lmstudio
+from ..utils.logger import Logger
+
+logger = Logger()
+
+# Rule-based version of the mapping table in TIME_PARSER_SYSTEM_PROMPT.
+# Matched left to right on the normalized question; earlier alternatives win on the same position.
+_TOKEN_PATTERN = re.compile(
+    r'\b(?:'
+    r'(?P<next_week>tuan sau|tuan toi|t sau)'
+    r'|(?P<current_week>tuan nay|t nay)'
+    r'|(?P<today>hom nay|hnay|h nay|(?:sang|trua|chieu|toi) nay)'
+    r'|(?P<tomorrow>ngay mai|nmai|n mai|(?:sang|trua|chieu|toi) mai|mai)'
+    r'|(?P<yesterday>hom qua|hqa|hqua)'
+    r'|(?P<date>(?:ngay )?(?P<d1>\d{1,2}) ?(?:/|-|thang ) ?(?P<m1>\d{1,2})(?:/\d{2,4})?)'
+    r'|(?P<weekdays>(?:thu ?|t)[2-7](?: ?(?:,|va|&) ?(?:thu ?|t)?[2-7]\b)*)'
+    r'|(?P<weekday_word>thu (?:hai|ba|tu|nam|sau|bay))'
+    r'|(?P<sunday>chu nhat|cn)'
+    r'|(?P<day_of_month>ngay (?P<d2>\d{1,2}))'
+    r'|(?P<far_time>thang|nam|hoc ky|hk)'
+    r'|(?P<week>tuan)'
+    r')\b'
+)
+
+_WEEKDAY_WORDS = {'hai': 2, 'ba': 3, 'tu': 4, 'nam': 5, 'sau': 6, 'bay': 7}
+
+
+def _weekday_name(thu):
+    """Vietnamese 'thứ N' (2 = Monday ... 7 = Saturday) to the English day name"""
+    return calendar.day_name[thu - 2]
+
+
+def normalize_time_text(text):
+    """Lowercase, strip diacritics, keep digits, '/', '-' and ',' as separators"""
+    text = unidecode(text or '').lower()
+    text = re.sub(r'[^a-z0-9/,\-]+', ' ', text)
+    text = re.sub(r' ?, ?', ', ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def parse_time_rules(question):
+    """
+    Parse the time expression of a question with the rules only.
+
+    Args:
+        question (str): User question, with or without diacritics
+
+    Returns:
+        dict: {"type": "day"|"week"|"far_time", "value": ...} like parse_time_lmstudio,
+              or None when the question has no time expression the rules understand
+    """
+    days = []
+    week_ref = None
+    week_context = False
+    far_time = False
+    only_dates = True
+
+    def add_day(value, is_date=False):
+        nonlocal only_dates
+        if value not in days:
+            days.append(value)
+        only_dates = only_dates and is_date
+
+    for match in _TOKEN_PATTERN.finditer(normalize_time_text(question)):
+        kind = match.lastgroup
+        if kind in ('next_week', 'current_week'):
+            week_ref = kind
+        elif kind in ('today', 'tomorrow', 'yesterday'):
+            add_day(kind)
+        elif kind == 'date':
+            add_day(f"{int(match.group('d1')):02d}/{int(match.group('m1')):02d}", is_date=True)
+        elif kind == 'day_of_month':
+            add_day(match.group('d2'), is_date=True)
+        elif kind == 'weekdays':
+            for thu in re.findall(r'[2-7]', match.group(kind)):
+                add_day(_weekday_name(int(thu)))
+        elif kind == 'weekday_word':
+            add_day(_weekday_name(_WEEKDAY_WORDS[match.group(kind).split()[1]]))
+        elif kind == 'sunday':
+            add_day('Sunday')
+        elif kind == 'far_time':
+            far_time = True
+        elif kind == 'week':
+            week_context = True
+
+    if far_time:
+        return {'type': 'far_time', 'value': 'none'}
+    if days:
+        # "tuần ngày 25/5": the week containing that date
+        if week_context and not week_ref and only_dates and len(days) == 1:
+            return {'type': 'week', 'value': days[0]}
+        value = days + [week_ref] if week_ref else days
+        return {'type': 'day', 'value': value[0] if len(value) == 1 else value}
+    if week_ref:
+        return {'type': 'week', 'value': week_ref}
+    return None
+
+
+def parse_time(question):
+    """
+    Parse the time expression of a question: rules first, LM Studio only when they cannot.
+
+    Returns:
+        dict: {"type", "value"} (or {"error"} if the LLM fallback failed)
+    """
+    result = parse_time_rules(question)
+    if result is not None:
+        logger.log_with_timestamp('TIME_PARSER', 'Parsed by rules', str(result))
+        return result
+    logger.log_with_timestamp('TIME_PARSER', 'Rules could not parse the question, falling back to LM Studio')
+    return parse_time_lmstudio(question)
+
+
+async def aparse_time(question):
+    """Async variant of parse_time, the LLM fallback uses the pooled async client"""
+    result = parse_time_rules(question)
+    if result is not None:
+        logger.log_with_timestamp('TIME_PARSER', 'Parsed by rules', str(result))
+        return result
+    logger.log_with_timestamp('TIME_PARSER', 'Rules could not parse the question, falling back to LM Studio')
+    return await aparse_time_lmstudio(question)
@@ -0,0 +1,113 @@
+from datetime import datetime
+from typing import NamedTuple
+from ..utils.logger import Logger
+
+logger = Logger()
+
+
+class ClassEntry(NamedTuple):
+    """One class session of the timetable"""
+    date: object  # datetime.date
+    start_period: int
+    periods: int
+    subject_code: str
+    subject_name: str
+    subject_name_en: str
+    credits: str
+    room: str
+    lecturer: str
+    lecturer_code: str
+    weekday: int  # 2 = Monday ... 8 = Sunday, as returned by the API
+
+    @property
+    def end_period(self):
+        return self.start_period + self.periods - 1
+
+    def to_detail(self):
+        """Class dict used by the display and LLM formatting code"""
+        return {
+            "subject": f"{self.subject_name} ({self.subject_code})",
+            "time": f"Tiết {self.start_period} - Tiết {self.end_period}",
+            "room": self.room,
+            "lecturer": self.lecturer or "Chưa cập nhật",
+            "ngay_hoc": self.date.strftime('%d/%m/%Y'),
+            "thu_kieu_so": self.weekday,
+            "ten_mon_eg": self.subject_name_en,
+            "so_tin_chi": self.credits,
+            "ma_giang_vien": self.lecturer_code,
+            "ten_mon": self.subject_name,
+            "ma_mon": self.subject_code
+        }
+
+
+class TimetableWeek(NamedTuple):
+    """A teaching week of the semester"""
+    start: object  # datetime.date
+    end: object
+    number: int  # 1-based position in the semester
+
+
+def _parse_api_date(value, fmt):
+    return datetime.strptime(value.split("T")[0], fmt).date()
+
+
+class TimetableModel:
+    """
+    Semester timetable parsed once from the w-locdstkbtuanusertheohocky payload.
+
+    Holds classes per date and the week ranges sorted by start date, so the per-day lookups
+    of a schedule query never rescan or reparse the raw payload.
+    """
+
+    def __init__(self, classes, weeks):
+        self.by_date = {}
+        for entry in sorted(classes, key=lambda c: (c.date, c.start_period)):
+            self.by_date.setdefault(entry.date, []).append(entry)
+        self.weeks = [TimetableWeek(start, end, i + 1) for i, (start, end) in enumerate(sorted(weeks))]
+
+    @classmethod
+    def from_payload(cls, schedule_data):
+        """
+        Build the model from the raw API response.
+
+        Args:
+            schedule_data (dict): Full schedule data from API
+
+        Returns:
+            TimetableModel: The parsed timetable
+        """
+        classes = []
+        weeks = []
+        for week in (schedule_data or {}).get("data", {}).get("ds_tuan_tkb", []):
+            try:
+                weeks.append((
+                    _parse_api_date(week["ngay_bat_dau"], "%d/%m/%Y"),
+                    _parse_api_date(week["ngay_ket_thuc"], "%d/%m/%Y")
+                ))
+            except Exception as e:
+                logger.log_with_timestamp("SCHEDULE ERROR", f"Error processing week range: {str(e)}")
+            for class_info in week.get("ds_thoi_khoa_bieu", []):
+                try:
+                    classes.append(ClassEntry(
+                        date=_parse_api_date(class_info.get("ngay_hoc", ""), "%Y-%m-%d"),
+                        start_period=class_info['tiet_bat_dau'],
+                        periods=class_info['so_tiet'],
+                        subject_code=class_info.get('ma_mon', ''),
+                        subject_name=class_info.get('ten_mon', ''),
+                        subject_name_en=class_info.get('ten_mon_eg', ''),
+                        credits=class_info.get('so_tin_chi', ''),
+                        room=class_info.get('ma_phong', ''),
+                        lecturer=class_info.get('ten_giang_vien', ''),
+                        lecturer_code=class_info.get('ma_giang_vien', ''),
+                        weekday=class_info.get('thu_kieu_so', 0)
+                    ))
+                except Exception as e:
+                    logger.log_with_timestamp("SCHEDULE ERROR", f"Error processing class date: {str(e)}")
+        return cls(classes, weeks)
+
+    def classes_on(self, date):
+        """Classes of one date, ordered by start period"""
+        return self.by_date.get(date, [])
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.by_date.values())
@@ -0,0 +1,272 @@
+import os
+import json
+import shutil
+import threading
+import numpy as np
+from ..lib.supabase import supabase
+from ..utils.logger import Logger
+
+logger = Logger()
+
+# 'remote' uses the match_file_chunks RPC, 'local' searches in-process indexes
+VECTOR_SEARCH_BACKEND = os.getenv('VECTOR_SEARCH_BACKEND', 'remote').lower()
+VECTOR_INDEX_DIR = os.getenv(
+    'VECTOR_INDEX_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.vector_index')
+)
+# Files with fewer chunks are searched exhaustively, larger ones through an IVF index
+IVF_MIN_VECTORS = int(os.getenv('VECTOR_INDEX_IVF_MIN_VECTORS', 2048))
+IVF_NPROBE = int(os.getenv('VECTOR_INDEX_IVF_NPROBE', 8))
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def _parse_embedding(value):
+    # pgvector columns come back from PostgREST as '[0.1,0.2,...]' strings
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+class FileVectorIndex:
+    """
+    Cosine-similarity index over the chunks of one file.
+
+    Vectors are stored L2-normalized in a float32 matrix. Small files use an exact scan;
+    large ones also get an IVF layer (k-means centroids + inverted lists) so a query only
+    scans the nprobe closest clusters.
+    """
+
+    def __init__(self, file_id, embeddings, contents, centroids=None, assignments=None):
+        self.file_id = file_id
+        self.embeddings = embeddings
+        self.contents = contents
+        self.centroids = centroids
+        self.assignments = assignments
+        self._lists = self._build_lists(assignments, len(centroids)) if centroids is not None else None
+
+    @classmethod
+    def build(cls, file_id, embeddings, contents):
+        embeddings = _normalize(np.asarray(embeddings, dtype=np.float32))
+        centroids = assignments = None
+        if len(embeddings) >= IVF_MIN_VECTORS:
+            centroids, assignments = cls._train_ivf(embeddings)
+        return cls(file_id, embeddings, list(contents), centroids, assignments)
+
+    @staticmethod
+    def _train_ivf(embeddings, iterations=10):
+        """Spherical k-means with sqrt(n) clusters"""
+        n = len(embeddings)
+        nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        centroids = embeddings[rng.choice(n, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(embeddings @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = embeddings[assignments == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        assignments = np.argmax(embeddings @ centroids.T, axis=1).astype(np.int32)
+        return centroids, assignments
+
+    @staticmethod
+    def _build_lists(assignments, nlist):
+        order = np.argsort(assignments, kind='stable')
+        bounds = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        return [order[bounds[c]:bounds[c + 1]] for c in range(nlist)]
+
+    def search(self, query_embedding, top_k=10, match_threshold=0.5, nprobe=IVF_NPROBE):
+        """
+        Returns:
+            list: (similarity, content) tuples above match_threshold, best first
+        """
+        if len(self.contents) == 0:
+            return []
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+
+        if self._lists is not None:
+            probe = np.argsort(self.centroids @ query)[::-1][:nprobe]
+            candidates = np.concatenate([self._lists[c] for c in probe])
+            if len(candidates) == 0:
+                # The probed clusters are empty
+                return []
+            scores = self.embeddings[candidates] @ query
+        else:
+            candidates = None
+            scores = self.embeddings @ query
+
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        results = []
+        for pos in best:
+            score = float(scores[pos])
+            if score < match_threshold:
+                break
+            row = int(candidates[pos]) if candidates is not None else int(pos)
+            results.append((score, self.contents[row]))
+        return results
+
+    def save(self, directory):
+        """Persist the index atomically as .npy arrays plus a JSON list of chunk texts"""
+        tmp_dir = f"{directory}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        np.save(os.path.join(tmp_dir, 'embeddings.npy'), np.asarray(self.embeddings))
+        with open(os.path.join(tmp_dir, 'contents.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.contents, f, ensure_ascii=False)
+        if self.centroids is not None:
+            np.save(os.path.join(tmp_dir, 'centroids.npy'), self.centroids)
+            np.save(os.path.join(tmp_dir, 'assignments.npy'), self.assignments)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_dir, directory)
+
+    @classmethod
+    def load(cls, file_id, directory):
+        """Load a persisted index; the embedding matrix is memory-mapped, not read into RAM"""
+        embeddings = np.load(os.path.join(directory, 'embeddings.npy'), mmap_mode='r')
+        with open(os.path.join(directory, 'contents.json'), encoding='utf-8') as f:
+            contents = json.load(f)
+        centroids = assignments = None
+        if os.path.exists(os.path.join(directory, 'centroids.npy')):
+            centroids = np.load(os.path.join(directory, 'centroids.npy'))
+            assignments = np.load(os.path.join(directory, 'assignments.npy'))
+        return cls(file_id, embeddings, contents, centroids, assignments)
+
+
+class VectorIndexService:
+    """Per-file local vector indexes, loaded from disk or rebuilt from file_chunks on demand"""
+
+    def __init__(self, index_dir=VECTOR_INDEX_DIR):
+        self.index_dir = index_dir
+        self._indexes = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def is_enabled(self):
+        return VECTOR_SEARCH_BACKEND == 'local'
+
+    def _file_dir(self, file_id):
+        return os.path.join(self.index_dir, str(file_id))
+
+    def _get_lock(self, file_id):
+        with self._lock:
+            if file_id not in self._locks:
+                self._locks[file_id] = threading.Lock()
+            return self._locks[file_id]
+
+    def get_index(self, file_id):
+        """
+        Get the index of a file: memory, then disk, then a rebuild from Supabase.
+
+        A rebuild is only kept when the file is fully ingested: while the upload is still
+        processing (or has no chunks) the index is built for this search and not cached.
+        """
+        index = self._indexes.get(file_id)
+        if index is not None:
+            return index
+        with self._get_lock(file_id):
+            index = self._indexes.get(file_id)
+            if index is not None:
+                return index
+            directory = self._file_dir(file_id)
+            if os.path.exists(os.path.join(directory, 'embeddings.npy')):
+                try:
+                    index = FileVectorIndex.load(file_id, directory)
+                except Exception as e:
+                    logger.log_with_timestamp('VECTOR_INDEX_ERROR', f'Corrupt index for {file_id}, rebuilding: {str(e)}')
+                    index = None
+            if index is None:
+                index, complete = self._build_from_supabase(file_id)
+                if not complete:
+                    return index
+            self._indexes[file_id] = index
+            return index
+
+    @staticmethod
+    def _is_ingested(file_id):
+        response = supabase.table('user_files').select('status').eq('id', file_id).execute()
+        rows = response.data or []
+        # Rows from before the ingestion queue have no status
+        return bool(rows) and rows[0].get('status') in (None, 'ready')
+
+    def _build_from_supabase(self, file_id, page_size=1000):
+        """
+        Returns:
+            tuple: (FileVectorIndex, whether it is complete and can be cached)
+        """
+        # Checked before reading the chunks: a file that becomes ready meanwhile is just not cached
+        complete = self._is_ingested(file_id)
+        contents = []
+        embeddings = []
+        start = 0
+        while True:
+            response = supabase.table('file_chunks') \
+                .select('chunk_index, content, embedding') \
+                .eq('file_id', file_id) \
+                .order('chunk_index') \
+                .range(start, start + page_size - 1) \
+                .execute()
+            rows = response.data or []
+            for row in rows:
+                if row.get('embedding') is None:
+                    continue
+                contents.append(row['content'])
+                embeddings.append(_parse_embedding(row['embedding']))
+            if len(rows) < page_size:
+                break
+            start += page_size
+        logger.log_with_timestamp('VECTOR_INDEX', f'Built index for {file_id} from {len(contents)} chunks')
+        complete = complete and len(contents) > 0
+        return self._create_index(file_id, contents, embeddings, persist=complete), complete
+
+    def _create_index(self, file_id, contents, embeddings, persist=True):
+        if len(contents) == 0:
+            return FileVectorIndex(file_id, np.zeros((0, 0), dtype=np.float32), [])
+        index = FileVectorIndex.build(file_id, embeddings, contents)
+        if not persist:
+            return index
+        try:
+            index.save(self._file_dir(file_id))
+        except Exception as e:
+            logger.log_with_timestamp('VECTOR_INDEX_ERROR', f'Error persisting index for {file_id}: {str(e)}')
+        return index
+
+    def add_file(self, file_id, contents, embeddings):
+        """Index (or re-index) a file right after its chunks were saved"""
+        # Under the file lock: replaces an index a search may be building at the same time
+        with self._get_lock(file_id):
+            index = self._create_index(file_id, contents, embeddings)
+            if len(contents):
+                self._indexes[file_id] = index
+            else:
+                self._indexes.pop(file_id, None)
+        return index
+
+    def remove_file(self, file_id):
+        """Drop a deleted (or failed) file from memory and disk"""
+        with self._get_lock(file_id):
+            self._indexes.pop(file_id, None)
+            shutil.rmtree(self._file_dir(file_id), ignore_errors=True)
+        with self._lock:
+            self._locks.pop(file_id, None)
+
+    def search(self, query_embedding, file_id, top_k=10, match_threshold=0.5):
+        """Same contract as the match_file_chunks RPC: (similarity, content) above threshold"""
+        return self.get_index(file_id).search(query_embedding, top_k, match_threshold)
+
+    def get_stats(self):
+        return {
+            'backend': VECTOR_SEARCH_BACKEND,
+            'loaded_indexes': len(self._indexes),
+            'indexed_chunks': sum(len(index.contents) for index in self._indexes.values()),
+            'index_dir': self.index_dir
+        }
+
+# Global instance
+vector_index_service = VectorIndexService()
@@ -1,8 +1,8 @@
-import httpx
 import asyncio
 from bs4 import BeautifulSoup
 import re
 from ..utils.logger import Logger
+from ..lib.http_client import http_clients
 
 logger = Logger()
 
@@ -73,33 +73,33 @@ class WebScraperService:
             }
             
             # Thực hiện request với timeout
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(url, headers=headers, follow_redirects=True)
-                
-                # Kiểm tra response status
-                if response.status_code != 200:
-                    logger.log_with_timestamp('SCRAPER_ERROR', f'HTTP Error: {response.status_code} for {url}')
-                    return {'url': url, 'title': '', 'content': ''}
-                
-                # Parse HTML
-                html = response.text
-                soup = BeautifulSoup(html, 'html.parser')
-                
-                # Trích xuất title
-                title = self._extract_title(soup)
-                
-                # Trích xuất nội dung chính
-                content = self._extract_relevant_content(soup)
-                
-                # Làm sạch nội dung và giới hạn ở 300 ký tự
-                cleaned_content = self._clean_and_limit_content(content)
-                
-                return {
-                    'url': url,
-                    'title': title,
-                    'content': cleaned_content
-                }
-                
+            client = http_clients.get_async_client('scraper')
+            response = await client.get(url, headers=headers, follow_redirects=True, timeout=self.timeout)
+            
+            # Kiểm tra response status
+            if response.status_code != 200:
+                logger.log_with_timestamp('SCRAPER_ERROR', f'HTTP Error: {response.status_code} for {url}')
+                return {'url': url, 'title': '', 'content': ''}
+            
+            # Parse HTML
+            html = response.text
+            soup = BeautifulSoup(html, 'html.parser')
+            
+            # Trích xuất title
+            title = self._extract_title(soup)
+            
+            # Trích xuất nội dung chính
+            content = self._extract_relevant_content(soup)
+            
+            # Làm sạch nội dung và giới hạn ở 300 ký tự
+            cleaned_content = self._clean_and_limit_content(content)
+            
+            return {
+                'url': url,
+                'title': title,
+                'content': cleaned_content
+            }
+            
         except Exception as e:
             logger.log_with_timestamp('SCRAPER_ERROR', f'Error scraping {url}: {str(e)}')
             return {'url': url, 'title': '', 'content': ''}
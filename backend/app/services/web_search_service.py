@@ -1,21 +1,15 @@
 import asyncio
 import json
-import httpx
 import uuid
 from ..utils.logger import Logger
 from ..lib.supabase import supabase
+from ..lib.http_client import http_clients
+from .llm_router import llm_router
+from .admission_control import admission_control, PRIORITY_INTERACTIVE
 from .web_scraper_service import WebScraperService
 
 logger = Logger()
 
-# LM Studio configuration for query optimization
-LMSTUDIO_URL = "http://192.168.1.216:1234/v1/chat/completions"
-LMSTUDIO_AUTH = "lm-studio"
-LMSTUDIO_HEADERS = {
-    "Authorization": f"Bearer {LMSTUDIO_AUTH}",
-    "Content-Type": "application/json"
-}
-
 class WebSearchService:
     def __init__(self):
         # Google Custom Search API credentials
@@ -92,28 +86,24 @@ class WebSearchService:
             logger.log_with_timestamp('QUERY_OPTIMIZATION_REQUEST', f'Sending to LM Studio: {json.dumps(payload, ensure_ascii=False)}')
             
             # Make request to LM Studio
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                response = await client.post(
-                    LMSTUDIO_URL,
-                    headers=LMSTUDIO_HEADERS,
-                    json=payload
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    content = result['choices'][0]['message']['content']
-                    try:
-                        query_obj = json.loads(content)
-                        optimized_query = query_obj['query'].strip()
-                        logger.log_with_timestamp('QUERY_OPTIMIZATION_SUCCESS', f'Original: "{user_query}" -> Optimized: "{optimized_query}"')
-                        return optimized_query
-                    except Exception as e:
-                        logger.log_with_timestamp('QUERY_OPTIMIZATION_PARSE_ERROR', f'Error parsing JSON: {str(e)} | Content: {content}')
-                        return user_query
-                else:
-                    logger.log_with_timestamp('QUERY_OPTIMIZATION_ERROR', f'LM Studio error: {response.status_code}')
+            async with admission_control.aslot(payload['model'], priority=PRIORITY_INTERACTIVE):
+                response = await llm_router.apost(payload, timeout=15.0)
+            
+            if response.status_code == 200:
+                result = response.json()
+                content = result['choices'][0]['message']['content']
+                try:
+                    query_obj = json.loads(content)
+                    optimized_query = query_obj['query'].strip()
+                    logger.log_with_timestamp('QUERY_OPTIMIZATION_SUCCESS', f'Original: "{user_query}" -> Optimized: "{optimized_query}"')
+                    return optimized_query
+                except Exception as e:
+                    logger.log_with_timestamp('QUERY_OPTIMIZATION_PARSE_ERROR', f'Error parsing JSON: {str(e)} | Content: {content}')
                     return user_query
-                    
+            else:
+                logger.log_with_timestamp('QUERY_OPTIMIZATION_ERROR', f'LM Studio error: {response.status_code}')
+                return user_query
+                
         except Exception as e:
             logger.log_with_timestamp('QUERY_OPTIMIZATION_ERROR', f'Error optimizing query: {str(e)}')
             return user_query
@@ -181,59 +171,60 @@ class WebSearchService:
             
             print('[GOOGLE_SEARCH_PAYLOAD] params:', google_params)
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    self.GOOGLE_API_URL,
-                    params=google_params
+            client = http_clients.get_async_client('google')
+            response = await client.get(
+                self.GOOGLE_API_URL,
+                params=google_params,
+                timeout=30.0
+            )
+            
+            # Check if response is successful
+            if response.status_code != 200:
+                logger.log_with_timestamp(
+                    'WEB_SEARCH_ERROR', 
+                    f'Error from Google Search API: Status {response.status_code}'
                 )
+                return []
+            
+            # Parse JSON response
+            result = response.json()
+            
+            # Log the raw response structure for debugging
+            try:
+                raw_json = json.dumps(result, ensure_ascii=False, indent=2)[:1000]
+                logger.log_with_timestamp('WEB_SEARCH_RAW', f'Raw API structure: {raw_json}')
+                print('[WEB_SEARCH_RAW]', raw_json)
                 
-                # Check if response is successful
-                if response.status_code != 200:
-                    logger.log_with_timestamp(
-                        'WEB_SEARCH_ERROR', 
-                        f'Error from Google Search API: Status {response.status_code}'
-                    )
-                    return []
-                
-                # Parse JSON response
-                result = response.json()
-                
-                # Log the raw response structure for debugging
+                if 'items' not in result:
+                    logger.log_with_timestamp('WEB_SEARCH_RAW', 'No "items" key in Google API response!')
+                    print('[WEB_SEARCH_RAW] No "items" key in Google API response!')
+                    # Check for errors
+                    if 'error' in result:
+                        error_msg = result['error'].get('message', 'Unknown error')
+                        logger.log_with_timestamp('WEB_SEARCH_ERROR', f'Google API Error: {error_msg}')
+                else:
+                    items = result.get('items', [])
+                    logger.log_with_timestamp('WEB_SEARCH_RAW', f'Number of search results: {len(items)}')
+                    print(f'[WEB_SEARCH_RAW] Number of search results: {len(items)}')
+            except Exception as e:
+                logger.log_with_timestamp('WEB_SEARCH_RAW', f'Error logging raw structure: {str(e)}')
+                print('[WEB_SEARCH_RAW] Error logging raw structure:', str(e))
+            
+            logger.log_with_timestamp('WEB_SEARCH', 'Successfully received search results')
+            
+            # Process and format results
+            search_results = self._format_search_results(result)
+            logger.log_with_timestamp('WEB_SEARCH', f'Found {len(search_results)} results')
+            
+            # Save to database if requested
+            if save_to_db and chat_id:
                 try:
-                    raw_json = json.dumps(result, ensure_ascii=False, indent=2)[:1000]
-                    logger.log_with_timestamp('WEB_SEARCH_RAW', f'Raw API structure: {raw_json}')
-                    print('[WEB_SEARCH_RAW]', raw_json)
-                    
-                    if 'items' not in result:
-                        logger.log_with_timestamp('WEB_SEARCH_RAW', 'No "items" key in Google API response!')
-                        print('[WEB_SEARCH_RAW] No "items" key in Google API response!')
-                        # Check for errors
-                        if 'error' in result:
-                            error_msg = result['error'].get('message', 'Unknown error')
-                            logger.log_with_timestamp('WEB_SEARCH_ERROR', f'Google API Error: {error_msg}')
-                    else:
-                        items = result.get('items', [])
-                        logger.log_with_timestamp('WEB_SEARCH_RAW', f'Number of search results: {len(items)}')
-                        print(f'[WEB_SEARCH_RAW] Number of search results: {len(items)}')
+                    await self.save_search_results(chat_id, query, search_results)
                 except Exception as e:
-                    logger.log_with_timestamp('WEB_SEARCH_RAW', f'Error logging raw structure: {str(e)}')
-                    print('[WEB_SEARCH_RAW] Error logging raw structure:', str(e))
-                
-                logger.log_with_timestamp('WEB_SEARCH', 'Successfully received search results')
-                
-                # Process and format results
-                search_results = self._format_search_results(result)
-                logger.log_with_timestamp('WEB_SEARCH', f'Found {len(search_results)} results')
-                
-                # Save to database if requested
-                if save_to_db and chat_id:
-                    try:
-                        await self.save_search_results(chat_id, query, search_results)
-                    except Exception as e:
-                        logger.log_with_timestamp('WEB_SEARCH_DB_ERROR', f'Error saving search results: {str(e)}')
+                    logger.log_with_timestamp('WEB_SEARCH_DB_ERROR', f'Error saving search results: {str(e)}')
+            
+            return search_results
                 
-                return search_results
-                    
         except Exception as e:
             logger.log_with_timestamp('WEB_SEARCH_ERROR', f'Error searching web: {str(e)}')
             # Return empty results on error
@@ -286,7 +277,17 @@ class WebSearchService:
             
     async def save_message_with_sources(self, chat_id, role, content, sources=None):
         """
-        Save a message with optional search results to the database.
+        Async variant of save_message_with_sources_sync: the Supabase insert blocks, it runs
+        in a worker thread so the shared event loop keeps serving other chats.
+
+        Returns:
+            int: ID of the saved message
+        """
+        return await asyncio.to_thread(self.save_message_with_sources_sync, chat_id, role, content, sources)
+
+    def save_message_with_sources_sync(self, chat_id, role, content, sources=None):
+        """
+        Save a message with optional search results to the database (blocking).
         
         Args:
             chat_id (uuid): The chat session ID
@@ -0,0 +1,74 @@
+import atexit
+import asyncio
+import threading
+import contextvars
+from functools import wraps
+from ..lib.http_client import http_clients
+
+
+class BackgroundLoop:
+    """
+    One long-lived event loop in a daemon thread for async code started from sync code.
+
+    Flask async views (create_app sets app.async_to_sync) and the chat stream producers run
+    on it, so the pooled httpx async clients, which are bound to a loop, are kept and reused
+    across requests instead of one client per request loop that nobody closes.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def loop(self):
+        """The loop, started on first use"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True).start()
+                atexit.register(self.stop)
+            return self._loop
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the loop from another thread.
+
+        The coroutine runs in a copy of the caller's context, so context variables such as
+        Flask's request context stay available.
+
+        Returns:
+            concurrent.futures.Future: Result of the coroutine
+        """
+        context = contextvars.copy_context()
+        return asyncio.run_coroutine_threadsafe(self._in_context(coro, context), self.loop())
+
+    @staticmethod
+    async def _in_context(coro, context):
+        # The task created here copies the context current at creation: the caller's
+        return await context.run(asyncio.ensure_future, coro)
+
+    def run(self, coro):
+        """Run a coroutine on the loop and wait for its result (not from the loop's own thread)"""
+        return self.submit(coro).result()
+
+    def async_to_sync(self, func):
+        """Flask hook: async views run on this loop instead of a new loop per request"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.run(func(*args, **kwargs))
+        return wrapper
+
+    def stop(self):
+        """Close the loop's async clients and stop it (registered at exit)"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None or not loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(http_clients.aclose_loop_clients(), loop).result(timeout=5)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+
+# Global instance
+background_loop = BackgroundLoop('app-loop')
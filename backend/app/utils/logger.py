@@ -1,5 +1,9 @@
+import os
 import datetime
 
+# Full payload dumps and other verbose output, off unless LOG_LEVEL=DEBUG
+DEBUG_ENABLED = os.getenv('LOG_LEVEL', 'INFO').upper() == 'DEBUG'
+
 class Logger:
     @staticmethod
     def get_timestamp():
@@ -26,4 +30,23 @@ class Logger:
             log_message += f" | Additional info: {additional_info}"
         
         print(log_message)
+        return timestamp
+
+    @staticmethod
+    def debug_enabled():
+        """Whether debug messages are printed (LOG_LEVEL=DEBUG)"""
+        return DEBUG_ENABLED
+
+    @staticmethod
+    def debug(message_type, content):
+        """
+        Log a debug message, complete (not truncated), only when LOG_LEVEL=DEBUG
+
+        Returns:
+            str: The timestamp when the message was logged, None if debug logging is off
+        """
+        if not DEBUG_ENABLED:
+            return None
+        timestamp = Logger.get_timestamp()
+        print(f"[{timestamp}] {message_type}: {content}")
         return timestamp
\ No newline at end of file
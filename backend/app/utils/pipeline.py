@@ -0,0 +1,147 @@
+import time
+import asyncio
+import threading
+
+
+class StageTimings:
+    """
+    Wall-clock timings of the async stages of one request.
+
+    Stages are plain awaitables; independent ones are started as tasks and awaited together,
+    so the request waits for the slowest branch instead of the sum of all of them.
+    """
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.started_at = time.perf_counter()
+        self.stages = {}
+
+    async def stage(self, name, awaitable):
+        """Await a stage and record how long it took, also when it fails"""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.stages[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    async def thread(self, name, func, *args, **kwargs):
+        """Run a blocking call (Supabase, sync HTTP, embeddings) in a worker thread as a stage"""
+        return await self.stage(name, asyncio.to_thread(func, *args, **kwargs))
+
+    def task(self, name, awaitable):
+        """Start a stage in the background and return its asyncio.Task"""
+        return asyncio.ensure_future(self.stage(name, awaitable))
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self.started_at) * 1000, 1)
+
+    def summary(self):
+        return {'total_ms': self.elapsed_ms(), 'stages': dict(self.stages)}
+
+
+class PipelineStats:
+    """Aggregated stage timings per pipeline, exposed on the metrics endpoint"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, timings):
+        with self._lock:
+            pipeline = self._stats.setdefault(timings.pipeline, {'requests': 0, 'total_ms': 0.0, 'stages': {}})
+            pipeline['requests'] += 1
+            pipeline['total_ms'] += timings.elapsed_ms()
+            for name, ms in timings.stages.items():
+                stage = pipeline['stages'].setdefault(name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+                stage['count'] += 1
+                stage['total_ms'] += ms
+                stage['max_ms'] = max(stage['max_ms'], ms)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                name: {
+                    'requests': pipeline['requests'],
+                    'avg_total_ms': round(pipeline['total_ms'] / pipeline['requests'], 1),
+                    'stages': {
+                        stage_name: {
+                            'count': stage['count'],
+                            'avg_ms': round(stage['total_ms'] / stage['count'], 1),
+                            'max_ms': stage['max_ms']
+                        }
+                        for stage_name, stage in pipeline['stages'].items()
+                    }
+                }
+                for name, pipeline in self._stats.items()
+            }
+
+class StreamStats:
+    """
+    Outcome of the answer streams per model: completed or cancelled by the client.
+
+    A cancelled stream closes the upstream request, so the rest of the answer is never
+    generated. The tokens saved are estimated from the average length of completed answers
+    of that model, the seconds saved from the stream's own token rate.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _model(self, model):
+        return self._stats.setdefault(model, {
+            'completed': 0, 'completed_tokens': 0, 'completed_s': 0.0,
+            'cancelled': 0, 'cancelled_tokens': 0, 'tokens_saved': 0, 'seconds_saved': 0.0
+        })
+
+    def record_completed(self, model, tokens, seconds):
+        with self._lock:
+            stats = self._model(model)
+            stats['completed'] += 1
+            stats['completed_tokens'] += tokens
+            stats['completed_s'] += seconds
+
+    def record_cancelled(self, model, tokens, seconds):
+        """
+        Args:
+            model (str): Model of the stream
+            tokens (int): Tokens streamed before the client went away
+            seconds (float): Time the stream had been running
+
+        Returns:
+            tuple: (tokens saved, seconds saved) estimates, zero until an answer of the model completed
+        """
+        with self._lock:
+            stats = self._model(model)
+            stats['cancelled'] += 1
+            stats['cancelled_tokens'] += tokens
+            if not stats['completed']:
+                return 0, 0.0
+            expected = stats['completed_tokens'] / stats['completed']
+            tokens_saved = max(0, round(expected - tokens))
+            if tokens and seconds > 0:
+                rate = tokens / seconds
+            else:
+                rate = stats['completed_tokens'] / stats['completed_s'] if stats['completed_s'] else 0.0
+            seconds_saved = tokens_saved / rate if rate else 0.0
+            stats['tokens_saved'] += tokens_saved
+            stats['seconds_saved'] += seconds_saved
+            return tokens_saved, seconds_saved
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                model: {
+                    'completed': stats['completed'],
+                    'avg_completion_tokens': round(stats['completed_tokens'] / stats['completed'], 1) if stats['completed'] else None,
+                    'cancelled': stats['cancelled'],
+                    'cancelled_tokens': stats['cancelled_tokens'],
+                    'tokens_saved': stats['tokens_saved'],
+                    'seconds_saved': round(stats['seconds_saved'], 1)
+                }
+                for model, stats in self._stats.items()
+            }
+
+# Global instance
+pipeline_stats = PipelineStats()
+stream_stats = StreamStats()
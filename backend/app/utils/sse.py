@@ -0,0 +1,124 @@
+import json
+import asyncio
+from typing import NamedTuple
+
+
+class StreamEvent(NamedTuple):
+    """Event of an answer stream other than content (metadata, sources)"""
+    event: str
+    data: dict
+
+
+def format_event(data, event=None, event_id=None):
+    """
+    Server-Sent Events frame.
+
+    Args:
+        data (dict|str): Payload, dicts are sent as one line of JSON
+        event (str, optional): Event type, the client dispatches on it
+        event_id (int|str, optional): Sent back by the client as Last-Event-ID to resume
+
+    Returns:
+        str: The frame, terminated by a blank line
+    """
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False)
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    # Multi-line data is one data field per line
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_last_event_id(value):
+    """Offset from a Last-Event-ID header, 0 (from the start) when missing or malformed"""
+    try:
+        return max(0, int(str(value).strip()))
+    except (TypeError, ValueError):
+        return 0
+
+
+_END = object()
+
+
+async def coalesce(chunks, window_ms, max_bytes):
+    """
+    Merge text chunks into fewer, larger ones.
+
+    The first chunk is passed on at once (time to first token is unchanged). After that, text
+    is held until window_ms passed since the oldest held chunk or max_bytes are held. A
+    StreamEvent flushes the held text and passes through in order.
+
+    Args:
+        chunks: Async iterator of str and StreamEvent
+        window_ms (float): Coalescing window, 0 disables coalescing
+        max_bytes (int): Flush as soon as this much UTF-8 text is held
+
+    Yields:
+        str or StreamEvent
+    """
+    if window_ms <= 0:
+        async for item in chunks:
+            yield item
+        return
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    error = []
+
+    async def read():
+        try:
+            async for item in chunks:
+                await queue.put(item)
+        except Exception as e:
+            error.append(e)
+        finally:
+            queue.put_nowait(_END)
+
+    reader = asyncio.ensure_future(read())
+    getter = None
+    held, held_bytes, deadline, first = [], 0, None, True
+    try:
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(queue.get())
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, _ = await asyncio.wait({getter}, timeout=timeout)
+            if not done:
+                # Window elapsed with text held
+                yield "".join(held)
+                held, held_bytes, deadline = [], 0, None
+                continue
+            item, getter = getter.result(), None
+            if item is _END:
+                break
+            if isinstance(item, StreamEvent):
+                if held:
+                    yield "".join(held)
+                    held, held_bytes, deadline = [], 0, None
+                yield item
+                continue
+            if first:
+                first = False
+                yield item
+                continue
+            held.append(item)
+            held_bytes += len(item.encode('utf-8'))
+            if deadline is None:
+                deadline = loop.time() + window_ms / 1000
+            if held_bytes >= max_bytes:
+                yield "".join(held)
+                held, held_bytes, deadline = [], 0, None
+        if held:
+            yield "".join(held)
+        if error:
+            raise error[0]
+    finally:
+        if getter is not None:
+            getter.cancel()
+        if not reader.done():
+            # Cancels the upstream iterator too (closes the LLM request)
+            reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
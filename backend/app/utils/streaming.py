@@ -0,0 +1,47 @@
+from .background_loop import background_loop
+
+
+class ResponseStream:
+    """
+    Body of a streamed response: an async iterator of text chunks plus callbacks that must run
+    when the response is closed, whether or not the client ever read a chunk (model slot release...).
+
+    The ASGI server iterates it on its event loop; the WSGI server goes through iter_sync().
+    """
+
+    def __init__(self, chunks, on_close=None):
+        self.chunks = chunks
+        self._on_close = list(on_close or [])
+        self._closed = False
+
+    def __aiter__(self):
+        return self.chunks.__aiter__()
+
+    def run_close_callbacks(self):
+        """Idempotent, safe to call from any thread"""
+        if self._closed:
+            return
+        self._closed = True
+        for callback in self._on_close:
+            callback()
+
+    async def aclose(self):
+        try:
+            await self.chunks.aclose()
+        finally:
+            self.run_close_callbacks()
+
+    def iter_sync(self):
+        """
+        Drive the chunks on the shared background loop for WSGI servers (Flask dev server,
+        gunicorn sync workers). This holds the worker thread for the whole stream, the ASGI app does not.
+        """
+        try:
+            iterator = self.chunks.__aiter__()
+            while True:
+                try:
+                    yield background_loop.run(iterator.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            background_loop.run(self.aclose())
@@ -0,0 +1,53 @@
+"""
+In-process ASGI client for POST /chat: no server, no socket, the app runs on the caller's loop.
+"""
+import json
+import time
+import asyncio
+
+
+async def post_chat(application, body, disconnect_after=None, client=('127.0.0.1', 50000)):
+    """
+    POST /chat to an ASGI application.
+
+    Args:
+        body (dict|bytes): JSON body, bytes are sent as is
+        disconnect_after (int, optional): Disconnect after this many body chunks
+
+    Returns:
+        dict: status, headers, chunks (str) and times (perf_counter when each chunk was sent)
+    """
+    raw = body if isinstance(body, bytes) else json.dumps(body).encode()
+    requests = asyncio.Queue()
+    requests.put_nowait({'type': 'http.request', 'body': raw, 'more_body': False})
+    reply = {'status': None, 'headers': {}, 'chunks': [], 'times': []}
+
+    async def receive():
+        return await requests.get()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            reply['status'] = message['status']
+            reply['headers'] = {k.decode(): v.decode() for k, v in message['headers']}
+        elif message.get('body'):
+            reply['chunks'].append(message['body'].decode())
+            reply['times'].append(time.perf_counter())
+            if disconnect_after is not None and len(reply['chunks']) == disconnect_after:
+                requests.put_nowait({'type': 'http.disconnect'})
+
+    scope = {
+        'type': 'http', 'method': 'POST', 'path': '/chat', 'query_string': b'',
+        'headers': [(b'content-type', b'application/json')], 'client': client
+    }
+    await application(scope, receive, send)
+    return reply
+
+
+def sse_events(chunks):
+    """SSE frames of a response body as (event, data) pairs"""
+    frames = []
+    for frame in ''.join(chunks).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in frame.splitlines() if ': ' in line)
+        if 'data' in fields:
+            frames.append((fields.get('event', 'message'), fields['data']))
+    return frames
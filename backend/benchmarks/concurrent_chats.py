@@ -0,0 +1,77 @@
+"""
+Wall time of N concurrent chat classifications on one event loop: the blocking LM Studio calls
+(what chat() awaited before aclassify_query_lmstudio/aparse_time_lmstudio) against the async ones.
+
+    cd backend && python -m benchmarks.concurrent_chats [--chats 1,8,32] [--latency 0.2]
+
+Each chat classifies its question then parses its time expression, against a local stub LLM
+answering after --latency seconds. Admission limits are raised so only the HTTP calls are
+measured. 'loop stall' is the longest the event loop went without running a 10 ms heartbeat.
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+
+os.environ.setdefault('LLM_HEALTH_INTERVAL', '0')
+os.environ.setdefault('LLM_MAX_CONCURRENCY', '1000')
+os.environ.setdefault('LLM_MAX_QUEUE', '1000')
+
+from benchmarks.stub_llm import StubLLM  # noqa: E402
+
+
+async def blocking_chat(lmstudio_service, question):
+    lmstudio_service.classify_query_lmstudio(question)
+    return lmstudio_service.parse_time_lmstudio(question)
+
+
+async def async_chat(lmstudio_service, question):
+    await lmstudio_service.aclassify_query_lmstudio(question)
+    return await lmstudio_service.aparse_time_lmstudio(question)
+
+
+async def run(chat, lmstudio_service, count):
+    stall = 0.0
+
+    async def heartbeat():
+        nonlocal stall
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            stall = max(stall, now - last - 0.01)
+            last = now
+
+    beat = asyncio.ensure_future(heartbeat())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(chat(lmstudio_service, f'thu{2 + i % 5} tuan sau hc gi') for i in range(count)))
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.02)  # let the heartbeat see the last gap
+    beat.cancel()
+    errors = sum(1 for r in results if 'error' in r)
+    return elapsed, stall, errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chats', default='1,8,32')
+    parser.add_argument('--latency', type=float, default=0.2, help='Stub LLM seconds per call')
+    args = parser.parse_args()
+
+    stub = StubLLM(tokens=[json.dumps({'type': 'week', 'value': 'next_week'})],
+                   models=('qwen3-1.7b', 'qwen3-4b'), delay=args.latency)
+    os.environ['LLM_BACKENDS'] = json.dumps([{'name': 'stub', 'url': stub.url, 'models': None}])
+    from app.services import lmstudio_service
+
+    print(f"{'chats':>6} {'mode':>9} {'seconds':>8} {'chats/s':>8} {'loop stall':>11} {'errors':>7}")
+    for count in map(int, args.chats.split(',')):
+        for mode, chat in (('blocking', blocking_chat), ('async', async_chat)):
+            elapsed, stall, errors = asyncio.run(run(chat, lmstudio_service, count))
+            print(f"{count:>6} {mode:>9} {elapsed:>8.2f} {count / elapsed:>8.1f} {stall * 1000:>9.0f}ms {errors:>7}")
+    stub.close()
+
+
+if __name__ == '__main__':
+    main()
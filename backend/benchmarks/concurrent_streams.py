@@ -0,0 +1,102 @@
+"""
+Concurrent /chat streams through the ASGI app, in process, against a local stub LLM.
+
+    cd backend && python -m benchmarks.concurrent_streams [--streams 1,16,64] [--tokens 100] [--token-delay 0.02]
+    cd backend && python -m benchmarks.concurrent_streams --streams 64 --rounds 20   # soak
+
+Questions are classified as 'general' without an LLM call, so each stream is one generation.
+Reports time to first content frame, whole answer time, wall time per round and the peak
+thread count (the stub server's threads included, one per open LLM request).
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+
+os.environ.setdefault('LLM_HEALTH_INTERVAL', '0')
+os.environ.setdefault('EMBEDDING_WARMUP', 'false')
+os.environ.setdefault('RESPONSE_CACHE_ENABLED', 'false')
+os.environ.setdefault('CHAT_STREAM_REDIS', 'false')
+os.environ.setdefault('LLM_MAX_CONCURRENCY', '1000')
+os.environ.setdefault('LLM_MAX_QUEUE', '1000')
+
+from benchmarks.asgi_client import post_chat, sse_events  # noqa: E402
+from benchmarks.stub_llm import StubLLM  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def one_stream(application, i):
+    started = time.perf_counter()
+    reply = await post_chat(application, {'message': 'có nên bỏ học không', 'user_id': f'bench-{i}'})
+    first = next((t for chunk, t in zip(reply['chunks'], reply['times']) if 'event: content' in chunk), None)
+    frames = sse_events(reply['chunks'])
+    completed = reply['status'] == 200 and bool(frames) and frames[-1][0] == 'done'
+    return {
+        'ttfb': (first - started) if first else None,
+        'total': time.perf_counter() - started,
+        'completed': completed
+    }
+
+
+async def run_round(application, count):
+    peak = threading.active_count()
+    done = False
+
+    async def sample():
+        nonlocal peak
+        while not done:
+            peak = max(peak, threading.active_count())
+            await asyncio.sleep(0.01)
+
+    sampler = asyncio.ensure_future(sample())
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one_stream(application, i) for i in range(count)))
+    wall = time.perf_counter() - started
+    done = True
+    await sampler
+    return results, wall, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--streams', default='1,16,64')
+    parser.add_argument('--rounds', type=int, default=1)
+    parser.add_argument('--tokens', type=int, default=100)
+    parser.add_argument('--token-delay', type=float, default=0.02)
+    args = parser.parse_args()
+
+    stub = StubLLM(tokens=['tok '] * args.tokens, token_delay=args.token_delay)
+    os.environ['LLM_BACKENDS'] = json.dumps([{'name': 'stub', 'url': stub.url, 'models': None}])
+    from app.asgi import application
+    from app.routes import chat
+
+    async def classify(text):
+        return {'category': 'general', 'method': 'benchmark', 'time_info': {}}
+    chat.query_classifier.aclassify_query = classify
+
+    print(f"{'streams':>7} {'round':>5} {'wall s':>7} {'ttfb p50':>9} {'ttfb p95':>9} {'total p95':>10} "
+          f"{'failed':>6} {'threads':>7}")
+
+    async def run():
+        for count in map(int, args.streams.split(',')):
+            for round_no in range(args.rounds):
+                results, wall, peak = await run_round(application, count)
+                ttfb = [r['ttfb'] for r in results if r['ttfb'] is not None] or [float('nan')]
+                failed = sum(1 for r in results if not r['completed'])
+                print(f"{count:>7} {round_no + 1:>5} {wall:>7.2f} {statistics.median(ttfb) * 1000:>7.0f}ms "
+                      f"{percentile(ttfb, 0.95) * 1000:>7.0f}ms {percentile([r['total'] for r in results], 0.95):>9.2f}s "
+                      f"{failed:>6} {peak:>7}")
+
+    asyncio.run(run())
+    stub.close()
+
+
+if __name__ == '__main__':
+    main()
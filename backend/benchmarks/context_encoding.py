@@ -0,0 +1,38 @@
+"""
+Token cost of the 'text' and 'table' context encodings, and optionally the answers they produce.
+
+    cd backend && python -m benchmarks.context_encoding [--agent qwen3-4b]
+    cd backend && python -m benchmarks.context_encoding --agent qwen3-4b --question "tuần này học môn gì?"
+
+Runs compare_encodings on the fixture week of classes and semester of exams. With --question
+both encodings are sent to the agent through the configured LLM backends, and the subject
+codes/rooms/dates missing from each answer are listed.
+"""
+import argparse
+import json
+from app.config.agents import AVAILABLE_AGENTS
+from app.services.context_encoding import compare_encodings
+from benchmarks.ptit_fixtures import schedule_result, exams
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--agent', action='append', help='Agent id, repeatable (default: every agent)')
+    parser.add_argument('--question', help='Also answer this question with both encodings')
+    args = parser.parse_args()
+    schedule_data = schedule_result()
+    exam_list = exams()
+
+    print(f"{'agent':>14} {'data':>9} {'text tok':>9} {'table tok':>9} {'saving':>7}")
+    for agent_id in args.agent or list(AVAILABLE_AGENTS):
+        for name, kwargs in (('schedule', {'schedule_data': schedule_data}), ('exams', {'exams': exam_list})):
+            result = compare_encodings(agent_id, question=args.question, **kwargs)
+            print(f"{agent_id:>14} {name:>9} {result['text_tokens']:>9} {result['table_tokens']:>9} {result['saving']:>7.1%}")
+            if args.question:
+                print(json.dumps({
+                    key: result[key] for key in ('text_missing', 'table_missing', 'same_facts')
+                }, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Ingest throughput (docs/sec) of FileService.process_file_chunks by embedding batch size.
+
+    cd backend && python -m benchmarks.ingest_embeddings [--batch-sizes 1,16,64,128] [--docs 20]
+    cd backend && python -m benchmarks.ingest_embeddings --simulate   # without sentence-transformers
+
+Batch size 1 is one model.encode call per chunk, like the pipeline before batching.
+Documents are synthetic: TXT-sized notes and PDF-sized texts (~2000 characters per page), the
+PDF text extraction itself is not timed. Supabase inserts are replaced by a no-op table.
+--simulate swaps the model for one with a fixed per-call overhead and a per-text cost.
+"""
+import argparse
+import random
+import time
+import numpy as np
+from app.services import file_service as file_service_module
+from app.services.embedding_registry import embedding_registry
+from app.services.file_service import FileService
+from app.services.vector_index_service import vector_index_service
+
+WORDS = ('lịch học môn cơ sở dữ liệu mạng máy tính hệ điều hành sinh viên giảng viên phòng thi '
+         'chương bài tập kiểm tra đồ án báo cáo thực hành lý thuyết tín chỉ học kỳ').split()
+
+
+class NoopTable:
+    def insert(self, records):
+        return self
+
+    def update(self, values):
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def execute(self):
+        return self
+
+
+class NoopSupabase:
+    def table(self, name):
+        return NoopTable()
+
+
+class SimulatedModel:
+    """Cost model of a CPU MiniLM: per call overhead plus per text time"""
+
+    def __init__(self, call_ms=4.0, text_ms=0.6, dimension=384):
+        self.call_s = call_ms / 1000
+        self.text_s = text_ms / 1000
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        count = 1 if single else len(texts)
+        time.sleep(self.call_s + self.text_s * count)
+        matrix = np.zeros((count, self.dimension), dtype=np.float32)
+        return matrix[0] if single else matrix
+
+
+def synthetic_documents(count, rng):
+    """Alternating TXT (1-3 pages) and PDF-sized (20-60 pages) documents"""
+    docs = []
+    for i in range(count):
+        pages = rng.randint(1, 3) if i % 2 == 0 else rng.randint(20, 60)
+        docs.append(' '.join(rng.choice(WORDS) for _ in range(pages * 330)))
+    return docs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-sizes', default='1,16,64,128')
+    parser.add_argument('--docs', type=int, default=20)
+    parser.add_argument('--simulate', action='store_true', help='Simulated model instead of sentence-transformers')
+    args = parser.parse_args()
+
+    file_service_module.supabase = NoopSupabase()
+    vector_index_service.is_enabled = lambda: False
+    service = FileService()
+    if args.simulate:
+        model = SimulatedModel()
+        embedding_registry._models[service.model_name] = model
+        embedding_registry._stats[service.model_name] = {'dimension': model.dimension}
+    else:
+        service.model  # load outside the timed runs
+
+    docs = synthetic_documents(args.docs, random.Random(0))
+    chunks = sum(len(range(0, len(doc), 400)) for doc in docs)
+    print(f"{args.docs} documents, {chunks} chunks ({'simulated' if args.simulate else service.model_name})")
+    print(f"{'batch':>6} {'seconds':>8} {'docs/s':>7} {'chunks/s':>9}")
+    for batch_size in map(int, args.batch_sizes.split(',')):
+        started = time.perf_counter()
+        for i, doc in enumerate(docs):
+            service.process_file_chunks(f'bench-{i}', doc, batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+        print(f"{batch_size:>6} {elapsed:>8.2f} {args.docs / elapsed:>7.2f} {chunks / elapsed:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+PTIT API fixtures: a week of timetable and a semester of exams shaped like the real
+w-locdstkbtuanusertheohocky and w-locdslichthisvtheohocky responses, for offline runs.
+"""
+import asyncio
+from datetime import date, timedelta
+
+SEMESTER = '20241'
+
+# (ma_mon, ten_mon, ten_mon_eg, so_tin_chi, ma_phong, ten_giang_vien, ma_giang_vien)
+SUBJECTS = [
+    ('INT1340', 'Nhập môn công nghệ phần mềm', 'Introduction to Software Engineering', '3', '2B21', 'Nguyễn Văn An', 'GV0112'),
+    ('INT1313', 'Cơ sở dữ liệu', 'Databases', '3', '2A16', 'Trần Thị Bình', 'GV0245'),
+    ('INT1336', 'Mạng máy tính', 'Computer Networks', '3', '2B32', 'Lê Văn Cường', 'GV0318'),
+    ('BAS1153', 'Lịch sử Đảng Cộng sản Việt Nam', 'History of the Communist Party of Vietnam', '2', '1A08', 'Phạm Thị Dung', 'GV0407'),
+    ('INT1319', 'Hệ điều hành', 'Operating Systems', '3', '2A25', 'Hoàng Văn Em', 'GV0531'),
+]
+
+
+def monday():
+    today = date.today()
+    return today - timedelta(days=today.weekday())
+
+
+def semester_payload():
+    """Timetable of the current week: two classes a day from Monday to Saturday"""
+    start = monday()
+    classes = []
+    for day in range(6):
+        for slot, start_period in enumerate((1, 7)):
+            code, name, name_en, credits, room, lecturer, lecturer_code = SUBJECTS[(day * 2 + slot) % len(SUBJECTS)]
+            classes.append({
+                'ngay_hoc': (start + timedelta(days=day)).strftime('%Y-%m-%dT00:00:00'),
+                'tiet_bat_dau': start_period,
+                'so_tiet': 3,
+                'ma_mon': code,
+                'ten_mon': name,
+                'ten_mon_eg': name_en,
+                'so_tin_chi': credits,
+                'ma_phong': room,
+                'ten_giang_vien': lecturer,
+                'ma_giang_vien': lecturer_code,
+                'thu_kieu_so': day + 2
+            })
+    return {'data': {'ds_tuan_tkb': [{
+        'ngay_bat_dau': start.strftime('%d/%m/%Y'),
+        'ngay_ket_thuc': (start + timedelta(days=6)).strftime('%d/%m/%Y'),
+        'ds_thoi_khoa_bieu': classes
+    }]}}
+
+
+def schedule_result(time_info=None):
+    """ScheduleService.process_schedule_query result for the fixture timetable (this week by default)"""
+    from app.services.schedule_service import ScheduleService
+
+    service = ScheduleService()
+
+    async def get_schedule_by_semester(hoc_ky, auth_service=None):
+        return semester_payload()
+
+    service.get_schedule_by_semester = get_schedule_by_semester
+    return asyncio.run(service.process_schedule_query(
+        time_info or {'type': 'week', 'value': 'current_week'}, SEMESTER
+    ))
+
+
+def exams():
+    """Final exams (ds_lich_thi items), one per subject on consecutive days from next Monday"""
+    first = monday() + timedelta(days=7)
+    return [{
+        'ma_mon': code,
+        'ten_mon': name,
+        'ten_mon_eg': name_en,
+        'ky_thi': 'Thi cuối kỳ HK1 2024-2025',
+        'hinh_thuc_thi': 'Tự luận',
+        'so_phut': 90,
+        'gio_bat_dau': '07:30' if i % 2 == 0 else '13:30',
+        'ngay_thi': (first + timedelta(days=i)).strftime('%d/%m/%Y'),
+        'dia_diem_thi': 'Cơ sở Quận 9',
+        'ma_phong': room
+    } for i, (code, name, name_en, _, room, _, _) in enumerate(SUBJECTS)]
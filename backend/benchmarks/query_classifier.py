@@ -0,0 +1,36 @@
+"""
+Accuracy and latency of the query classifier tiers on BENCHMARK_EXAMPLES (hard negatives included).
+
+    cd backend && python -m benchmarks.query_classifier            # rules, kNN, then LM Studio
+    cd backend && python -m benchmarks.query_classifier --no-llm   # local tiers only
+    cd backend && python -m benchmarks.query_classifier --errors   # list misclassified questions
+
+Without sentence-transformers the kNN tier is skipped. Without --no-llm, questions the local
+tiers cannot answer go to the configured LLM backends.
+"""
+import argparse
+import json
+from app.config.classifier_examples import BENCHMARK_EXAMPLES
+from app.services.query_classifier import QueryClassifier
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-llm', action='store_true', help='Do not call LM Studio')
+    parser.add_argument('--fused', action='store_true', help='Fused classifier + time parser LLM call')
+    parser.add_argument('--errors', action='store_true', help='Print the misclassified questions')
+    args = parser.parse_args()
+
+    classifier = QueryClassifier()
+    classifier.fused_llm_enabled = args.fused
+    report = classifier.evaluate(use_llm=not args.no_llm)
+    print(json.dumps(report, indent=2))
+    if args.errors:
+        for text, expected in BENCHMARK_EXAMPLES:
+            result = classifier.evaluate([(text, expected)], use_llm=not args.no_llm)
+            if result['accuracy'] < 1.0:
+                print(f"{expected:>13} <- {', '.join(result['tiers'])}: {text}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+SSE frames sent for one answer by coalescing window.
+
+    cd backend && python -m benchmarks.sse_coalescing [--windows 0,16,50,100] [--deltas 400] [--rate 60]
+
+Simulates an LLM emitting --deltas short text deltas at --rate deltas per second, runs them
+through coalesce() and frames each output like chat_stream_service does. Window 0 is one
+frame per delta (the behaviour before coalescing). 'added p95' is how long a delta waited
+in the coalescer before being sent.
+"""
+import time
+import asyncio
+import argparse
+from app.utils.sse import coalesce, format_event
+
+WORDS = 'Lịch học tuần này của bạn có môn Cơ sở dữ liệu vào thứ 3 tiết 1 phòng 2A16 '.split(' ')
+
+
+async def model_deltas(count, rate, sent_at):
+    for i in range(count):
+        delta = WORDS[i % len(WORDS)] + ' '
+        sent_at.append(time.perf_counter())
+        yield delta
+        await asyncio.sleep(1 / rate)
+
+
+async def run(window_ms, max_bytes, count, rate):
+    sent_at = []
+    frames = 0
+    frame_bytes = 0
+    delays = []
+    started = time.perf_counter()
+    received = 0
+    async for chunk in coalesce(model_deltas(count, rate, sent_at), window_ms, max_bytes):
+        now = time.perf_counter()
+        frame = format_event({'content': chunk}, event='content', event_id=frames)
+        frames += 1
+        frame_bytes += len(frame.encode('utf-8'))
+        # Deltas merged into this frame, in order
+        merged = sent_at[received:]
+        received = len(sent_at)
+        delays.extend(now - t for t in merged)
+    elapsed = time.perf_counter() - started
+    delays.sort()
+    return {
+        'frames': frames,
+        'frames_per_s': frames / elapsed,
+        'bytes': frame_bytes,
+        'added_p95_ms': delays[int(0.95 * (len(delays) - 1))] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--windows', default='0,16,50,100')
+    parser.add_argument('--max-bytes', type=int, default=512)
+    parser.add_argument('--deltas', type=int, default=400)
+    parser.add_argument('--rate', type=float, default=60, help='Deltas per second from the model')
+    args = parser.parse_args()
+
+    print(f"{args.deltas} deltas at {args.rate:g}/s")
+    print(f"{'window':>7} {'frames':>7} {'frames/s':>9} {'bytes':>7} {'added p95':>10}")
+    for window in map(float, args.windows.split(',')):
+        result = asyncio.run(run(window, args.max_bytes, args.deltas, args.rate))
+        print(f"{window:>5g}ms {result['frames']:>7} {result['frames_per_s']:>9.1f} {result['bytes']:>7} "
+              f"{result['added_p95_ms']:>8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
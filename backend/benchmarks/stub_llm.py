@@ -0,0 +1,127 @@
+"""
+OpenAI-compatible stub server for tests and benchmarks (no LM Studio needed).
+
+    python -m benchmarks.stub_llm [--port 1234] [--tokens 200] [--token-delay 0.02]
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Bursts of concurrent clients connect at once, the default backlog of 5 drops their SYNs
+    request_queue_size = 256
+
+
+class StubLLM:
+    """
+    OpenAI-compatible server on a local port (a free one by default).
+
+    status: HTTP status of chat completions (500+ to fail), tokens: streamed content deltas,
+    delay: seconds before answering, token_delay: seconds between streamed deltas.
+    """
+
+    def __init__(self, status=200, tokens=('Xin ', 'chào'), models=('qwen3-4b',), delay=0.0, token_delay=0.0, port=0):
+        self.status = status
+        self.tokens = list(tokens)
+        self.models = list(models)
+        self.delay = delay
+        self.token_delay = token_delay
+        self.requests = 0
+        self.peers = set()  # client ports, one per connection
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type='application/json'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, events):
+                # One chunk per delta, like a real backend generating tokens
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for event in events:
+                    data = event.encode()
+                    self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+                    self.wfile.flush()
+                    time.sleep(stub.token_delay)
+                self.wfile.write(b'0\r\n\r\n')
+
+            def do_GET(self):
+                stub.peers.add(self.client_address[1])
+                self._send(200, json.dumps({'data': [{'id': m} for m in stub.models]}).encode())
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                with stub._lock:
+                    stub.requests += 1
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                stub.peers.add(self.client_address[1])
+                try:
+                    self._answer(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with stub._lock:
+                        stub.active -= 1
+
+            def _answer(self, payload):
+                time.sleep(stub.delay)
+                if stub.status >= 400:
+                    self._send(stub.status, b'{"error": "stub failure"}')
+                    return
+                if payload.get('stream'):
+                    events = [
+                        f"data: {json.dumps({'choices': [{'delta': {'content': t}}]})}\n\n" for t in stub.tokens
+                    ] + ['data: [DONE]\n\n']
+                    if stub.token_delay:
+                        self._stream(events)
+                    else:
+                        self._send(200, ''.join(events).encode(), 'text/event-stream')
+                    return
+                content = ''.join(stub.tokens)
+                self._send(200, json.dumps({
+                    'choices': [{'message': {'content': content}}],
+                    'usage': {'completion_tokens': len(stub.tokens)}
+                }).encode())
+
+        self.server = _Server(('127.0.0.1', port), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=1234)
+    parser.add_argument('--tokens', type=int, default=200)
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--token-delay', type=float, default=0.02)
+    args = parser.parse_args()
+    stub = StubLLM(tokens=['tok '] * args.tokens, delay=args.delay, token_delay=args.token_delay, port=args.port)
+    print(f'Stub LLM on {stub.url}')
+    threading.Event().wait()
+
+
+if __name__ == '__main__':
+    main()
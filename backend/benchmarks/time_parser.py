@@ -0,0 +1,51 @@
+"""
+Latency of the rule-based time parser, optionally against the LM Studio time parser it replaces.
+
+    cd backend && python -m benchmarks.time_parser [--rounds 2000] [--llm]
+
+Questions are the examples of TIME_PARSER_SYSTEM_PROMPT; --llm also sends each one to the
+configured LLM backend once and reports how often both parsers agree.
+"""
+import argparse
+import re
+import time
+import numpy as np
+from app.services.lmstudio_service import TIME_PARSER_SYSTEM_PROMPT, parse_time_lmstudio
+from app.services.time_parser import parse_time_rules
+
+QUESTIONS = re.findall(r'User: "(.+?)" \((.+?)\)', TIME_PARSER_SYSTEM_PROMPT)
+
+
+def percentiles(latencies):
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=2000)
+    parser.add_argument('--llm', action='store_true', help='Also time the LM Studio parser')
+    args = parser.parse_args()
+    questions = [q for pair in QUESTIONS for q in pair]
+
+    latencies = []
+    for _ in range(args.rounds):
+        for question in questions:
+            started = time.perf_counter()
+            parse_time_rules(question)
+            latencies.append((time.perf_counter() - started) * 1e6)
+    p50, p95 = percentiles(latencies)
+    print(f"rules: {len(latencies)} parses, p50 {p50:.1f} us, p95 {p95:.1f} us")
+
+    if args.llm:
+        latencies, agree = [], 0
+        for question in questions:
+            started = time.perf_counter()
+            result = parse_time_lmstudio(question)
+            latencies.append((time.perf_counter() - started) * 1000)
+            agree += result == parse_time_rules(question)
+        p50, p95 = percentiles(latencies)
+        print(f"llm:   {len(latencies)} parses, p50 {p50:.0f} ms, p95 {p95:.0f} ms, agrees with rules {agree}/{len(questions)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+# Services are module-level singletons configured from the environment at import time:
+# no background health checks or model warm-up while testing
+os.environ.setdefault('LLM_HEALTH_INTERVAL', '0')
+os.environ.setdefault('EMBEDDING_WARMUP', 'false')
+os.environ.setdefault('RESPONSE_CACHE_ENABLED', 'false')
+os.environ.setdefault('CHAT_STREAM_REDIS', 'false')
+os.environ.setdefault('REDIS_HOST', '127.0.0.1')
+os.environ.setdefault('REDIS_PORT', '1')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_llm import StubLLM  # noqa: E402
+
+
+@pytest.fixture
+def stub_llm():
+    """Factory of stub LLM servers, shut down after the test"""
+    stubs = []
+
+    def start(**kwargs):
+        stub = StubLLM(**kwargs)
+        stubs.append(stub)
+        return stub
+
+    yield start
+    for stub in stubs:
+        stub.close()
+
+
+@pytest.fixture
+def refused_url():
+    """URL of a local port nothing listens on"""
+    import socket
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return f'http://127.0.0.1:{port}'
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.admission_control import AdmissionController, AdmissionRejected, PRIORITY_GENERATION
+
+MODEL = 'qwen3-4b'
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    """One slot per model, long queues"""
+    monkeypatch.setenv('LLM_MAX_CONCURRENCY', '1')
+    monkeypatch.setenv('LLM_INTERACTIVE_BURST', '0')
+    monkeypatch.setenv('LLM_MAX_QUEUE', '100')
+    monkeypatch.setenv('LLM_MAX_QUEUED_PER_USER', '100')
+    controller = AdmissionController()
+    controller._queue(MODEL).limit = 1
+    return controller
+
+
+def model_stats(controller):
+    return controller.get_stats()['models'][MODEL]
+
+
+def test_async_waiters_hold_no_threads_and_are_served_in_order(controller):
+    async def run():
+        held = await controller.aacquire(MODEL, 'u0')
+        threads = threading.active_count()
+        order = []
+
+        async def wait(i):
+            ticket = await controller.aacquire(MODEL, f'u{i}')
+            order.append(i)
+            await asyncio.sleep(0)
+            ticket.release()
+
+        tasks = [asyncio.ensure_future(wait(i)) for i in range(1, 41)]
+        await asyncio.sleep(0.05)
+        assert model_stats(controller)['waiting'] == 40
+        assert threading.active_count() == threads
+        held.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == list(range(1, 41))
+    assert model_stats(controller)['active'] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue(controller):
+    async def run():
+        held = await controller.aacquire(MODEL, 'a')
+        cancelled = asyncio.ensure_future(controller.aacquire(MODEL, 'b'))
+        following = asyncio.ensure_future(controller.aacquire(MODEL, 'c'))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.sleep(0.01)
+        assert model_stats(controller)['waiting'] == 1
+        held.release()
+        (await following).release()
+
+    asyncio.run(run())
+    assert model_stats(controller)['active'] == 0
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_given_back(controller):
+    async def run():
+        held = await controller.aacquire(MODEL, 'a')
+        waiter = asyncio.ensure_future(controller.aacquire(MODEL, 'b'))
+        await asyncio.sleep(0.01)
+        # The slot is handed to the waiter, which is cancelled before its loop delivers it
+        held.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert model_stats(controller)['active'] == 0
+
+
+def test_queue_timeout(controller):
+    async def run():
+        held = await controller.aacquire(MODEL, 'a')
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.aacquire(MODEL, 'b', timeout=0.05)
+        held.release()
+        return rejected.value
+
+    assert asyncio.run(run()).status_code == 503
+    stats = model_stats(controller)
+    assert stats['timeouts'] == 1 and stats['waiting'] == 0 and stats['active'] == 0
+
+
+def test_thread_and_async_waiters_share_the_queue(controller):
+    held = controller.acquire(MODEL, 'a')
+    admitted = []
+
+    def thread_waiter():
+        with controller.slot(MODEL, 'thread', timeout=5):
+            admitted.append('thread')
+
+    async def run():
+        worker = threading.Thread(target=thread_waiter)
+        worker.start()
+        await asyncio.sleep(0.05)
+        waiting = asyncio.ensure_future(controller.aacquire(MODEL, 'async', PRIORITY_GENERATION, timeout=5))
+        await asyncio.sleep(0.01)
+        held.release()
+        ticket = await waiting
+        admitted.append('async')
+        ticket.release()
+        await asyncio.to_thread(worker.join)
+
+    asyncio.run(run())
+    assert admitted == ['thread', 'async']
+    assert model_stats(controller)['active'] == 0
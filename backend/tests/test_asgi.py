@@ -0,0 +1,100 @@
+import json
+import time
+import asyncio
+
+import pytest
+
+from app.asgi import application
+from app.routes import chat
+from app.services.admission_control import admission_control
+from app.services.chat_stream_service import chat_stream_service
+from app.services.llm_router import llm_router
+from benchmarks.asgi_client import post_chat, sse_events
+
+
+async def call(body, disconnect_after=None):
+    reply = await post_chat(application, body, disconnect_after)
+    return reply['status'], reply['headers'], reply['chunks']
+
+
+@pytest.fixture
+def chat_app(monkeypatch, stub_llm):
+    """/chat answering general questions from a stub LLM streaming `tokens`"""
+    def start(tokens, token_delay=0.0):
+        stub = stub_llm(tokens=tokens, token_delay=token_delay)
+        monkeypatch.setenv('LLM_BACKENDS', json.dumps([{'name': 'stub', 'url': stub.url, 'models': None}]))
+        llm_router.reload()
+
+        async def classify(text):
+            return {'category': 'general', 'method': 'test', 'time_info': {}}
+        monkeypatch.setattr(chat.query_classifier, 'aclassify_query', classify)
+        return stub
+
+    yield start
+    monkeypatch.delenv('LLM_BACKENDS', raising=False)
+    llm_router.reload()
+
+
+def generation_active():
+    return sum(model['active'] for model in admission_control.get_stats()['models'].values())
+
+
+def test_chat_streams_typed_events(chat_app):
+    chat_app(['Xin ', 'chào ', 'bạn'])
+    status, headers, chunks = asyncio.run(call({'message': 'có nên bỏ học không', 'user_id': 'u1'}))
+
+    assert status == 200
+    assert headers['content-type'].startswith('text/event-stream')
+    assert 'access-control-allow-origin' in headers
+    frames = sse_events(chunks)
+    kinds = [kind for kind, _ in frames]
+    assert kinds[:2] == ['stream', 'metadata'] and kinds[-1] == 'done'
+    assert set(kinds[2:-1]) == {'content'}
+    assert ''.join(json.loads(data)['content'] for kind, data in frames if kind == 'content') == 'Xin chào bạn'
+    assert json.loads(frames[-1][1])['status'] == 'completed'
+    assert generation_active() == 0
+
+
+def test_invalid_body_is_rejected(chat_app):
+    chat_app(['unused'])
+    status, headers, chunks = asyncio.run(call(b'not json'))
+    assert status == 400
+    assert json.loads(''.join(chunks)) == {'error': 'Invalid JSON body'}
+
+
+def test_concurrent_streams_overlap(chat_app):
+    # 6 deltas 50 ms apart: about 0.3 s per answer
+    stub = chat_app(['một ', 'hai ', 'ba ', 'bốn ', 'năm ', 'sáu'], token_delay=0.05)
+
+    async def run():
+        started = time.perf_counter()
+        replies = await asyncio.gather(*(
+            call({'message': 'có nên bỏ học không', 'user_id': f'u{i}'}) for i in range(4)
+        ))
+        return replies, time.perf_counter() - started
+
+    replies, elapsed = asyncio.run(run())
+    for status, _, chunks in replies:
+        assert status == 200
+        assert sse_events(chunks)[-1][0] == 'done'
+    assert stub.max_active == 4
+    # Four streams in about the time of one, not 4 x 0.3 s
+    assert elapsed < 0.9
+
+
+def test_disconnect_cancels_the_generation(chat_app, monkeypatch):
+    monkeypatch.setattr(chat_stream_service, 'resume_grace', 0.1)
+    # 2 s answer
+    stub = chat_app(['tok '] * 40, token_delay=0.05)
+
+    started = time.perf_counter()
+    status, _, chunks = asyncio.run(call({'message': 'có nên bỏ học không', 'user_id': 'u1'}, disconnect_after=3))
+    assert status == 200 and len(chunks) == 3
+    assert time.perf_counter() - started < 1
+
+    # Nobody reattached within the grace period: upstream request closed, slot released
+    deadline = time.perf_counter() + 1.5
+    while (stub.active or generation_active()) and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    assert stub.active == 0 and generation_active() == 0
+    assert time.perf_counter() - started < 1.9
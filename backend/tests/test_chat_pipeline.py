@@ -0,0 +1,97 @@
+import json
+import uuid
+import asyncio
+import threading
+
+import pytest
+
+from app.routes import chat
+from app.services.llm_router import llm_router
+
+
+class FakeSession:
+    """PTITAuthService stand-in counting logins"""
+    logins = 0
+
+    def __init__(self):
+        self.access_token = None
+        self.username = None
+
+    def login(self, username, password):
+        FakeSession.logins += 1
+        self.access_token, self.username = 'token', username
+        return True, None
+
+
+@pytest.fixture
+def pipeline(monkeypatch, stub_llm):
+    """run_chat against a stub LLM, with a fixed classification and no PTIT network calls"""
+    stub = stub_llm(tokens=['Xin ', 'chào'])
+    monkeypatch.setenv('LLM_BACKENDS', json.dumps([{'name': 'stub', 'url': stub.url, 'models': None}]))
+    llm_router.reload()
+    FakeSession.logins = 0
+    monkeypatch.setattr(chat, 'PTITAuthService', FakeSession)
+
+    async def no_semester(chat_session_id, auth_service):
+        return None, False
+    monkeypatch.setattr(chat.ptit_api_service, 'get_current_semester_with_cache', no_semester)
+
+    def run(message, category, **data):
+        async def classify(text):
+            return {'category': category, 'method': 'test', 'time_info': {}}
+        monkeypatch.setattr(chat.query_classifier, 'aclassify_query', classify)
+
+        async def go():
+            body, status, _ = await chat.run_chat(dict({
+                'message': message,
+                'university_credentials': {'university_username': 'n21dccn001', 'university_password': 'x'}
+            }, **data), '127.0.0.1')
+            chunks = [chunk async for chunk in body]
+            await body.aclose()
+            return status, ''.join(str(c) for c in chunks)
+        return asyncio.run(go())
+
+    yield run
+    monkeypatch.delenv('LLM_BACKENDS')
+    llm_router.reload()
+
+
+def test_general_question_does_not_log_into_ptit(pipeline):
+    status, body = pipeline('có nên bỏ học không', 'general')
+    assert status == 200 and 'chào' in body
+    assert FakeSession.logins == 0
+
+
+@pytest.mark.parametrize('message', ['lịch học tuần sau', 'tuần tới có gì không'])
+def test_schedule_question_logs_in_once(pipeline, message):
+    pipeline(message, 'schedule')
+    assert FakeSession.logins == 1
+
+
+def test_messages_are_saved_off_the_event_loop(pipeline, monkeypatch):
+    saves = []
+
+    def save(chat_id, role, content, sources=None):
+        # Default executor of the loop (asyncio.to_thread), not a thread running an event loop
+        saves.append((role, threading.current_thread().name.startswith('asyncio_')))
+        return len(saves)
+    monkeypatch.setattr(chat.ai_service.web_search_service, 'save_message_with_sources_sync', save)
+
+    status, body = pipeline('có nên bỏ học không', 'general', chat_id=str(uuid.uuid4()))
+    assert status == 200
+    assert sorted(saves) == [('assistant', True), ('user', True)]
+
+
+def test_cache_lookup_embeds_off_the_event_loop(pipeline, monkeypatch):
+    threads = []
+
+    def embed_query(text):
+        threads.append(threading.current_thread().name)
+        return [1.0, 0.0, 0.0]
+    monkeypatch.setattr(chat.response_cache, 'enabled', True)
+    monkeypatch.setattr(chat.file_service, 'embed_query', embed_query)
+    monkeypatch.setattr(chat.response_cache, 'store', lambda *args, **kwargs: None)
+
+    status, body = pipeline('có nên bỏ học không', 'general')
+    assert status == 200 and 'chào' in body
+    assert len(threads) == 1 and threads[0].startswith('asyncio_')
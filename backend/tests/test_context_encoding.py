@@ -0,0 +1,37 @@
+from app.services import ai_service as ai_service_module
+from app.services.context_encoding import compare_encodings, encode_exam_table, encode_schedule_table
+from benchmarks.ptit_fixtures import SUBJECTS, exams, schedule_result
+
+
+def test_table_encoding_keeps_every_fact_in_fewer_tokens():
+    schedule_data = schedule_result()
+    table = encode_schedule_table(schedule_data)
+    for code, _, _, _, room, _, lecturer_code in SUBJECTS:
+        assert code in table and room in table and lecturer_code in table
+
+    result = compare_encodings('qwen3-4b', schedule_data=schedule_data)
+    assert result['model'] == 'qwen3-4b'
+    assert 0 < result['table_tokens'] < result['text_tokens']
+
+
+def test_exam_encoding():
+    exam_list = exams()
+    table = encode_exam_table(exam_list)
+    assert all(exam['ngay_thi'] in table and exam['ma_mon'] in table for exam in exam_list)
+    assert compare_encodings('qwen3-8b', exams=exam_list)['saving'] > 0
+
+
+def test_answers_use_the_requested_agent(monkeypatch):
+    calls = []
+
+    def chat_with_ai(self, message, messages=None, agent_id=None):
+        calls.append(agent_id)
+        # Mentions every subject code but no room or date
+        return ', '.join(code for code, *_ in SUBJECTS), messages
+
+    monkeypatch.setattr(ai_service_module.AiService, 'chat_with_ai', chat_with_ai)
+    result = compare_encodings('qwen3-1.7b', exams=exams(), question='Lịch thi của tôi?')
+
+    assert calls == ['qwen3-1.7b', 'qwen3-1.7b']
+    assert result['text_missing'] == result['table_missing'] == sorted(e['ngay_thi'] for e in exams())
+    assert result['same_facts']
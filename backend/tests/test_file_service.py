@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from app.services.embedding_registry import embedding_registry
+from app.services.file_service import FileService
+
+
+class FakeModel:
+    """sentence-transformers stand-in: one row per text, counts encode calls"""
+
+    def __init__(self, dimension, fail=False):
+        self.dimension = dimension
+        self.fail = fail
+        self.calls = []
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        if self.fail:
+            raise RuntimeError('encode failed')
+        self.calls.append(texts)
+        if isinstance(texts, str):
+            return np.full(self.dimension, len(texts), dtype=np.float32)
+        return np.asarray([np.full(self.dimension, len(t), dtype=np.float32) for t in texts])
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Register a fake model in the shared registry and return a FileService using it"""
+    def register(dimension, fail=False):
+        name = f'fake-{dimension}'
+        model = FakeModel(dimension, fail)
+        monkeypatch.setitem(embedding_registry._models, name, model)
+        monkeypatch.setitem(embedding_registry._stats, name, {'model': name, 'dimension': dimension})
+        return FileService(name), model
+    return register
+
+
+def test_embedding_dimension_follows_the_model(fake_model):
+    service, _ = fake_model(768)
+    assert service.embedding_dimension == 768
+    assert service._create_embeddings([]).shape == (0, 768)
+
+
+def test_failed_encode_falls_back_to_zeros_of_the_model_dimension(fake_model):
+    service, _ = fake_model(768, fail=True)
+    assert service._create_embedding('lịch thi') == [0.0] * 768
+
+
+class FakeTable:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def insert(self, records):
+        self.rows.extend(records)
+        return self
+
+    def update(self, values):
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def execute(self):
+        return self
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.rows = []
+
+    def table(self, name):
+        return FakeTable(self.rows if name == 'file_chunks' else [])
+
+
+@pytest.fixture
+def fake_supabase(monkeypatch):
+    from app.services import file_service as file_service_module
+    from app.services.vector_index_service import vector_index_service
+
+    fake = FakeSupabase()
+    monkeypatch.setattr(file_service_module, 'supabase', fake)
+    monkeypatch.setattr(vector_index_service, 'is_enabled', lambda: False)
+    return fake
+
+
+def test_create_embeddings_returns_a_float32_matrix_in_one_call(fake_model):
+    service, model = fake_model(8)
+    matrix = service._create_embeddings(['một đoạn văn', '', 'đoạn thứ ba'], batch_size=16)
+
+    assert matrix.dtype == np.float32 and matrix.shape == (3, 8)
+    assert len(model.calls) == 1
+    # Same placeholder as _create_embedding for empty text
+    assert model.calls[0][1] == 'empty document'
+
+
+def test_ingest_encodes_one_batch_at_a_time(fake_model, fake_supabase):
+    service, model = fake_model(8)
+    progress = []
+    # 400 characters per step: 52 chunks
+    total = service.process_file_chunks('f1', 'x' * 20800, batch_size=16, progress_callback=lambda *p: progress.append(p))
+
+    assert total == 52
+    assert [len(call) for call in model.calls] == [16, 16, 16, 4]
+    assert progress == [(0, 52), (16, 52), (32, 52), (48, 52), (52, 52)]
+    assert [row['chunk_index'] for row in fake_supabase.rows] == list(range(52))
+    assert all(len(row['embedding']) == 8 for row in fake_supabase.rows)
+
+
+def test_batch_failure_falls_back_to_per_chunk_encoding(fake_model):
+    service, model = fake_model(8)
+
+    def encode(texts, **kwargs):
+        if isinstance(texts, list):
+            raise RuntimeError('batch too large')
+        return np.ones(8, dtype=np.float32)
+
+    model.encode = encode
+    assert service._create_embeddings(['a chunk', 'another chunk']).tolist() == [[1.0] * 8, [1.0] * 8]
@@ -0,0 +1,92 @@
+import io
+import time
+import uuid
+
+import pytest
+
+from app import create_app
+from app.routes import file_routes
+from app.services.ingestion_service import ingestion_service
+
+
+class FakeFileService:
+    """Ingest without Supabase or an embedding model"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def create_file_record(self, user_id, filename, content_type, size, space_id=None):
+        return str(uuid.uuid4())
+
+    def extract_text_content(self, raw_bytes, content_type):
+        return raw_bytes.decode('utf-8')
+
+    def process_file_chunks(self, file_id, content, progress_callback=None):
+        if self.fail:
+            raise ValueError('no text could be extracted')
+        for done in range(1, 4):
+            progress_callback(done, 3)
+
+    def update_file_status(self, file_id, status):
+        pass
+
+    def delete_file_chunks(self, file_id):
+        pass
+
+
+class EmptyTable:
+    """supabase.table(...) stand-in that finds nothing"""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        return type('Result', (), {'data': []})()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(ingestion_service, 'max_retries', 0)
+    monkeypatch.setattr(ingestion_service, 'retry_backoff', 0)
+    monkeypatch.setattr(file_routes.supabase, 'table', lambda name: EmptyTable())
+    return create_app().test_client()
+
+
+def upload(client, monkeypatch, user_id='user-a', fail=False):
+    monkeypatch.setattr(ingestion_service, 'file_service', FakeFileService(fail))
+    response = client.post('/file/upload', data={
+        'user_id': user_id,
+        'file': (io.BytesIO('Nội dung'.encode('utf-8')), 'notes.txt', 'text/plain')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 202
+    return response.get_json()['file_id']
+
+
+def wait_status(client, file_id, user_id='user-a'):
+    for _ in range(100):
+        body = client.get(f'/file/status/{file_id}?user_id={user_id}').get_json()
+        if body['status'] != 'processing':
+            return body
+        time.sleep(0.02)
+    raise AssertionError('ingest did not finish')
+
+
+def test_status_reports_ready_to_the_owner(client, monkeypatch):
+    file_id = upload(client, monkeypatch)
+    status = wait_status(client, file_id)
+    assert status['status'] == 'ready'
+    assert status['chunks_done'] == status['chunks_total'] == 3
+
+
+def test_status_reports_failed_ingest_with_its_error(client, monkeypatch):
+    file_id = upload(client, monkeypatch, fail=True)
+    status = wait_status(client, file_id)
+    assert status['status'] == 'failed'
+    assert 'no text' in status['error']
+
+
+def test_status_is_only_visible_to_the_owner(client, monkeypatch):
+    file_id = upload(client, monkeypatch)
+    wait_status(client, file_id)
+    assert client.get(f'/file/status/{file_id}?user_id=user-b').status_code == 404
+    assert client.get(f'/file/status/{file_id}').status_code == 400
@@ -0,0 +1,41 @@
+from flask import request, jsonify
+
+from app import create_app
+from app.lib.http_client import http_clients
+
+
+def make_app(stub):
+    app = create_app()
+
+    @app.route('/_upstream')
+    async def upstream():
+        client = http_clients.get_async_client('default')
+        response = await client.get(stub.url + '/v1/models')
+        # The request context is available on the shared loop
+        return jsonify({'client': id(client), 'status': response.status_code, 'q': request.args.get('q')})
+
+    return app.test_client()
+
+
+def test_async_views_reuse_one_client_and_connection(stub_llm):
+    stub = stub_llm()
+    client = make_app(stub)
+
+    replies = [client.get(f'/_upstream?q={i}').get_json() for i in range(5)]
+
+    assert [r['q'] for r in replies] == [str(i) for i in range(5)]
+    assert len({r['client'] for r in replies}) == 1
+    # Keep-alive: the five upstream requests went over one pooled connection
+    assert stub.requests == 0 and len(stub.peers) == 1
+
+
+def test_async_views_do_not_leak_a_client_per_request(stub_llm):
+    stub = stub_llm()
+    client = make_app(stub)
+    client.get('/_upstream')
+    loops = len(http_clients._async_clients)
+
+    for _ in range(10):
+        client.get('/_upstream')
+
+    assert len(http_clients._async_clients) == loops
@@ -0,0 +1,133 @@
+import json
+import asyncio
+
+import pytest
+
+from app.services.llm_router import LLMRouter
+
+
+def make_router(monkeypatch, *backends, threshold=3):
+    monkeypatch.setenv('LLM_BACKENDS', json.dumps([
+        {'name': name, 'url': url, 'models': ['qwen3-4b']} for name, url in backends
+    ]))
+    monkeypatch.setenv('LLM_FAILURE_THRESHOLD', str(threshold))
+    return LLMRouter()
+
+
+def backend_state(router, name):
+    return next(b for b in router.get_stats()['backends'] if b['name'] == name)
+
+
+PAYLOAD = {'model': 'qwen3-4b', 'messages': [{'role': 'user', 'content': 'xin chào'}]}
+
+
+def test_post_fails_over_from_5xx(monkeypatch, stub_llm):
+    failing, healthy = stub_llm(status=503), stub_llm()
+    router = make_router(monkeypatch, ('failing', failing.url), ('healthy', healthy.url))
+    # Make the failing backend rank first
+    router._backends['healthy'].in_flight = 5
+
+    response = router.post(PAYLOAD)
+
+    assert response.status_code == 200
+    assert failing.requests == 1 and healthy.requests == 1
+
+
+def test_post_fails_over_from_refused_connection(monkeypatch, stub_llm, refused_url):
+    healthy = stub_llm()
+    router = make_router(monkeypatch, ('down', refused_url), ('healthy', healthy.url))
+    router._backends['healthy'].in_flight = 5
+
+    assert router.post(PAYLOAD).status_code == 200
+    assert backend_state(router, 'down')['failures'] == 1
+
+
+def test_single_5xx_keeps_backend_in_rotation(monkeypatch, stub_llm):
+    failing, healthy = stub_llm(status=500), stub_llm()
+    router = make_router(monkeypatch, ('failing', failing.url), ('healthy', healthy.url), threshold=3)
+    router._backends['healthy'].in_flight = 5
+
+    router.post(PAYLOAD)
+
+    state = backend_state(router, 'failing')
+    assert state['healthy'] is True
+    assert state['consecutive_failures'] == 1
+
+
+def test_threshold_marks_backend_down_and_success_restores_it(monkeypatch, stub_llm):
+    flaky, healthy = stub_llm(status=502), stub_llm()
+    router = make_router(monkeypatch, ('flaky', flaky.url), ('healthy', healthy.url), threshold=2)
+
+    for _ in range(2):
+        router._backends['healthy'].in_flight = 5
+        router.post(PAYLOAD)
+    assert backend_state(router, 'flaky')['healthy'] is False
+    # Down backends are ranked after the healthy ones
+    router._backends['healthy'].in_flight = 0
+    assert [b.name for b in router.candidates('qwen3-4b')] == ['healthy', 'flaky']
+
+    flaky.status = 200
+    router._backends['healthy'].in_flight = 50
+    router._backends['flaky'].healthy = True
+    router.post(PAYLOAD)
+    state = backend_state(router, 'flaky')
+    assert state['healthy'] is True and state['consecutive_failures'] == 0
+
+
+def test_all_backends_failing_raises_last_error(monkeypatch, stub_llm, refused_url):
+    failing = stub_llm(status=503)
+    router = make_router(monkeypatch, ('down', refused_url), ('failing', failing.url))
+    with pytest.raises(Exception):
+        router.post(PAYLOAD)
+
+
+def test_stream_fails_over_before_first_chunk(monkeypatch, stub_llm):
+    failing, healthy = stub_llm(status=503), stub_llm(tokens=['a', 'b', 'c'])
+    router = make_router(monkeypatch, ('failing', failing.url), ('healthy', healthy.url))
+    router._backends['healthy'].in_flight = 5
+
+    with router.stream({**PAYLOAD, 'stream': True}) as r:
+        assert r.backend.name == 'healthy'
+        lines = [line for line in r.iter_lines() if line.startswith('data: ')]
+
+    assert len(lines) == 4  # three deltas and [DONE]
+
+
+def test_astream_fails_over_before_first_chunk(monkeypatch, stub_llm, refused_url):
+    healthy = stub_llm(tokens=['a', 'b'])
+    router = make_router(monkeypatch, ('down', refused_url), ('healthy', healthy.url))
+    router._backends['healthy'].in_flight = 5
+
+    async def read():
+        async with router.astream({**PAYLOAD, 'stream': True}) as r:
+            return r.backend.name, [line async for line in r.aiter_lines() if line]
+
+    name, lines = asyncio.run(read())
+    assert name == 'healthy'
+    assert lines[-1] == 'data: [DONE]'
+
+
+def test_reload_applies_config_only(monkeypatch, stub_llm, tmp_path):
+    first, second = stub_llm(), stub_llm()
+    router = make_router(monkeypatch, ('first', first.url))
+    router._backends['first'].requests = 7
+
+    config = tmp_path / 'backends.json'
+    config.write_text(json.dumps([
+        {'name': 'first', 'url': first.url, 'models': ['qwen3-4b']},
+        {'name': 'second', 'url': second.url, 'models': ['qwen3-4b']}
+    ]))
+    monkeypatch.setenv('LLM_BACKENDS_FILE', str(config))
+    assert router.reload() == {'added': ['second'], 'removed': []}
+    # Unchanged backends keep their figures
+    assert backend_state(router, 'first')['requests'] == 7
+
+    config.write_text(json.dumps([{'name': 'second', 'url': second.url, 'models': ['qwen3-4b']}]))
+    assert router.reload() == {'added': [], 'removed': ['first']}
+
+
+def test_backends_cannot_be_changed_over_http():
+    from app import create_app
+    client = create_app().test_client()
+    assert client.post('/api/llm/backends', json={'name': 'x', 'url': 'http://evil.example'}).status_code == 405
+    assert client.delete('/api/llm/backends/lmstudio-1').status_code in (404, 405)
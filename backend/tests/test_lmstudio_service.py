@@ -0,0 +1,93 @@
+import json
+import time
+import asyncio
+
+import pytest
+
+from app.services import lmstudio_service
+from app.services.admission_control import admission_control
+from app.services.llm_router import llm_router
+
+
+@pytest.fixture
+def lmstudio(monkeypatch, stub_llm):
+    """Route LM Studio calls to a stub answering with the given JSON after `delay` seconds"""
+    def start(answer, delay=0.0):
+        models = [lmstudio_service.CLASSIFIER_MODEL, lmstudio_service.TIME_PARSER_MODEL]
+        stub = stub_llm(tokens=[json.dumps(answer)], models=models, delay=delay)
+        monkeypatch.setenv('LLM_BACKENDS', json.dumps([{'name': 'stub', 'url': stub.url, 'models': None}]))
+        llm_router.reload()
+        return stub
+
+    yield start
+    monkeypatch.delenv('LLM_BACKENDS', raising=False)
+    llm_router.reload()
+
+
+def active(model):
+    return admission_control.get_stats()['models'].get(model, {}).get('active', 0)
+
+
+def test_async_calls_return_the_parsed_json(lmstudio):
+    lmstudio({'type': 'day', 'value': ['Tuesday', 'next_week']})
+    assert asyncio.run(lmstudio_service.aparse_time_lmstudio('thu3 tuan sau hc gi')) == {
+        'type': 'day', 'value': ['Tuesday', 'next_week']
+    }
+
+
+def test_sync_wrappers_still_work(lmstudio):
+    lmstudio({'type': 'schedule'})
+    assert lmstudio_service.classify_query_lmstudio('hnay hc gi') == {'type': 'schedule'}
+
+
+def test_errors_are_returned_not_raised(lmstudio):
+    lmstudio({'type': 'schedule'}).status = 500
+    assert 'error' in asyncio.run(lmstudio_service.aclassify_query_lmstudio('hnay hc gi'))
+
+
+def test_concurrent_calls_overlap_without_blocking_the_loop(lmstudio):
+    # 6 calls fit in the interactive slots (4 + burst 2) of the default admission limits
+    stub = lmstudio({'type': 'schedule'}, delay=0.3)
+
+    async def run():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.ensure_future(heartbeat())
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            lmstudio_service.aclassify_query_lmstudio(f'câu hỏi {i}') for i in range(6)
+        ))
+        elapsed = time.perf_counter() - started
+        beat.cancel()
+        return results, elapsed, ticks
+
+    results, elapsed, ticks = asyncio.run(run())
+    assert results == [{'type': 'schedule'}] * 6
+    assert stub.max_active == 6
+    # About one stub latency instead of six, and the loop kept running meanwhile
+    assert elapsed < 0.9
+    assert ticks >= 15
+
+
+def test_cancellation_aborts_the_call_and_frees_the_slot(lmstudio):
+    lmstudio({'type': 'schedule'}, delay=3)
+    model = lmstudio_service.CLASSIFIER_MODEL
+
+    async def run():
+        task = asyncio.ensure_future(lmstudio_service.aclassify_query_lmstudio('hnay hc gi'))
+        await asyncio.sleep(0.1)
+        assert active(model) == 1
+        started = time.perf_counter()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return time.perf_counter() - started
+
+    assert asyncio.run(run()) < 0.5
+    assert active(model) == 0
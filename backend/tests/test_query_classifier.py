@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.config.classifier_examples import BENCHMARK_EXAMPLES
+from app.services import query_classifier as query_classifier_module
+from app.services.query_classifier import QueryClassifier
+
+HARD_NEGATIVES = [
+    'hôm nay học lập trình python thế nào cho hiệu quả',
+    'mai em thi rồi mà chưa học gì, lo quá',
+    'em nên học môn gì kỳ sau',
+    'cn là gì trong hóa học',
+]
+
+
+@pytest.fixture
+def classifier(monkeypatch):
+    """Classifier without the kNN tier, whose LLM tier answers `llm_answer`"""
+    classifier = QueryClassifier()
+    classifier._knn_available = False
+    answer = {'type': 'general'}
+
+    def llm(text):
+        return dict(answer)
+
+    async def allm(text):
+        return dict(answer)
+
+    monkeypatch.setattr(query_classifier_module, 'classify_query_lmstudio', llm)
+    monkeypatch.setattr(query_classifier_module, 'aclassify_query_lmstudio', allm)
+    classifier.llm_answer = answer
+    return classifier
+
+
+@pytest.mark.parametrize('text', HARD_NEGATIVES)
+def test_study_questions_are_not_confident_schedule_matches(classifier, text):
+    rules = classifier._classify_rules(text)
+    assert rules is None or rules['confidence'] < 1.0
+    assert classifier.rules_category(text) is None
+    result = classifier.classify_query(text)
+    assert (result['category'], result['method']) == ('general', 'lmstudio')
+    assert asyncio.run(classifier.aclassify_query(text))['category'] == 'general'
+
+
+@pytest.mark.parametrize('text', [
+    'hnay hc j', 'Ngày mai học môn gì?', 'thu3 tuan sau hc mon gi', 'Sáng mai có học không?',
+    'tkb tuần này', 'Hôm nay có tiết nào không?', 'Chiều nay học phòng nào?',
+])
+def test_timetable_questions_stay_on_the_rules_tier(classifier, text):
+    result = classifier.classify_query(text)
+    assert (result['category'], result['method'], result['confidence']) == ('schedule', 'rules', 1.0)
+
+
+def test_hint_is_used_when_the_llm_fails(classifier):
+    classifier.llm_answer.clear()
+    classifier.llm_answer['error'] = 'connection refused'
+    result = classifier.classify_query('Tuần này có môn nào học buổi sáng?')
+    assert (result['category'], result['method']) == ('schedule', 'rules-hint')
+    assert classifier.classify_query('Giải thích khái niệm đệ quy')['method'] == 'lmstudio-error'
+
+
+def test_evaluate_rules_tier_is_never_wrong(classifier):
+    report = classifier.evaluate(use_llm=False)
+    assert report['examples'] == len(BENCHMARK_EXAMPLES)
+    # Confident rule answers must be right, everything else goes to the later tiers
+    assert report['tiers']['rules']['accuracy'] == 1.0
+    assert report['tiers']['rules']['coverage'] >= 0.5
+
+
+def test_evaluate_with_the_llm_tier(classifier):
+    report = classifier.evaluate([('em nên học môn gì kỳ sau', 'general'), ('tkb tuần này', 'schedule')])
+    assert report['accuracy'] == 1.0
+    assert set(report['tiers']) == {'rules', 'lmstudio'}
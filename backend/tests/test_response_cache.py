@@ -0,0 +1,58 @@
+import numpy as np
+
+from app.services.response_cache_service import SemanticResponseCache, normalize_question
+
+
+def make_cache():
+    cache = SemanticResponseCache()
+    cache.enabled = True
+    return cache
+
+
+def vector(*values):
+    return np.asarray(values, dtype=np.float32)
+
+
+def test_general_answers_are_not_shared_between_users():
+    cache = make_cache()
+    alice = cache.build_fingerprint('qwen3-4b', 'general', user_key='alice')
+    bob = cache.build_fingerprint('qwen3-4b', 'general', user_key='bob')
+    assert alice != bob
+
+    cache.store(alice, vector(1, 0), 'Câu trả lời của Alice', 'general', question='Tôi nên học gì?')
+    assert cache.lookup(bob, vector(1, 0), 'Tôi nên học gì?') is None
+    assert cache.lookup(alice, vector(1, 0), 'Tôi nên học gì?')['answer'] == 'Câu trả lời của Alice'
+
+
+def test_shared_category_only_reuses_the_exact_question():
+    cache = make_cache()
+    assert cache.build_fingerprint('qwen3-4b', 'uml', user_key='alice') == \
+        cache.build_fingerprint('qwen3-4b', 'uml', user_key='bob')
+    fingerprint = cache.build_fingerprint('qwen3-4b', 'uml', user_key='alice')
+
+    cache.store(fingerprint, vector(1, 0), 'Sơ đồ lớp...', 'uml', question='Sơ đồ lớp là gì?')
+    # Same embedding, different question: not reused across users
+    assert cache.lookup(fingerprint, vector(1, 0), 'Sơ đồ tuần tự là gì?') is None
+    assert cache.lookup(fingerprint, vector(0.2, 1), '  sơ đồ lớp   là gì  ')['answer'] == 'Sơ đồ lớp...'
+
+
+def test_shared_category_in_a_space_is_scoped_to_the_user():
+    cache = make_cache()
+    assert cache.build_fingerprint('qwen3-4b', 'uml', space_id='s1', user_key='alice') != \
+        cache.build_fingerprint('qwen3-4b', 'uml', space_id='s1', user_key='bob')
+
+
+def test_paraphrase_must_reach_the_threshold():
+    cache = make_cache()
+    fingerprint = cache.build_fingerprint('qwen3-4b', 'general', user_key='alice')
+    cache.store(fingerprint, vector(1, 0), 'answer', 'general', question='a')
+
+    close = vector(1, 0.1)  # cosine ~0.995
+    far = vector(1, 0.35)   # cosine ~0.944, was a hit at the old 0.92 threshold
+    assert cache.lookup(fingerprint, far, 'b') is None
+    assert cache.lookup(fingerprint, close, 'b')['answer'] == 'answer'
+
+
+def test_normalize_question_keeps_tone_marks():
+    assert normalize_question('  Lịch  THI   môn Toán?? ') == 'lịch thi môn toán'
+    assert normalize_question('lich thi mon toan') != normalize_question('lịch thi môn toán')
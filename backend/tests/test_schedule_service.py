@@ -0,0 +1,83 @@
+import asyncio
+from datetime import date, timedelta
+
+from app.services.ptit_auth_service import PTITAuthService
+from app.services.schedule_service import ScheduleService
+
+
+def session(username):
+    auth = PTITAuthService()
+    auth.username = username
+    auth.access_token = f'token-{username}'
+    return auth
+
+
+def semester_payload(subject):
+    """w-locdstkbtuanusertheohocky payload with one class a day during the current week"""
+    monday = date.today() - timedelta(days=date.today().weekday())
+    classes = [{
+        'ngay_hoc': (monday + timedelta(days=i)).strftime('%Y-%m-%dT00:00:00'),
+        'tiet_bat_dau': 1,
+        'so_tiet': 3,
+        'ma_mon': subject,
+        'ten_mon': f'Môn {subject}',
+        'ma_phong': '2B21',
+        'ten_giang_vien': 'Nguyễn Văn A',
+        'thu_kieu_so': i + 2
+    } for i in range(7)]
+    return {'data': {'ds_tuan_tkb': [{
+        'ngay_bat_dau': monday.strftime('%d/%m/%Y'),
+        'ngay_ket_thuc': (monday + timedelta(days=6)).strftime('%d/%m/%Y'),
+        'ds_thoi_khoa_bieu': classes
+    }]}}
+
+
+def counting_service():
+    """ScheduleService whose PTIT call returns the timetable of the token's owner"""
+    service = ScheduleService()
+    calls = []
+
+    async def get_schedule_by_semester(hoc_ky, auth_service=None):
+        calls.append(auth_service.access_token)
+        await asyncio.sleep(0.01)
+        return semester_payload(auth_service.username.upper())
+
+    service.get_schedule_by_semester = get_schedule_by_semester
+    return service, calls
+
+
+def subjects_of(result):
+    return {c['ma_mon'] for day in result['all_schedules']['daily_schedules'] for c in day['classes']}
+
+
+def test_week_query_fetches_the_timetable_once():
+    service, calls = counting_service()
+    alice = session('alice')
+
+    async def run():
+        for value in ('current_week', ['Monday', 'current_week'], 'today'):
+            kind = 'day' if value == 'today' else 'week'
+            await service.process_schedule_query({'type': kind, 'value': value}, '20241', alice)
+
+    asyncio.run(run())
+    assert calls == ['token-alice']
+
+
+def test_concurrent_users_get_their_own_timetable():
+    service, calls = counting_service()
+    week = {'type': 'week', 'value': 'current_week'}
+
+    async def run():
+        return await asyncio.gather(*(
+            service.process_schedule_query(week, '20241', session(name)) for name in ('alice', 'bob') * 3
+        ))
+
+    results = asyncio.run(run())
+    assert [subjects_of(r) for r in results] == [{'ALICE'}, {'BOB'}] * 3
+    assert sorted(set(calls)) == ['token-alice', 'token-bob']
+
+    # A new login of the same student reuses the cached timetable
+    relogin = session('alice')
+    relogin.access_token = 'token-alice-2'
+    asyncio.run(service.process_schedule_query(week, '20241', relogin))
+    assert 'token-alice-2' not in calls
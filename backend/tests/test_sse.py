@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from app.utils.sse import StreamEvent, coalesce, format_event, parse_last_event_id
+
+
+async def deltas(items, interval=0.0, error=None, closed=None):
+    """Upstream of text deltas and StreamEvents, `interval` seconds apart"""
+    try:
+        for item in items:
+            yield item
+            await asyncio.sleep(interval)
+        if error:
+            raise error
+    finally:
+        if closed is not None:
+            closed.append(True)
+
+
+def collect(chunks, window_ms, max_bytes=512):
+    async def run():
+        return [item async for item in coalesce(chunks, window_ms, max_bytes)]
+    return asyncio.run(run())
+
+
+def test_format_event_frames():
+    assert format_event({'content': 'chào'}, event='content', event_id=3) == (
+        'id: 3\nevent: content\ndata: {"content": "chào"}\n\n'
+    )
+    # Multi-line data is one data field per line
+    assert format_event('a\nb') == 'data: a\ndata: b\n\n'
+
+
+@pytest.mark.parametrize('value, offset', [('12', 12), (' 7 ', 7), (None, 0), ('abc', 0), ('-4', 0)])
+def test_parse_last_event_id(value, offset):
+    assert parse_last_event_id(value) == offset
+
+
+def test_window_zero_passes_deltas_through():
+    assert collect(deltas(['a', 'b', 'c']), 0) == ['a', 'b', 'c']
+
+
+def test_first_delta_is_sent_at_once_and_the_rest_merged():
+    items = [f'{i} ' for i in range(20)]
+    chunks = collect(deltas(items, interval=0.001), 200)
+    assert chunks[0] == '0 '
+    assert ''.join(chunks) == ''.join(items)
+    assert len(chunks) <= 3
+
+
+def test_window_bounds_the_added_latency():
+    # 10 deltas 20 ms apart with a 30 ms window: flushed every one or two deltas
+    chunks = collect(deltas(list('abcdefghij'), interval=0.02), 30)
+    assert ''.join(chunks) == 'abcdefghij'
+    assert 3 <= len(chunks) <= 8
+
+
+def test_max_bytes_flushes_early():
+    chunks = collect(deltas(['đ' * 4] * 9), 10_000, max_bytes=16)
+    # 'đ' is 2 bytes: two held deltas reach 16 bytes
+    assert chunks == ['đđđđ'] + ['đ' * 8] * 4
+
+
+def test_events_flush_held_text_in_order():
+    sources = StreamEvent('sources', {'sources': []})
+    done = StreamEvent('done', {'status': 'completed'})
+    chunks = collect(deltas(['Xin', ' ', 'chào', sources, ' bạn', done]), 10_000)
+    assert chunks == ['Xin', ' chào', sources, ' bạn', done]
+
+
+def test_upstream_error_is_raised_after_the_held_text():
+    received = []
+
+    async def run():
+        async for item in coalesce(deltas(['a', 'b', 'c'], error=RuntimeError('upstream')), 10_000, 512):
+            received.append(item)
+
+    with pytest.raises(RuntimeError, match='upstream'):
+        asyncio.run(run())
+    assert received == ['a', 'bc']
+
+
+def test_closing_the_coalescer_closes_the_upstream():
+    closed = []
+
+    async def run():
+        events = coalesce(deltas(['x'] * 1000, interval=0.01, closed=closed), 50, 512)
+        assert await events.__anext__() == 'x'
+        await events.aclose()
+
+    asyncio.run(run())
+    assert closed == [True]
+
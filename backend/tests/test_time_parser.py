@@ -0,0 +1,43 @@
+import json
+import re
+
+import pytest
+
+from app.services.lmstudio_service import TIME_PARSER_SYSTEM_PROMPT
+from app.services.time_parser import parse_time_rules
+
+# (question, Vietnamese spelling, expected output) of every example in the LLM prompt
+PROMPT_EXAMPLES = re.findall(
+    r'User: "(.+?)" \((.+?)\)\s*\nOutput: (\{.+?\})\n', TIME_PARSER_SYSTEM_PROMPT
+)
+
+
+def test_prompt_examples_were_found():
+    assert len(PROMPT_EXAMPLES) >= 14
+
+
+@pytest.mark.parametrize('question,vietnamese,output', PROMPT_EXAMPLES, ids=[e[0] for e in PROMPT_EXAMPLES])
+def test_rules_match_the_llm_examples(question, vietnamese, output):
+    expected = json.loads(output)
+    assert parse_time_rules(question) == expected
+    # Same answer with diacritics
+    assert parse_time_rules(vietnamese) == expected
+
+
+@pytest.mark.parametrize('question,expected', [
+    ('t2 hc gi', {'type': 'day', 'value': 'Monday'}),
+    ('chu nhat tuan sau co hoc khong', {'type': 'day', 'value': ['Sunday', 'next_week']}),
+    ('hnay hc mon j', {'type': 'day', 'value': 'today'}),
+    ('hôm qua học môn gì', {'type': 'day', 'value': 'yesterday'}),
+    ('lịch học ngày 5', {'type': 'day', 'value': '5'}),
+    ('lich hoc 3/4', {'type': 'day', 'value': '03/04'}),
+    ('học kỳ này có mấy môn', {'type': 'far_time', 'value': 'none'}),
+])
+def test_mapping_table(question, expected):
+    assert parse_time_rules(question) == expected
+
+
+@pytest.mark.parametrize('question', ['môn học gì vậy', 'có nên bỏ học không', ''])
+def test_no_time_expression_falls_back_to_the_llm(question):
+    # "môn" is a subject, never Monday
+    assert parse_time_rules(question) is None
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from app.services import vector_index_service as vector_index_module
+from app.services.vector_index_service import FileVectorIndex, VectorIndexService
+
+
+def clustered(n, dim=64, clusters=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def exact_top(embeddings, query, k):
+    normed = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return set(np.argsort(-(normed @ (query / np.linalg.norm(query))))[:k])
+
+
+def test_ivf_recall_at_10(monkeypatch):
+    monkeypatch.setattr(vector_index_module, 'IVF_MIN_VECTORS', 1000)
+    embeddings = clustered(5000)
+    index = FileVectorIndex.build('f', embeddings, [str(i) for i in range(len(embeddings))])
+    assert index.centroids is not None
+
+    queries = clustered(50, seed=1)
+    hits = 0
+    for query in queries:
+        found = {int(content) for _, content in index.search(query, top_k=10, match_threshold=-1)}
+        hits += len(found & exact_top(embeddings, query, 10))
+    assert hits / (10 * len(queries)) >= 0.9
+
+
+def test_search_with_empty_probed_lists_returns_nothing():
+    embeddings = np.array([[1, 0], [0.9, 0.1], [0.95, 0.05], [1, 0.02]], dtype=np.float32)
+    centroids = np.array([[1, 0], [0, 1]], dtype=np.float32)
+    # Every vector is in the first cluster, the query only probes the second
+    index = FileVectorIndex('f', embeddings, list('abcd'), centroids, np.zeros(4, dtype=np.int32))
+    assert index.search([0, 1], top_k=3, match_threshold=-1, nprobe=1) == []
+
+
+class ChunkTable:
+    """supabase.table() stand-in: user_files status and file_chunks rows"""
+
+    def __init__(self, status, rows):
+        self.status, self.rows, self.name = status, rows, None
+
+    def __call__(self, name):
+        self.name = name
+        return self
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        data = [{'status': self.status}] if self.name == 'user_files' else self.rows
+        return type('Result', (), {'data': data})()
+
+
+def chunk_rows(n):
+    return [{'chunk_index': i, 'content': f'c{i}', 'embedding': [1.0, float(i)]} for i in range(n)]
+
+
+@pytest.fixture
+def service(tmp_path):
+    return VectorIndexService(index_dir=str(tmp_path))
+
+
+def test_index_is_not_cached_while_ingest_is_running(monkeypatch, service):
+    table = ChunkTable('processing', chunk_rows(2))
+    monkeypatch.setattr(vector_index_module.supabase, 'table', table)
+
+    assert len(service.get_index('f1').contents) == 2
+    assert 'f1' not in service._indexes
+
+    table.status, table.rows = 'ready', chunk_rows(5)
+    assert len(service.get_index('f1').contents) == 5
+    assert 'f1' in service._indexes
+
+
+def test_file_without_chunks_is_not_cached(monkeypatch, service):
+    monkeypatch.setattr(vector_index_module.supabase, 'table', ChunkTable('ready', []))
+    assert service.search([1.0, 0.0], 'f2') == []
+    assert 'f2' not in service._indexes
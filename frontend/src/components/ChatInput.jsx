@@ -15,6 +15,7 @@ import {
   TooltipProvider,
   TooltipTrigger,
 } from "./ui/tooltip";
+import { waitForIngest, formatIngestProgress } from "../lib/fileStatus";
 
 const ChatInput = ({
   onSendMessage,
@@ -142,6 +143,12 @@ const ChatInput = ({
 
         const data = await response.json();
 
+        // Accepted: chat can only use the file once its chunks are embedded
+        setUploadStatus(`Đang xử lý ${file.name}...`);
+        await waitForIngest(data.file_id, userId, (status) =>
+          setUploadStatus(`Đang xử lý ${file.name}... ${formatIngestProgress(status)}`)
+        );
+
         // Call the onFileUpload callback with file ID and name
         if (onFileUpload && data.file_id) {
           onFileUpload(data.file_id, file.name);
@@ -258,6 +265,11 @@ const ChatInput = ({
 
             const data = await response.json();
 
+            setUploadStatus(`Đang xử lý ${file.name}...`);
+            await waitForIngest(data.file_id, userId, (status) =>
+              setUploadStatus(`Đang xử lý ${file.name}... ${formatIngestProgress(status)}`)
+            );
+
             // Call the onFileUpload callback with file ID and name
             if (onFileUpload && data.file_id) {
               onFileUpload(data.file_id, file.name);
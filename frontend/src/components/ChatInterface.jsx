@@ -1,6 +1,8 @@
 import { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import { supabase } from "../lib/supabase";
+import { readSSE } from "../lib/sse";
+import { waitForIngest, formatIngestProgress } from "../lib/fileStatus";
 import MessageItem from "./MessageItem";
 import ChatInput from "./ChatInput";
 import Settings from "./Settings";
@@ -36,6 +38,9 @@ import {
 import { Textarea } from "./ui/textarea";
 import { Button } from "./ui/button";
 
+// Reconnect attempts when the answer stream drops before its "done" event
+const MAX_STREAM_RESUMES = 5;
+
 const ChatInterface = () => {
   const navigate = useNavigate();
   const { theme } = useTheme();
@@ -404,14 +409,30 @@ const ChatInterface = () => {
           body: JSON.stringify(payload),
         });
 
+        if (response.status === 429 || response.status === 503) {
+          // Model is saturated: the backend tells us when to retry
+          const retryAfter = response.headers.get("Retry-After") || "vài";
+          setMessages((prev) => [
+            ...prev,
+            {
+              role: "assistant",
+              content: `Hệ thống đang quá tải, vui lòng thử lại sau ${retryAfter} giây.`,
+              chat_id: currentActiveChat,
+              created_at: new Date().toISOString(),
+            },
+          ]);
+          return;
+        }
+
         if (!response.ok) {
           throw new Error(`Server responded with status: ${response.status}`);
         }
 
-        // Handle streaming response
-        const reader = response.body.getReader();
-        const decoder = new TextDecoder();
+        // Handle streaming response: SSE events, resumed from the last event if the connection drops
         let assistantContent = "";
+        let streamId = null;
+        let lastEventId = null;
+        let finished = false;
         // Initialize assistant message in UI
         setMessages((prev) => [
           ...prev,
@@ -422,45 +443,70 @@ const ChatInterface = () => {
             created_at: new Date().toISOString(),
           },
         ]);
-        let done = false;
-        while (!done) {
-          const { value, done: doneReading } = await reader.read();
-          done = doneReading;
-          if (value) {
-            const chunk = decoder.decode(value);
-            assistantContent += chunk;
-            // Update last message content
+        const updateAssistantMessage = (fields) => {
+          setMessages((prev) => {
+            const newMessages = [...prev];
+            newMessages[newMessages.length - 1] = {
+              ...newMessages[newMessages.length - 1],
+              ...fields,
+            };
+            return newMessages;
+          });
+        };
+        const handleStreamEvent = ({ event, id, data }) => {
+          // Every logged event (metadata, sources, content) has an id to resume after
+          if (id !== null) lastEventId = id;
+          if (event === "stream") {
+            streamId = data.stream_id;
+          } else if (event === "metadata") {
+            updateAssistantMessage({ metadata: data });
+          } else if (event === "sources") {
+            updateAssistantMessage({ sources: data.sources });
+          } else if (event === "content") {
+            // Deltas arrive coalesced, one re-render per frame
+            assistantContent += data.content;
+            updateAssistantMessage({ content: assistantContent });
+          } else if (event === "done") {
+            finished = true;
+            // The backend saved the message before sending this: take its id and sources in place
             setMessages((prev) => {
               const newMessages = [...prev];
-              newMessages[newMessages.length - 1] = {
-                ...newMessages[newMessages.length - 1],
-                content: assistantContent,
+              const last = newMessages.length - 1;
+              newMessages[last] = {
+                ...newMessages[last],
+                ...(data.message_id ? { id: data.message_id } : {}),
+                ...(data.sources?.length ? { sources: data.sources } : {}),
+                timing: data.timing,
               };
+              if (data.user_message_id && newMessages[last - 1]?.role === "user") {
+                newMessages[last - 1] = { ...newMessages[last - 1], id: data.user_message_id };
+              }
               return newMessages;
             });
           }
-        }
-
-        // Reload messages from database to get updated messages with sources from backend
-        setTimeout(async () => {
-          try {
-            const { data: updatedMessages } = await supabase
-              .from("messages")
-              .select("*")
-              .eq("chat_id", currentActiveChat)
-              .order("created_at", { ascending: true });
-
-            if (updatedMessages) {
-              setMessages(updatedMessages);
-              console.log("Reloaded messages from database");
-              if (webSearchEnabled) {
-                console.log("Retrieved messages with web search sources");
-              }
+        };
+        let streamResponse = response;
+        for (let attempt = 0; ; attempt++) {
+          if (streamResponse) {
+            try {
+              await readSSE(streamResponse, handleStreamEvent);
+            } catch (streamError) {
+              console.warn("Chat stream interrupted:", streamError);
             }
-          } catch (error) {
-            console.error("Error reloading messages:", error);
           }
-        }, 2000); // Wait 2 seconds for backend to save messages
+          if (finished || !streamId || attempt >= MAX_STREAM_RESUMES) break;
+          // Connection dropped mid-answer: follow the same generation from the last event
+          await new Promise((resolve) => setTimeout(resolve, 500 * 2 ** attempt));
+          try {
+            streamResponse = await fetch(`http://localhost:8000/chat/stream/${streamId}`, {
+              headers: lastEventId ? { "Last-Event-ID": lastEventId } : {},
+            });
+            if (!streamResponse.ok) break; // Expired: keep what was received
+          } catch (resumeError) {
+            console.warn("Could not resume chat stream:", resumeError);
+            streamResponse = null;
+          }
+        }
 
         // No need to update chat session name here - we already named it with user message
       } catch (requestError) {
@@ -615,6 +661,31 @@ const ChatInterface = () => {
     }
   };
 
+  // Follow the background ingest of an accepted space upload, then show it as a ready file.
+  // Throws when the ingest failed, the caller removes the temp entry.
+  const trackSpaceFileIngest = async (tempFileId, fileId, filename) => {
+    const updateTemp = (fields) =>
+      setSpaceFiles((prev) =>
+        prev.map((f) => (f.id === tempFileId ? { ...f, ...fields } : f))
+      );
+    await waitForIngest(fileId, user.id, (status) =>
+      updateTemp({ progress: formatIngestProgress(status) })
+    );
+    // Remove temp file and add real file data
+    setSpaceFiles((prev) => {
+      const filtered = prev.filter((f) => f.id !== tempFileId);
+      return [
+        {
+          id: fileId,
+          filename,
+          created_at: new Date().toISOString(),
+          isUploading: false,
+        },
+        ...filtered,
+      ];
+    });
+  };
+
   // Handle space file upload (local files)
   const handleSpaceFileUpload = async (e) => {
     const files = Array.from(e.target.files);
@@ -675,24 +746,13 @@ const ChatInterface = () => {
           const data = await response.json();
           console.log(`Uploaded ${file.name} to space:`, data);
 
-          // Remove temp file and add real file data
-          setSpaceFiles((prev) => {
-            const filtered = prev.filter((f) => f.id !== tempFileId);
-            return [
-              {
-                id: data.file_id,
-                filename: file.name,
-                created_at: new Date().toISOString(),
-                isUploading: false,
-              },
-              ...filtered,
-            ];
-          });
+          // Accepted: keep the spinner until the backend finished embedding it
+          await trackSpaceFileIngest(tempFileId, data.file_id, file.name);
         } catch (fileError) {
           console.error(`Error uploading ${file.name}:`, fileError);
           // Remove failed temp file
           setSpaceFiles((prev) => prev.filter((f) => f.id !== tempFileId));
-          alert(`Không thể tải lên file ${file.name}. Vui lòng thử lại.`);
+          alert(`Không thể tải lên file ${file.name}. ${fileError.message}`);
         }
       }
 
@@ -826,24 +886,12 @@ const ChatInterface = () => {
               data
             );
 
-            // Remove temp file and add real file data
-            setSpaceFiles((prev) => {
-              const filtered = prev.filter((f) => f.id !== tempFileId);
-              return [
-                {
-                  id: data.file_id,
-                  filename: fileInfo.name,
-                  created_at: new Date().toISOString(),
-                  isUploading: false,
-                },
-                ...filtered,
-              ];
-            });
+            await trackSpaceFileIngest(tempFileId, data.file_id, fileInfo.name);
           } catch (fileError) {
             console.error(`Error processing file ${fileInfo.name}:`, fileError);
             // Remove failed temp file
             setSpaceFiles((prev) => prev.filter((f) => f.id !== tempFileId));
-            alert(`Không thể xử lý file ${fileInfo.name}. Vui lòng thử lại.`);
+            alert(`Không thể xử lý file ${fileInfo.name}. ${fileError.message}`);
           }
         }
       }
@@ -1336,7 +1384,14 @@ const ChatInterface = () => {
                               </div>
                             </div>
                             {file.isUploading ? (
-                              <div className="animate-spin h-4 w-4 border-2 border-blue-500 border-t-transparent rounded-full" />
+                              <div className="flex items-center gap-1">
+                                {file.progress && (
+                                  <span className="text-xs text-muted-foreground">
+                                    {file.progress}
+                                  </span>
+                                )}
+                                <div className="animate-spin h-4 w-4 border-2 border-blue-500 border-t-transparent rounded-full" />
+                              </div>
                             ) : (
                               <button
                                 onClick={() => handleDeleteSpaceFile(file.id)}
@@ -0,0 +1,36 @@
+// Uploads return 202 while the backend extracts, chunks and embeds the file in the background.
+
+const STATUS_POLL_MS = 1000;
+const STATUS_TIMEOUT_MS = 10 * 60 * 1000;
+
+/**
+ * Poll /file/status/<fileId> until the ingest is 'ready' or 'failed'.
+ * onProgress(status) gets every intermediate status ({ status, progress, chunks_done, chunks_total }).
+ * Resolves with the final status, throws with the backend's error when the ingest failed.
+ */
+export async function waitForIngest(fileId, userId, onProgress) {
+  const started = Date.now();
+  for (;;) {
+    const response = await fetch(
+      `http://localhost:8000/file/status/${fileId}?user_id=${encodeURIComponent(userId)}`
+    );
+    if (!response.ok) {
+      throw new Error(`Không lấy được trạng thái xử lý file (${response.status})`);
+    }
+    const status = await response.json();
+    if (status.status === "ready") return status;
+    if (status.status === "failed") {
+      throw new Error(status.error || "Xử lý file thất bại");
+    }
+    if (onProgress) onProgress(status);
+    if (Date.now() - started > STATUS_TIMEOUT_MS) {
+      throw new Error("Xử lý file quá lâu, vui lòng thử lại sau");
+    }
+    await new Promise((resolve) => setTimeout(resolve, STATUS_POLL_MS));
+  }
+}
+
+/** "42%" from a status, or "" while the chunk count is not known yet */
+export function formatIngestProgress(status) {
+  return status && status.chunks_total ? `${Math.round((status.progress || 0) * 100)}%` : "";
+}
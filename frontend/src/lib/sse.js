@@ -0,0 +1,44 @@
+// Server-Sent Events over fetch(): the chat stream is a POST, which EventSource cannot send.
+
+function parseFrame(frame) {
+  const event = { event: "message", id: null, data: "" };
+  const data = [];
+  for (const line of frame.split("\n")) {
+    if (!line || line.startsWith(":")) continue;
+    const colon = line.indexOf(":");
+    const field = colon === -1 ? line : line.slice(0, colon);
+    let value = colon === -1 ? "" : line.slice(colon + 1);
+    if (value.startsWith(" ")) value = value.slice(1);
+    if (field === "data") data.push(value);
+    else if (field === "event") event.event = value;
+    else if (field === "id") event.id = value;
+  }
+  event.data = data.join("\n");
+  try {
+    event.data = JSON.parse(event.data);
+  } catch {
+    // Plain text payload
+  }
+  return event;
+}
+
+/**
+ * Read an SSE response body and call onEvent({ event, id, data }) for every frame.
+ * Resolves when the body ends (normally or because the connection dropped).
+ */
+export async function readSSE(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true }).replace(/\r\n?/g, "\n");
+    let end;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const frame = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      if (frame.trim()) onEvent(parseFrame(frame));
+    }
+  }
+}